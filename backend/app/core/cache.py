@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from .config import settings
+
+
+class MemoryCache:
+    """Thread-safe, process-local key/value store with optional per-entry TTL.
+
+    Values should be plain JSON-compatible data (dicts, lists, numbers,
+    strings) so callers do not depend on object identity.
+    """
+
+    # Expired entries are dropped on read; every this many writes the rest are purged.
+    _PURGE_EVERY = 500
+
+    def __init__(self) -> None:
+        self._data: dict[str, tuple[Optional[float], Any]] = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _written(self, now: float) -> None:
+        # Called with the lock held
+        self._writes += 1
+        if self._writes % self._PURGE_EVERY == 0:
+            expired = [
+                key for key, (expires_at, _) in self._data.items() if expires_at is not None and expires_at <= now
+            ]
+            for key in expired:
+                del self._data[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (now + ttl if ttl is not None else None, value)
+            self._written(now)
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store ``value`` only if ``key`` is absent (or expired); return whether it was stored."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > now):
+                return False
+            self._data[key] = (now + ttl if ttl is not None else None, value)
+            self._written(now)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class SqliteCache:
+    """Key/value store in a local SQLite file, shared by every process that opens it.
+
+    Same interface as ``MemoryCache``; values are stored as JSON, so callers
+    get equal data back rather than the same object. Expiry uses wall-clock
+    time because entries are compared across processes. ``add`` is a single
+    conditional upsert, so exactly one process wins a race for a key.
+    """
+
+    # Expired entries are dropped on read; every this many writes the rest are purged.
+    _PURGE_EVERY = 500
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit: every statement below is its own transaction
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _expires_at(ttl: Optional[float]) -> Optional[float]:
+        return time.time() + ttl if ttl is not None else None
+
+    def _written(self, connection: sqlite3.Connection) -> None:
+        self._writes += 1
+        if self._writes % self._PURGE_EVERY == 0:
+            connection.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        connection = self._connection()
+        row = connection.execute("SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return default
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            connection.execute("DELETE FROM cache_entries WHERE key = ? AND expires_at <= ?", (key, time.time()))
+            return default
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), self._expires_at(ttl)),
+        )
+        self._written(connection)
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store ``value`` only if ``key`` is absent (or expired); return whether it was stored."""
+        connection = self._connection()
+        cursor = connection.execute(
+            "INSERT INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE cache_entries.expires_at IS NOT NULL AND cache_entries.expires_at <= ?",
+            (key, json.dumps(value), self._expires_at(ttl), time.time()),
+        )
+        self._written(connection)
+        return cursor.rowcount > 0
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM cache_entries")
+
+
+def create_cache() -> MemoryCache | SqliteCache:
+    """The cache selected by ``cache.backend`` in config.yaml."""
+    if settings.CACHE_BACKEND == "sqlite":
+        return SqliteCache(settings.CACHE_SQLITE_PATH)
+    return MemoryCache()
+
+
+cache = create_cache()
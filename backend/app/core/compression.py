@@ -0,0 +1,181 @@
+"""gzip / brotli response compression.
+
+``CompressionMiddleware`` compresses JSON and text responses for clients that
+accept it, preferring brotli when the optional ``brotli`` package is
+installed. Bodies under ``COMPRESSION_MINIMUM_SIZE`` are sent as they are:
+below about a kilobyte the saving is a few hundred bytes at best and not
+worth the CPU. Bodies of ``COMPRESSION_OFFLOAD_SIZE`` or more are compressed
+in the threadpool so a large list page does not hold up the event loop (zlib
+and brotli release the GIL while they work).
+
+Streamed bodies (``more_body``) are gathered until at least
+``COMPRESSION_MINIMUM_SIZE`` bytes are pending (or the stream ends), then
+compressed and flushed together: a flush per small chunk, such as one per CSV
+row, would cost more in block overhead than compression saves. A stream that
+ends before reaching that size is sent uncompressed like any small body.
+Server-sent events (``text/event-stream``) bypass all of this and reach the
+client as soon as they are sent.
+"""
+
+from __future__ import annotations
+
+import zlib
+from typing import Callable
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+_COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "image/svg+xml", "text/")
+_UNCOMPRESSIBLE_TYPES = ("text/event-stream",)
+
+
+def accepted_encoding(accept_encoding: str | None) -> str | None:
+    """The encoding to use for ``accept_encoding``: "br", "gzip" or ``None``."""
+    if not accept_encoding:
+        return None
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+    wildcard = weights.get("*", 0.0)
+    candidates = ("br", "gzip") if brotli is not None else ("gzip",)
+    best = max(candidates, key=lambda name: weights.get(name, wildcard))
+    return best if weights.get(best, wildcard) > 0 else None
+
+
+class _Compressor:
+    """Incremental compressor; ``compress`` returns what is ready, ``finish`` the rest."""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            # wbits 31: gzip container
+            self._zlib = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + self._brotli.flush() if flush else out
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    return _Compressor(encoding).finish(body)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int | None = None, offload_size: int | None = None):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MINIMUM_SIZE if minimum_size is None else minimum_size
+        self.offload_size = settings.COMPRESSION_OFFLOAD_SIZE if offload_size is None else offload_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = accepted_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponse(self, encoding, send)(scope, receive)
+
+
+class _CompressedResponse:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start: Message | None = None
+        self.compressor: _Compressor | None = None
+        self.passthrough = False
+        # Streamed chunks not yet handed to the compressor
+        self.pending: list[bytes] = []
+        self.pending_size = 0
+
+    async def __call__(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.on_send)
+
+    async def _run(self, function: Callable[..., bytes], data: bytes, *args) -> bytes:
+        if len(data) >= self.middleware.offload_size:
+            return await run_in_threadpool(function, data, *args)
+        return function(data, *args)
+
+    async def on_send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.passthrough = (
+                "content-encoding" in headers
+                or not content_type.startswith(_COMPRESSIBLE_TYPES)
+                or content_type.startswith(_UNCOMPRESSIBLE_TYPES)
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                # Held back until the body shows whether compression pays
+                self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if more_body or self.pending:
+            self.pending.append(body)
+            self.pending_size += len(body)
+            if more_body and self.pending_size < self.middleware.minimum_size:
+                return
+            body = b"".join(self.pending)
+            self.pending = []
+            self.pending_size = 0
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            headers["Content-Encoding"] = self.encoding
+            if more_body:
+                del headers["Content-Length"]
+                self.compressor = _Compressor(self.encoding)
+            else:
+                body = await self._run(compress, body, self.encoding)
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            await self.send(start)
+
+        if more_body:
+            chunk = await self._run(self.compressor.compress, body, True)
+        else:
+            chunk = await self._run(self.compressor.finish, body)
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
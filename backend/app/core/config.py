@@ -1,5 +1,5 @@
 import os
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List
 import yaml  # type: ignore
 
@@ -24,15 +24,49 @@ def _load_yaml_config() -> Dict[str, Any]:
     return data
 
 
+def _utc_datetime(value: Any) -> "datetime | None":
+    """A config timestamp (YAML timestamp or ISO string) as an aware UTC datetime; naive values are UTC."""
+    if value is None or value == "":
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
 class Settings:
     def __init__(self) -> None:
         cfg = _load_yaml_config()
 
         app_cfg = cfg.get("backend", {}) if isinstance(cfg.get("backend", {}), dict) else {}
         self.SECRET_KEY: str = str(app_cfg.get("secret_key", "change-this-in-production-super-secret-key"))
-        self.JWT_ALGORITHM: str = str(app_cfg.get("jwt_algorithm", "HS256"))
+        # ES256 signs with the rotating key ring in JWT_KEYS_DIR; HS* keeps using SECRET_KEY
+        self.JWT_ALGORITHM: str = str(app_cfg.get("jwt_algorithm", "ES256"))
         self.ACCESS_TOKEN_EXPIRE_MINUTES: int = int(app_cfg.get("access_token_expire_minutes", 60))
         self.REFRESH_THRESHOLD_MINUTES: int = int(app_cfg.get("refresh_threshold_minutes", 10))
+        self.REFRESH_TOKEN_EXPIRE_DAYS: int = int(app_cfg.get("refresh_token_expire_days", 14))
+        self.JWT_KEY_ROTATION_DAYS: int = int(app_cfg.get("jwt_key_rotation_days", 30))
+        # With ES256, HS256 tokens without a kid (signed with SECRET_KEY) are accepted until this time only
+        self.JWT_LEGACY_ACCEPT_UNTIL: datetime | None = _utc_datetime(app_cfg.get("jwt_legacy_accept_until"))
+        raw_keys_dir = app_cfg.get("jwt_keys_dir")
+        backend_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+        if not raw_keys_dir:
+            raw_keys_dir = os.path.join(backend_root, "app", "keys", "jwt")
+        elif not os.path.isabs(str(raw_keys_dir)):
+            raw_keys_dir = os.path.join(backend_root, str(raw_keys_dir))
+        self.JWT_KEYS_DIR: str = str(raw_keys_dir)
+
+        # Password hashing (argon2id) cost and the size of the process pool that runs it
+        hash_cfg = app_cfg.get("password_hash", {}) if isinstance(app_cfg.get("password_hash", {}), dict) else {}
+        self.ARGON2_TIME_COST: int = int(hash_cfg.get("time_cost", 3))
+        self.ARGON2_MEMORY_COST: int = int(hash_cfg.get("memory_cost", 65536))
+        self.ARGON2_PARALLELISM: int = int(hash_cfg.get("parallelism", 4))
+        self.PASSWORD_HASH_WORKERS: int = int(hash_cfg.get("workers", 2))
+        self.PASSWORD_HASH_NICENESS: int = int(hash_cfg.get("niceness", 19))
+        # Lifetime of X25519/AES-GCM password transport sessions (see /auth/handshake)
+        self.TRANSPORT_SESSION_TTL_SECONDS: int = int(app_cfg.get("transport_session_ttl_seconds", 600))
+        # Live transport sessions per worker, and handshakes per client address per minute
+        self.TRANSPORT_SESSION_MAX: int = int(app_cfg.get("transport_session_max", 10000))
+        self.HANDSHAKE_RATE_PER_MINUTE: int = int(app_cfg.get("handshake_rate_per_minute", 20))
 
         # Database settings
         db_cfg = cfg.get("database", {}) if isinstance(cfg.get("database", {}), dict) else {}
@@ -58,6 +92,42 @@ class Settings:
         srv_cfg = cfg.get("server", {}) if isinstance(cfg.get("server", {}), dict) else {}
         self.SERVER_HOST: str = str(srv_cfg.get("host", "0.0.0.0"))
         self.SERVER_PORT: int = int(srv_cfg.get("port", 8000))
+        # Worker processes started by `python -m app.serve`
+        self.SERVER_WORKERS: int = max(1, int(srv_cfg.get("workers", 1)))
+
+        # Shared cache: "memory" is per process; "sqlite" is one file shared by all workers
+        cache_cfg = cfg.get("cache", {}) if isinstance(cfg.get("cache", {}), dict) else {}
+        self.CACHE_BACKEND: str = str(cache_cfg.get("backend", "memory")).strip().lower()
+        raw_cache_path = cache_cfg.get("sqlite_path")
+        if not raw_cache_path:
+            raw_cache_path = os.path.join(repo_root, "backend", "cache.db")
+        elif not os.path.isabs(str(raw_cache_path)):
+            raw_cache_path = os.path.abspath(os.path.join(repo_root, str(raw_cache_path)))
+        self.CACHE_SQLITE_PATH: str = str(raw_cache_path)
+
+        # Deleted sales/purchases stay restorable this long before compaction purges them
+        tomb_cfg = cfg.get("tombstones", {}) if isinstance(cfg.get("tombstones", {}), dict) else {}
+        self.TOMBSTONE_RETENTION_DAYS: int = int(tomb_cfg.get("retention_days", 30))
+        # 0 disables the background compaction
+        self.TOMBSTONE_COMPACTION_INTERVAL_MINUTES: int = int(tomb_cfg.get("compaction_interval_minutes", 60))
+        self.TOMBSTONE_COMPACTION_BATCH_SIZE: int = max(1, int(tomb_cfg.get("batch_size", 500)))
+
+        # Change log entries are kept at least this long, and until every consumer has processed them
+        change_cfg = cfg.get("change_log", {}) if isinstance(cfg.get("change_log", {}), dict) else {}
+        self.CHANGE_LOG_RETENTION_DAYS: int = int(change_cfg.get("retention_days", 30))
+
+        # /statistics/stream: how often each worker checks the change log, and the keep-alive period
+        live_cfg = cfg.get("live_updates", {}) if isinstance(cfg.get("live_updates", {}), dict) else {}
+        self.LIVE_UPDATES_POLL_SECONDS: float = max(0.1, float(live_cfg.get("poll_interval_seconds", 1.0)))
+        self.LIVE_UPDATES_HEARTBEAT_SECONDS: float = max(1.0, float(live_cfg.get("heartbeat_seconds", 15)))
+
+        # Response compression (app.core.compression); sizes in bytes
+        comp_cfg = cfg.get("compression", {}) if isinstance(cfg.get("compression", {}), dict) else {}
+        self.COMPRESSION_ENABLED: bool = bool(comp_cfg.get("enabled", True))
+        self.COMPRESSION_MINIMUM_SIZE: int = max(0, int(comp_cfg.get("minimum_size", 1024)))
+        self.COMPRESSION_OFFLOAD_SIZE: int = max(0, int(comp_cfg.get("offload_size", 131072)))
+        self.COMPRESSION_GZIP_LEVEL: int = min(9, max(1, int(comp_cfg.get("gzip_level", 6))))
+        self.COMPRESSION_BROTLI_QUALITY: int = min(11, max(0, int(comp_cfg.get("brotli_quality", 4))))
 
         uploads_cfg = cfg.get("uploads", {}) if isinstance(cfg.get("uploads", {}), dict) else {}
         self.UPLOAD_MAX_SIZE_KB: int = int(uploads_cfg.get("max_size_kb", 500))
@@ -78,5 +148,13 @@ class Settings:
     def REFRESH_THRESHOLD_DELTA(self) -> timedelta:
         return timedelta(minutes=self.REFRESH_THRESHOLD_MINUTES)
 
+    @property
+    def REFRESH_TOKEN_EXPIRE_DELTA(self) -> timedelta:
+        return timedelta(days=self.REFRESH_TOKEN_EXPIRE_DAYS)
+
+    @property
+    def JWT_KEY_ROTATION_DELTA(self) -> timedelta:
+        return timedelta(days=self.JWT_KEY_ROTATION_DAYS)
+
 
 settings = Settings()
@@ -1,16 +1,23 @@
 import os
 import base64
+import secrets
+import threading
+import time
+from collections import deque
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives import serialization, hashes
 
+from .cache import cache
+from .config import settings
+
 # 密钥文件路径
 KEYS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "keys"))
 PRIVATE_KEY_PATH = os.path.join(KEYS_DIR, "private_key.pem")
 PUBLIC_KEY_PATH = os.path.join(KEYS_DIR, "public_key.pem")
 
-# 确保密钥目录存在
-os.makedirs(KEYS_DIR, exist_ok=True)
-
 def _load_or_generate_keys():
     """加载现有密钥或生成新密钥对"""
     # 如果密钥文件已存在，则加载它们
@@ -30,7 +37,8 @@ def _load_or_generate_keys():
             # 如果加载失败，继续生成新密钥
             pass
     
-    # 生成新的密钥对
+    # 生成新的密钥对（确保密钥目录存在）
+    os.makedirs(KEYS_DIR, exist_ok=True)
     private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
     public_key_pem = (
         private_key.public_key()
@@ -58,8 +66,19 @@ def _load_or_generate_keys():
     
     return private_key, public_key_pem
 
-# 加载或生成密钥对
-_private_key, _public_key_pem = _load_or_generate_keys()
+_key_pair = None
+_key_pair_lock = threading.Lock()
+
+
+def _keys():
+    """首次使用时才加载或生成密钥对，避免导入本模块时读写文件或生成 RSA 密钥"""
+    global _key_pair
+    if _key_pair is None:
+        with _key_pair_lock:
+            if _key_pair is None:
+                _key_pair = _load_or_generate_keys()
+    return _key_pair
+
 
 def get_public_key_pem() -> str:
     """Return PEM-encoded public key for clients to encrypt passwords.
@@ -67,7 +86,7 @@ def get_public_key_pem() -> str:
     Uses RSA-PKCS1v15 padding for compatibility with jsencrypt library.
     This works in both HTTP and HTTPS environments.
     """
-    return _public_key_pem
+    return _keys()[1]
 
 def _b64_any_decode(data: str) -> bytes:
     # Try standard Base64 first
@@ -81,11 +100,103 @@ def _b64_any_decode(data: str) -> bytes:
 def decrypt_password(enc_b64: str) -> str:
     """Decrypt a base64/base64url RSA-PKCS1v15 ciphertext into UTF-8 password.
     
-    Supports jsencrypt library which uses RSA-PKCS1v15 padding.
+    Supports jsencrypt library which uses RSA-PKCS1v15 padding. Values in the
+    session format ("s1.<session_id>.<payload>") are decrypted with the AES-GCM
+    key from the matching /auth/handshake instead.
     """
+    if is_session_ciphertext(enc_b64):
+        return _decrypt_session_password(enc_b64)
     ciphertext = _b64_any_decode(enc_b64)
-    plaintext = _private_key.decrypt(
+    plaintext = _keys()[0].decrypt(
         ciphertext,
         padding.PKCS1v15(),
     )
-    return plaintext.decode("utf-8")
\ No newline at end of file
+    return plaintext.decode("utf-8")
+
+
+# ---------------------------------------------------------------------------
+# 会话密钥传输（X25519 + AES-256-GCM）
+#
+# 客户端调用 /auth/handshake 提交一次性 X25519 公钥，服务端用自己的临时密钥完成
+# ECDH，经 HKDF-SHA256 派生出 AES-256-GCM 密钥并按 session_id 缓存一段时间。之后的
+# 密码提交格式为 "s1.<session_id>.<base64url(nonce || ciphertext)>"，服务端只需做
+# 对称解密，不再为每次提交执行 RSA 私钥运算。其它格式仍按 RSA-PKCS1v15 处理。
+# ---------------------------------------------------------------------------
+
+SESSION_CIPHERTEXT_PREFIX = "s1."
+TRANSPORT_ALG = "X25519-HKDF-SHA256-A256GCM"
+_HKDF_INFO = b"financial-manager password transport"
+
+
+class TransportSessionLimitError(RuntimeError):
+    """Raised when this process already holds ``TRANSPORT_SESSION_MAX`` live transport sessions."""
+
+
+# Expiry times of the sessions this process has issued, oldest first (the TTL
+# is fixed, so appending keeps them ordered). Bounds the cache entries an
+# unauthenticated /auth/handshake loop can create per worker.
+_live_sessions: deque[float] = deque()
+_live_sessions_lock = threading.Lock()
+
+
+def _reserve_session_slot(ttl: float) -> None:
+    now = time.monotonic()
+    with _live_sessions_lock:
+        while _live_sessions and _live_sessions[0] <= now:
+            _live_sessions.popleft()
+        if len(_live_sessions) >= settings.TRANSPORT_SESSION_MAX:
+            raise TransportSessionLimitError("Too many live transport sessions")
+        _live_sessions.append(now + ttl)
+
+
+def _transport_cache_key(session_id: str) -> str:
+    return f"transport:{session_id}"
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def derive_session_key(shared_secret: bytes, session_id: str) -> bytes:
+    """HKDF-SHA256 over the X25519 shared secret, salted with the session id."""
+    return HKDF(
+        algorithm=hashes.SHA256(), length=32, salt=session_id.encode("ascii"), info=_HKDF_INFO
+    ).derive(shared_secret)
+
+
+def create_transport_session(client_public_b64: str) -> dict:
+    """Complete the X25519 handshake and remember the derived key for a short time.
+
+    Raises ``ValueError`` for an invalid client key and
+    ``TransportSessionLimitError`` when the per-process session cap is reached.
+    """
+    client_public = X25519PublicKey.from_public_bytes(_b64_any_decode(client_public_b64))
+    ttl = settings.TRANSPORT_SESSION_TTL_SECONDS
+    _reserve_session_slot(ttl)
+    server_private = X25519PrivateKey.generate()
+    session_id = secrets.token_urlsafe(16)
+    key = derive_session_key(server_private.exchange(client_public), session_id)
+    cache.set(_transport_cache_key(session_id), _b64url(key), ttl=ttl)
+    server_public = server_private.public_key().public_bytes(
+        encoding=serialization.Encoding.Raw, format=serialization.PublicFormat.Raw
+    )
+    return {"alg": TRANSPORT_ALG, "session_id": session_id, "server_public": _b64url(server_public), "expires_in": ttl}
+
+
+def is_session_ciphertext(enc: str) -> bool:
+    return enc.startswith(SESSION_CIPHERTEXT_PREFIX)
+
+
+def _decrypt_session_password(enc: str) -> str:
+    try:
+        _, session_id, payload = enc.split(".", 2)
+    except ValueError:
+        raise ValueError("Malformed session ciphertext")
+    key_b64 = cache.get(_transport_cache_key(session_id))
+    if key_b64 is None:
+        raise ValueError("Unknown or expired transport session")
+    data = _b64_any_decode(payload)
+    nonce, ciphertext = data[:12], data[12:]
+    # session_id 作为附加认证数据，密文不能被挪到其它会话使用
+    plaintext = AESGCM(_b64_any_decode(key_b64)).decrypt(nonce, ciphertext, session_id.encode("ascii"))
+    return plaintext.decode("utf-8")
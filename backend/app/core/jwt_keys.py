@@ -0,0 +1,180 @@
+"""Rotating ES256 key ring for signing and verifying JWTs.
+
+Each signing key is an EC P-256 private key stored as ``<kid>.pem`` in
+``settings.JWT_KEYS_DIR``; the kid starts with the UTC creation time, so the
+ring can tell the newest key and how old every key is without extra metadata.
+Tokens carry the kid in their header and are verified against the matching
+public key. A new key is generated once the newest one is older than the
+rotation period; older keys stay available for verification until every
+token they could have signed has expired, then they are deleted.
+
+Parsed keys are cached in memory. An unknown kid (for instance a key rotated
+in by another worker) triggers a rescan of the directory, at most once every
+few seconds.
+"""
+
+from __future__ import annotations
+
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from jose import jwk
+from jose.backends.base import Key
+
+from .config import settings
+
+ALGORITHM = "ES256"
+_KID_TIME_FORMAT = "%Y%m%d%H%M%S%f"
+_RESCAN_INTERVAL_SECONDS = 5.0
+
+
+@dataclass
+class _KeyEntry:
+    kid: str
+    created: datetime
+    signer: Key
+    verifier: Key
+
+
+def _kid_created(kid: str) -> datetime | None:
+    try:
+        return datetime.strptime(kid.split("-", 1)[0], _KID_TIME_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+class JwtKeyRing:
+    def __init__(self) -> None:
+        self._entries: dict[str, _KeyEntry] = {}
+        self._loaded = False
+        self._last_scan = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def keys_dir(self) -> str:
+        return settings.JWT_KEYS_DIR
+
+    @property
+    def _rotation(self) -> timedelta:
+        return settings.JWT_KEY_ROTATION_DELTA
+
+    @property
+    def _retention(self) -> timedelta:
+        # A key signs tokens for one rotation period; the longest-lived token
+        # it signed must still verify afterwards.
+        return self._rotation + max(settings.REFRESH_TOKEN_EXPIRE_DELTA, settings.ACCESS_TOKEN_EXPIRE_DELTA)
+
+    def _scan(self) -> None:
+        """Reload key files, keeping already parsed entries. Caller holds the lock."""
+        entries: dict[str, _KeyEntry] = {}
+        if os.path.isdir(self.keys_dir):
+            for name in os.listdir(self.keys_dir):
+                if not name.endswith(".pem"):
+                    continue
+                kid = name[: -len(".pem")]
+                created = _kid_created(kid)
+                if created is None:
+                    continue
+                entry = self._entries.get(kid)
+                if entry is None:
+                    try:
+                        with open(os.path.join(self.keys_dir, name), "rb") as f:
+                            entry = self._parse(kid, created, f.read())
+                    except Exception:
+                        continue
+                entries[kid] = entry
+        self._entries = entries
+        self._loaded = True
+        self._last_scan = time.monotonic()
+
+    @staticmethod
+    def _parse(kid: str, created: datetime, pem: bytes) -> _KeyEntry:
+        private_key = serialization.load_pem_private_key(pem, password=None)
+        public_pem = private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM, format=serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        return _KeyEntry(
+            kid=kid,
+            created=created,
+            signer=jwk.construct(pem.decode("ascii"), ALGORITHM),
+            verifier=jwk.construct(public_pem.decode("ascii"), ALGORITHM),
+        )
+
+    def _generate(self, now: datetime) -> _KeyEntry:
+        kid = f"{now.strftime(_KID_TIME_FORMAT)}-{secrets.token_hex(4)}"
+        pem = ec.generate_private_key(ec.SECP256R1()).private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+        os.makedirs(self.keys_dir, exist_ok=True)
+        path = os.path.join(self.keys_dir, f"{kid}.pem")
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(pem)
+        return self._parse(kid, now, pem)
+
+    def _prune(self, now: datetime) -> None:
+        """Forget and delete keys that can no longer have valid tokens. Caller holds the lock."""
+        newest = max(self._entries.values(), key=lambda entry: entry.created, default=None)
+        for kid, entry in list(self._entries.items()):
+            if entry is newest or entry.created + self._retention > now:
+                continue
+            del self._entries[kid]
+            try:
+                os.remove(os.path.join(self.keys_dir, f"{kid}.pem"))
+            except OSError:
+                pass
+
+    def signing_key(self) -> tuple[str, Key]:
+        """Return ``(kid, key)`` of the current signing key, rotating if it is due."""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            if not self._loaded:
+                self._scan()
+            newest = max(self._entries.values(), key=lambda entry: entry.created, default=None)
+            if newest is None or newest.created + self._rotation <= now:
+                # Another worker may already have rotated; check the directory first.
+                self._scan()
+                newest = max(self._entries.values(), key=lambda entry: entry.created, default=None)
+                if newest is None or newest.created + self._rotation <= now:
+                    newest = self._generate(now)
+                    self._entries[newest.kid] = newest
+                self._prune(now)
+            return newest.kid, newest.signer
+
+    def verification_key(self, kid: str) -> Key | None:
+        with self._lock:
+            entry = self._entries.get(kid)
+            if entry is None and (not self._loaded or time.monotonic() - self._last_scan >= _RESCAN_INTERVAL_SECONDS):
+                self._scan()
+                entry = self._entries.get(kid)
+            if entry is None or entry.created + self._retention <= datetime.now(timezone.utc):
+                return None
+            return entry.verifier
+
+    def rotate(self) -> str:
+        """Start signing with a fresh key immediately and return its kid."""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            if not self._loaded:
+                self._scan()
+            entry = self._generate(now)
+            self._entries[entry.kid] = entry
+            self._prune(now)
+            return entry.kid
+
+    def reset(self) -> None:
+        """Drop cached keys so the next call rescans ``JWT_KEYS_DIR``."""
+        with self._lock:
+            self._entries = {}
+            self._loaded = False
+
+
+key_ring = JwtKeyRing()
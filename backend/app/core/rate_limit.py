@@ -0,0 +1,43 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class RateLimiter:
+    """Process-local sliding-window limit of ``limit`` calls per ``window_seconds`` per key.
+
+    Keys are typically client addresses. At most ``max_keys`` keys are
+    tracked; the least recently seen is forgotten first, so the limiter's own
+    memory stays bounded however many clients call.
+    """
+
+    def __init__(self, limit: int, window_seconds: float, max_keys: int = 10000) -> None:
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._calls: OrderedDict[str, deque[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key: str) -> bool:
+        """Record a call for ``key``; return False (and record nothing) when it is over the limit."""
+        if self.limit <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            calls = self._calls.get(key)
+            if calls is None:
+                calls = self._calls[key] = deque()
+                if len(self._calls) > self.max_keys:
+                    self._calls.popitem(last=False)
+            else:
+                self._calls.move_to_end(key)
+            while calls and calls[0] <= now - self.window_seconds:
+                calls.popleft()
+            if len(calls) >= self.limit:
+                return False
+            calls.append(now)
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._calls.clear()
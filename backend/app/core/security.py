@@ -1,31 +1,193 @@
-from datetime import datetime, timedelta
+import asyncio
+import multiprocessing
+import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional
 
 import base64
-from jose import jwt
+from jose import JWTError, jwt
+from starlette.concurrency import run_in_threadpool
 from .config import settings
+from .jwt_keys import ALGORITHM as KEY_RING_ALGORITHM, key_ring
 from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
 
 # Import crypto functions
-from .crypto import get_public_key_pem, decrypt_password
-
-password_hash = PasswordHash.recommended()
+from .crypto import get_public_key_pem, decrypt_password, is_session_ciphertext
 
 # # Use PBKDF2-SHA256 to avoid external bcrypt backend issues
 # pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
 
-def create_access_token(subject: str, expires_delta: Optional[timedelta] = None) -> str:
+# ---------------------------------------------------------------------------
+# Tokens
+#
+# With an asymmetric JWT_ALGORITHM tokens are ES256-signed by the rotating key
+# ring and carry its "kid" header; with HS* they are signed with SECRET_KEY as
+# before. Tokens without a kid are checked against SECRET_KEY, but with an
+# asymmetric algorithm only until JWT_LEGACY_ACCEPT_UNTIL (never, if unset):
+# sessions issued before switching algorithms stay valid through the
+# switch-over, and SECRET_KEY cannot mint tokens once it has passed.
+# Access and refresh tokens share a session id ("sid") and differ by "typ".
+# ---------------------------------------------------------------------------
+
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
+
+
+def _symmetric_algorithm() -> bool:
+    return settings.JWT_ALGORITHM.upper().startswith("HS")
+
+
+def _encode(claims: dict) -> str:
+    if _symmetric_algorithm():
+        return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    kid, key = key_ring.signing_key()
+    return jwt.encode(claims, key, algorithm=KEY_RING_ALGORITHM, headers={"kid": kid})
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(12)
+
+
+def create_access_token(
+    subject: str, expires_delta: Optional[timedelta] = None, session_id: Optional[str] = None
+) -> str:
     if expires_delta is None:
         expires_delta = settings.ACCESS_TOKEN_EXPIRE_DELTA
     expire = datetime.utcnow() + expires_delta
-    to_encode = {"exp": expire, "sub": subject}
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    to_encode = {"exp": expire, "sub": subject, "typ": ACCESS_TOKEN}
+    if session_id is not None:
+        to_encode["sid"] = session_id
+    return _encode(to_encode)
+
+
+def create_refresh_token(subject: str, session_id: str) -> str:
+    expire = datetime.utcnow() + settings.REFRESH_TOKEN_EXPIRE_DELTA
+    return _encode({"exp": expire, "sub": subject, "typ": REFRESH_TOKEN, "sid": session_id})
+
+
+def decode_token(token: str, token_type: str = ACCESS_TOKEN) -> dict:
+    """Verify ``token`` and return its claims; raises ``JWTError`` (or ``ExpiredSignatureError``)."""
+    kid = jwt.get_unverified_header(token).get("kid")
+    if kid is not None:
+        key = key_ring.verification_key(str(kid))
+        if key is None:
+            raise JWTError("Unknown signing key")
+        algorithms = [KEY_RING_ALGORITHM]
+    elif _symmetric_algorithm():
+        key = settings.SECRET_KEY
+        algorithms = [settings.JWT_ALGORITHM]
+    else:
+        until = settings.JWT_LEGACY_ACCEPT_UNTIL
+        if until is None or datetime.now(timezone.utc) >= until:
+            raise JWTError("Token without a key id")
+        key = settings.SECRET_KEY
+        algorithms = ["HS256"]
+    payload = jwt.decode(token, key, algorithms=algorithms)
+    # Tokens issued before refresh tokens existed have no "typ" and are access tokens
+    if payload.get("typ", ACCESS_TOKEN) != token_type:
+        raise JWTError("Unexpected token type")
+    return payload
+
+
+# ---------------------------------------------------------------------------
+# Password hashing
+#
+# argon2 is deliberately expensive, so request handlers hand it to a small
+# dedicated process pool instead of occupying the shared threadpool. The cost
+# parameters travel with each job, which keeps the worker functions free of
+# config loading and lets a changed config.yaml take effect on the next call.
+# ---------------------------------------------------------------------------
+
+_HashParams = tuple[int, int, int]
+
+
+def _hash_params() -> _HashParams:
+    return (settings.ARGON2_TIME_COST, settings.ARGON2_MEMORY_COST, settings.ARGON2_PARALLELISM)
+
+
+@lru_cache(maxsize=4)
+def _password_hash(params: _HashParams) -> PasswordHash:
+    time_cost, memory_cost, parallelism = params
+    return PasswordHash((Argon2Hasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism),))
+
+
+def _hash_job(password: str, params: _HashParams) -> str:
+    return _password_hash(params).hash(password)
+
+
+def _verify_and_update_job(password: str, hashed_password: str, params: _HashParams) -> tuple[bool, Optional[str]]:
+    return _password_hash(params).verify_and_update(password, hashed_password)
+
+
+def _lower_priority(niceness: int) -> None:
+    # Hash workers yield the CPU to request handling: a login burst then waits
+    # for idle cores instead of stretching every other request's latency.
+    if niceness > 0 and hasattr(os, "nice"):
+        os.nice(niceness)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_lower_priority,
+                initargs=(settings.PASSWORD_HASH_NICENESS,),
+            )
+        return _pool
+
+
+def shutdown_password_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run_hash_job(func, *args):
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        return await run_in_threadpool(func, *args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), func, *args)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return password_hash.verify(plain_password, hashed_password)
+    return _password_hash(_hash_params()).verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return password_hash.hash(password)
+    return _hash_job(password, _hash_params())
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash ``password`` off the event loop and request threadpool."""
+    return await _run_hash_job(_hash_job, password, _hash_params())
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Verify off the event loop; also returns a new hash when the stored one uses outdated parameters."""
+    return await _run_hash_job(_verify_and_update_job, plain_password, hashed_password, _hash_params())
+
+
+async def decrypt_password_async(enc_password: str) -> str:
+    """Decrypt a submitted password without running RSA on the event loop.
+
+    Session (AES-GCM) ciphertexts are cheap and decrypted inline; RSA ones go
+    to the threadpool.
+    """
+    if is_session_ciphertext(enc_password):
+        return decrypt_password(enc_password)
+    return await run_in_threadpool(decrypt_password, enc_password)
@@ -1,14 +1,19 @@
-from datetime import datetime, timezone
-from fastapi import Depends, HTTPException, Response, status
+from datetime import date, datetime, timezone
+from email.utils import format_datetime
+from fastapi import Depends, HTTPException, Query, Request, Response, status
+from pydantic import BaseModel
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+from jose import JWTError
 from jose.exceptions import ExpiredSignatureError
 from sqlalchemy.orm import Session
 
+from .core.cache import cache
 from .core.config import settings
-from .core.security import create_access_token
+from .core.security import create_access_token, decode_token
 from .db import get_db
 from .models.user import User
+from .schemas.projection import parse_fields
+from .services import data_versions
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -20,7 +25,7 @@ def get_current_user(response: Response, token: str = Depends(oauth2_scheme), db
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+        payload = decode_token(token)
         subject: str | None = payload.get("sub")
         if subject is None:
             raise credentials_exception
@@ -42,8 +47,70 @@ def get_current_user(response: Response, token: str = Depends(oauth2_scheme), db
         now = datetime.now(timezone.utc).timestamp()
         remaining = exp_ts - now
         threshold_seconds = settings.REFRESH_THRESHOLD_DELTA.total_seconds()
-        if remaining < threshold_seconds:
-            new_token = create_access_token(subject=user.email)
+        session_id = payload.get("sid")
+        # Only the first request inside the window gets a new token (one per session and token expiry)
+        window_key = f"jwt:slide:{session_id or subject}:{int(exp_ts)}"
+        if remaining < threshold_seconds and cache.add(window_key, True, ttl=max(remaining, 0) + 60):
+            new_token = create_access_token(subject=user.email, session_id=session_id)
             # Return new token via header; client should replace its stored token
             response.headers["X-New-Token"] = new_token
     return user
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # Weak comparison (RFC 9110 §13.1.2): the W/ prefix is ignored
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def data_etag(daily: bool = False):
+    """Dependency for GETs whose response only depends on the user's data (and on today, if ``daily``).
+
+    Sets a weak ETag and Last-Modified from ``data_versions``; when the request's
+    If-None-Match matches, answers 304 before the endpoint runs any query.
+    """
+
+    def check(
+        request: Request,
+        response: Response,
+        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user),
+    ) -> None:
+        version = data_versions.lookup(db, current_user.id)
+        tag = f"{current_user.id}.{version.own}.{version.shared}"
+        if daily:
+            tag += f".{date.today():%Y%m%d}"
+        headers = {"ETag": f'W/"{tag}"', "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+        if version.modified_at is not None:
+            headers["Last-Modified"] = format_datetime(version.modified_at, usegmt=True)
+        if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            # The 304 replaces ``response``; keep a sliding-refresh token issued by get_current_user
+            if "X-New-Token" in response.headers:
+                headers["X-New-Token"] = response.headers["X-New-Token"]
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+
+    return check
+
+
+def field_projection(model: type[BaseModel]):
+    """Dependency parsing ``?fields=a,b,c`` against ``model``; yields ``None`` when every field is wanted."""
+
+    def parse(
+        fields: str | None = Query(None, description="逗号分隔的返回字段，如 id,date,total_price；缺省返回全部字段"),
+    ) -> frozenset[str] | None:
+        try:
+            return parse_fields(fields, model)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {exc}")
+
+    return parse
+
+
+def projected_response(body: bytes, response: Response) -> Response:
+    """Send an already serialized projection, keeping headers set by dependencies (ETag, X-New-Token)."""
+    return Response(content=body, media_type="application/json", headers=dict(response.headers))
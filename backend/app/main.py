@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
@@ -5,26 +6,39 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import ValidationError
 
-from . import db
+from . import db, startup
+from .core.compression import CompressionMiddleware
 from .core.config import settings
+from .core.security import shutdown_password_pool
+from .services import tombstones
 from .routers import auth, purchases, sales, companies, types, customers, suppliers, departments, statistics
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    db.Base.metadata.create_all(bind=db.engine)
+    startup.prepare(db.engine)
+    compaction = None
+    if settings.TOMBSTONE_COMPACTION_INTERVAL_MINUTES > 0:
+        compaction = asyncio.create_task(
+            tombstones.run_compaction(settings.TOMBSTONE_COMPACTION_INTERVAL_MINUTES * 60)
+        )
     yield
+    if compaction is not None:
+        compaction.cancel()
+    shutdown_password_pool()
 
 
 app = FastAPI(title="Financial Manager API", version="0.1.0", lifespan=lifespan)
 
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.FRONTEND_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-New-Token"],
+    expose_headers=["X-New-Token", "ETag", "Last-Modified"],
 )
 
 
@@ -50,6 +64,7 @@ app.include_router(statistics.router, prefix="/statistics", tags=["statistics"])
 
 
 if __name__ == "__main__":
+    # Development server; use `python -m app.serve` for multiple workers
     import uvicorn
 
     uvicorn.run("app.main:app", host=settings.SERVER_HOST, port=settings.SERVER_PORT, reload=True)
\ No newline at end of file
@@ -1,8 +1,12 @@
+from .change_log import change_log_consumer_table, change_log_table  # noqa: F401
 from .company import Company  # noqa: F401
+from .data_version import data_version_table  # noqa: F401
 from .customer import Customer  # noqa: F401
 from .department import Department  # noqa: F401
+from .department_path import department_path_table  # noqa: F401
 from .purchase import Purchase  # noqa: F401
 from .sale import Sale  # noqa: F401
+from .statistics_snapshot import StatisticsSnapshot  # noqa: F401
 from .supplier import Supplier  # noqa: F401
 from .type import Type  # noqa: F401
 from .user import User  # noqa: F401
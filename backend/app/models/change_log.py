@@ -0,0 +1,31 @@
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String, Table
+
+from ..db import Base
+
+# Append-only record of row changes, written in the same transaction as the
+# change by app.services.changelog. The autoincrement id is the watermark
+# consumers tail from; AUTOINCREMENT keeps ids of pruned entries from being
+# reused.
+change_log_table = Table(
+    "change_log",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("table_name", String(64), nullable=False),
+    Column("row_id", Integer, nullable=False),
+    Column("operation", String(16), nullable=False),  # "insert" / "update" / "delete"
+    Column("owner_id", Integer, nullable=True),  # for owner-scoped rows (sales, purchases, types)
+    # column -> [old, new]; relationship -> {"added": [...], "removed": [...]}
+    Column("changes", JSON, nullable=False),
+    Column("changed_at", DateTime(timezone=True), nullable=False),
+    Index("ix_change_log_table_id", "table_name", "id"),
+    sqlite_autoincrement=True,
+)
+
+# Last change_log id each named consumer has processed
+change_log_consumer_table = Table(
+    "change_log_consumers",
+    Base.metadata,
+    Column("name", String(64), primary_key=True),
+    Column("watermark", Integer, nullable=False, default=0),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+)
@@ -14,6 +14,9 @@ class Company(Base):
     legal_person = Column(String(255), nullable=True)
     phone = Column(String(50), nullable=True)
     email = Column(String(255), nullable=True)
+    # Prefix-search keys, maintained by services.suggest
+    name_key = Column(String(255), nullable=True, index=True)
+    name_initials = Column(String(255), nullable=True, index=True)
 
     # Backrefs
     vendors = relationship("User", secondary=user_company_table, back_populates="customer_companies")
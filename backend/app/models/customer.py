@@ -13,6 +13,9 @@ class Customer(Base):
     phone_number = Column(String(50), nullable=True)
     email = Column(String(255), nullable=True)
     position = Column(String(255), nullable=True)
+    # Prefix-search keys, maintained by services.suggest
+    name_key = Column(String(255), nullable=True, index=True)
+    name_initials = Column(String(255), nullable=True, index=True)
     company_id = Column(Integer, nullable=False, default=0, index=True)
     department_id = Column(
         Integer, ForeignKey("departments.id", ondelete="SET NULL"), nullable=True, index=True
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, DateTime, Integer, Table
+
+from ..db import Base
+
+# Change counters behind the ETags of list and statistics responses, bumped
+# by app.services.data_versions in the transaction of every logged change.
+# scope is a user id for that user's own rows, or 0 for shared rows.
+data_version_table = Table(
+    "data_versions",
+    Base.metadata,
+    Column("scope", Integer, primary_key=True, autoincrement=False),
+    Column("version", Integer, nullable=False, default=0),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+)
@@ -10,6 +10,8 @@ class Department(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Parent department within the same company; None for top-level departments.
+    parent_id = Column(Integer, ForeignKey("departments.id", ondelete="SET NULL"), nullable=True, index=True)
 
     company = relationship("Company", back_populates="departments")
-    members = relationship("Customer", foreign_keys="Customer.department_id", back_populates="department")
\ No newline at end of file
+    members = relationship("Customer", foreign_keys="Customer.department_id", back_populates="department")
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, ForeignKey, Index, Integer, Table
+
+from ..db import Base
+
+# Closure table of the department hierarchy: one row per (ancestor, descendant)
+# pair, including each department paired with itself at depth 0. Maintained by
+# app.services.department_tree.
+department_path_table = Table(
+    "department_paths",
+    Base.metadata,
+    Column("ancestor_id", ForeignKey("departments.id", ondelete="CASCADE"), primary_key=True),
+    Column("descendant_id", ForeignKey("departments.id", ondelete="CASCADE"), primary_key=True),
+    Column("depth", Integer, nullable=False),
+    Index("ix_department_paths_descendant", "descendant_id", "ancestor_id"),
+)
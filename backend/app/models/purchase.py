@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Date, ForeignKey, Integer, Numeric, String, Text
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Index, Integer, Numeric, String, Text, text
 from sqlalchemy.orm import relationship
 from .type import Type  # noqa: F401
 from .supplier import Supplier  # noqa: F401
@@ -12,8 +12,61 @@ class PurchaseStatusEnum(str):
     RECEIVED = "received"
 
 
+# Non-terminal statuses (payables still outstanding). Kept as literal SQL so the
+# partial index below and the queries relying on it share the exact predicate,
+# which SQLite requires before it will use a partial index.
+# Deleted rows are kept as tombstones (deleted_at set) until compaction purges
+# them; the hot indexes only cover live rows, so queries must carry this term.
+LIVE_PURCHASE_CONDITION = "deleted_at IS NULL"
+DELETED_PURCHASE_CONDITION = "deleted_at IS NOT NULL"
+
+OPEN_PURCHASE_CONDITION = "status IN ('pending', 'ordered')"
+
+
 class Purchase(Base):
     __tablename__ = "purchases"
+    # (owner_id, date) serves statistics range scans; the open-items index covers
+    # the aging report, and the supplier index covers the supplier spend
+    # aggregate. All of them only hold live rows; tombstones have their own
+    # small index for restore and compaction. SQLite only reads a partial index
+    # without visiting rows when it also holds the columns of its WHERE terms,
+    # hence the trailing status / deleted_at.
+    __table_args__ = (
+        Index(
+            "ix_purchases_live_owner_date",
+            "owner_id",
+            "date",
+            sqlite_where=text(LIVE_PURCHASE_CONDITION),
+            postgresql_where=text(LIVE_PURCHASE_CONDITION),
+        ),
+        Index(
+            "ix_purchases_live_owner_supplier_date",
+            "owner_id",
+            "supplier_id",
+            "date",
+            "total_price",
+            "deleted_at",
+            sqlite_where=text(LIVE_PURCHASE_CONDITION),
+            postgresql_where=text(LIVE_PURCHASE_CONDITION),
+        ),
+        Index(
+            "ix_purchases_live_open_owner_supplier",
+            "owner_id",
+            "supplier_id",
+            "date",
+            "total_price",
+            "status",
+            "deleted_at",
+            sqlite_where=text(f"{OPEN_PURCHASE_CONDITION} AND {LIVE_PURCHASE_CONDITION}"),
+            postgresql_where=text(f"{OPEN_PURCHASE_CONDITION} AND {LIVE_PURCHASE_CONDITION}"),
+        ),
+        Index(
+            "ix_purchases_deleted_at",
+            "deleted_at",
+            sqlite_where=text(DELETED_PURCHASE_CONDITION),
+            postgresql_where=text(DELETED_PURCHASE_CONDITION),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False)
@@ -26,6 +79,13 @@ class Purchase(Base):
     image_url = Column(String(512), nullable=True)
     status = Column(String(50), nullable=False, default=PurchaseStatusEnum.PENDING)
     notes = Column(Text, nullable=True)
+    # Set by DELETE /purchases/{id}; see app.services.tombstones
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Display names copied from the referenced rows so list pages read only this
+    # table; kept in sync by app.services.display_names.
+    supplier_name = Column(String(255), nullable=True)
+    type_name = Column(String(255), nullable=True)
 
     owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     owner = relationship("User", back_populates="purchases")
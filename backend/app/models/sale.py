@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Date, ForeignKey, Integer, Numeric, String, Text
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Index, Integer, Numeric, String, Text, text
 from sqlalchemy.orm import relationship
 from .type import Type  # noqa: F401
 from .customer import Customer  # noqa: F401
@@ -12,8 +12,58 @@ class SaleStatusEnum(str):
     PAID = "paid"
 
 
+# Non-terminal statuses (receivables still outstanding). Kept as literal SQL so the
+# partial index below and the queries relying on it share the exact predicate,
+# which SQLite requires before it will use a partial index.
+# Deleted rows are kept as tombstones (deleted_at set) until compaction purges
+# them; the hot indexes only cover live rows, so queries must carry this term.
+LIVE_SALE_CONDITION = "deleted_at IS NULL"
+DELETED_SALE_CONDITION = "deleted_at IS NOT NULL"
+
+OPEN_SALE_CONDITION = "status IN ('draft', 'sent')"
+
+
 class Sale(Base):
     __tablename__ = "sales"
+    # (owner_id, date) serves statistics range scans; the open-items index covers
+    # the aging report. Both only hold live rows; tombstones have their own
+    # small index for restore and compaction. The open-items index carries the
+    # columns of its WHERE terms so SQLite can answer from it without row visits.
+    __table_args__ = (
+        Index(
+            "ix_sales_live_owner_date",
+            "owner_id",
+            "date",
+            sqlite_where=text(LIVE_SALE_CONDITION),
+            postgresql_where=text(LIVE_SALE_CONDITION),
+        ),
+        # Department (subtree) filters and rollups over the denormalized department id
+        Index(
+            "ix_sales_live_owner_department_date",
+            "owner_id",
+            "customer_department_id",
+            "date",
+            sqlite_where=text(LIVE_SALE_CONDITION),
+            postgresql_where=text(LIVE_SALE_CONDITION),
+        ),
+        Index(
+            "ix_sales_live_open_owner_customer",
+            "owner_id",
+            "customer_id",
+            "date",
+            "total_price",
+            "status",
+            "deleted_at",
+            sqlite_where=text(f"{OPEN_SALE_CONDITION} AND {LIVE_SALE_CONDITION}"),
+            postgresql_where=text(f"{OPEN_SALE_CONDITION} AND {LIVE_SALE_CONDITION}"),
+        ),
+        Index(
+            "ix_sales_deleted_at",
+            "deleted_at",
+            sqlite_where=text(DELETED_SALE_CONDITION),
+            postgresql_where=text(DELETED_SALE_CONDITION),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False)
@@ -26,6 +76,18 @@ class Sale(Base):
     image_url = Column(String(512), nullable=True)
     status = Column(String(50), nullable=False, default=SaleStatusEnum.DRAFT)
     notes = Column(Text, nullable=True)
+    # Set by DELETE /sales/{id}; see app.services.tombstones
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Display names copied from the referenced rows so list pages read only this
+    # table; kept in sync by app.services.display_names.
+    customer_name = Column(String(255), nullable=True)
+    customer_company_id = Column(Integer, nullable=True)
+    company_name = Column(String(255), nullable=True)
+    customer_department_id = Column(Integer, nullable=True)
+    department_name = Column(String(255), nullable=True)
+    department_company_id = Column(Integer, nullable=True)
+    type_name = Column(String(255), nullable=True)
 
     owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     owner = relationship("User", back_populates="sales")
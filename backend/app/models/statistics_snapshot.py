@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer, Numeric, String
+
+from ..db import Base
+
+
+class StatisticsSnapshot(Base):
+    """Frozen sale/purchase total of one closed month or year for one owner."""
+
+    __tablename__ = "statistics_snapshots"
+
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    kind = Column(String(16), primary_key=True)  # source table: "sales" / "purchases"
+    granularity = Column(String(16), primary_key=True)  # "month" / "year"
+    period_start = Column(Date, primary_key=True)
+    amount = Column(Numeric(14, 2), nullable=False, default=0)
@@ -13,6 +13,9 @@ class Supplier(Base):
     phone_number = Column(String(50), nullable=True)
     email = Column(String(255), nullable=True)
     address = Column(String(255), nullable=True)
+    # Prefix-search keys, maintained by services.suggest
+    name_key = Column(String(255), nullable=True, index=True)
+    name_initials = Column(String(255), nullable=True, index=True)
 
     purchases = relationship("Purchase", back_populates="supplier")
     customers = relationship("User", secondary=user_supplier_table, back_populates="suppliers")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from ..db import Base
@@ -6,10 +6,18 @@ from ..db import Base
 
 class Type(Base):
     __tablename__ = "types"
+    # Types are always looked up per owner, so the prefix-search keys are indexed behind owner_id
+    __table_args__ = (
+        Index("ix_types_owner_name_key", "owner_id", "name_key"),
+        Index("ix_types_owner_name_initials", "owner_id", "name_initials"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Prefix-search keys, maintained by services.suggest
+    name_key = Column(String(255), nullable=True)
+    name_initials = Column(String(255), nullable=True)
 
     owner = relationship("User", back_populates="types")
     purchases = relationship("Purchase", back_populates="type")
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from jose import JWTError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from ..core.config import settings
+from ..core.crypto import TransportSessionLimitError, create_transport_session
+from ..core.rate_limit import RateLimiter
 from ..db import get_db
 from ..deps import get_current_user
 from ..models.user import User
@@ -11,21 +16,49 @@ from ..schemas.user import (
     LoginRequest,
     ChangePasswordRequest,
     UserProfileUpdate,
+    HandshakeRequest,
+    HandshakeResponse,
+    RefreshRequest,
 )
 from ..core.security import (
-    get_password_hash,
-    verify_password,
+    hash_password_async,
+    verify_password_async,
+    REFRESH_TOKEN,
     create_access_token,
-    decrypt_password,
+    create_refresh_token,
+    decode_token,
+    new_session_id,
+    decrypt_password_async,
     get_public_key_pem,
 )
 
 router = APIRouter()
 
+# register/login/change-password are async so that the argon2 work awaits the
+# password-hash process pool instead of holding a threadpool thread; RSA
+# decryption is pushed to the threadpool to keep it off the event loop, while
+# passwords encrypted with a /auth/handshake session key only need AES-GCM.
+# Their queries and commits (an fsync each) go through the threadpool too, and
+# the session gives its connection back to the pool before any hash job is
+# awaited: a login burst queues behind the hash workers for seconds, and
+# would otherwise hold every pooled connection while other requests wait.
+
+
+def _user_by_email(db: Session, email: str) -> User | None:
+    user = db.query(User).filter(User.email == email).first()
+    db.close()
+    return user
+
+
+def _save(db: Session, user: User) -> None:
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+
 
 @router.post("/register", response_model=UserRead)
-def register(user_in: UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == user_in.email).first()
+async def register(user_in: UserCreate, db: Session = Depends(get_db)):
+    existing = await run_in_threadpool(_user_by_email, db, user_in.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     company_name: str | None = None
@@ -35,36 +68,64 @@ def register(user_in: UserCreate, db: Session = Depends(get_db)):
             raise HTTPException(status_code=400, detail="Company name is required")
     # Decrypt required encrypted password
     try:
-        password_plain = decrypt_password(user_in.enc_password)
+        password_plain = await decrypt_password_async(user_in.enc_password)
     except Exception as e:
         # 添加详细的错误日志
         import logging
         logger = logging.getLogger(__name__)
         logger.error(f"Password decryption failed: {str(e)}")
         raise HTTPException(status_code=400, detail="Invalid encrypted password")
-    user = User(
-        email=user_in.email, hashed_password=get_password_hash(password_plain), company_name=company_name
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    hashed_password = await hash_password_async(password_plain)
+    user = User(email=user_in.email, hashed_password=hashed_password, company_name=company_name)
+    await run_in_threadpool(_save, db, user)
 
     return user
 
 
 @router.post("/login", response_model=Token)
-def login(data: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == data.email).first()
+async def login(data: LoginRequest, db: Session = Depends(get_db)):
+    user = await run_in_threadpool(_user_by_email, db, data.email)
     # Decrypt required encrypted password
     try:
-        password_plain = decrypt_password(data.enc_password)
+        password_plain = await decrypt_password_async(data.enc_password)
     except Exception:
         # treat as invalid credentials rather than leaking decryption errors
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
-    if not user or not verify_password(password_plain, user.hashed_password):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
+    valid, updated_hash = await verify_password_async(password_plain, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
-    access_token = create_access_token(subject=user.email)
-    return Token(access_token=access_token)
+    if updated_hash is not None:
+        # argon2 parameters changed since this hash was created: upgrade it transparently
+        user.hashed_password = updated_hash
+        await run_in_threadpool(_save, db, user)
+    session_id = new_session_id()
+    return Token(
+        access_token=create_access_token(subject=user.email, session_id=session_id),
+        refresh_token=create_refresh_token(subject=user.email, session_id=session_id),
+    )
+
+
+@router.post("/refresh", response_model=Token)
+def refresh(data: RefreshRequest, db: Session = Depends(get_db)):
+    """用刷新令牌换取新的访问令牌（同一会话），刷新令牌一并轮换"""
+    invalid = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    try:
+        payload = decode_token(data.refresh_token, token_type=REFRESH_TOKEN)
+    except JWTError:
+        raise invalid
+    subject = payload.get("sub")
+    session_id = payload.get("sid")
+    if not subject or not session_id:
+        raise invalid
+    user = db.query(User).filter(User.email == subject).first()
+    if user is None or not user.is_active:
+        raise invalid
+    return Token(
+        access_token=create_access_token(subject=user.email, session_id=session_id),
+        refresh_token=create_refresh_token(subject=user.email, session_id=session_id),
+    )
 
 
 @router.get("/me", response_model=UserRead)
@@ -73,21 +134,21 @@ def me(current_user: User = Depends(get_current_user), db: Session = Depends(get
 
 
 @router.post("/change-password")
-def change_password(
+async def change_password(
     data: ChangePasswordRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
 ):
     # Decrypt required encrypted fields
     try:
-        cur_plain = decrypt_password(data.enc_current_password)
-        new_plain = decrypt_password(data.enc_new_password)
+        cur_plain = await decrypt_password_async(data.enc_current_password)
+        new_plain = await decrypt_password_async(data.enc_new_password)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid encrypted password")
-    if not verify_password(cur_plain, current_user.hashed_password):
+    await run_in_threadpool(db.close)
+    valid, _ = await verify_password_async(cur_plain, current_user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=400, detail="Current password is incorrect")
-    current_user.hashed_password = get_password_hash(new_plain)
-    db.add(current_user)
-    db.commit()
-    db.refresh(current_user)
+    current_user.hashed_password = await hash_password_async(new_plain)
+    await run_in_threadpool(_save, db, current_user)
     return {"ok": True}
 
 
@@ -96,6 +157,25 @@ def get_pubkey():
     return {"alg": "RSA-PKCS1v15", "pem": get_public_key_pem()}
 
 
+# /auth/handshake needs no authentication, so each client address gets a few
+# per minute; clients that are refused can still submit RSA ciphertexts.
+_handshake_limiter = RateLimiter(settings.HANDSHAKE_RATE_PER_MINUTE, 60)
+
+
+@router.post("/handshake", response_model=HandshakeResponse)
+def handshake(data: HandshakeRequest, request: Request):
+    """建立短期会话密钥：客户端提交 X25519 公钥，之后的密码用 AES-GCM 加密提交"""
+    client = request.client.host if request.client else ""
+    if not _handshake_limiter.allow(client):
+        raise HTTPException(status_code=429, detail="Too many handshakes", headers={"Retry-After": "60"})
+    try:
+        return create_transport_session(data.client_public)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid client public key")
+    except TransportSessionLimitError:
+        raise HTTPException(status_code=503, detail="Too many handshakes", headers={"Retry-After": "60"})
+
+
 @router.put("/update-profile")
 def update_profile(
     data: UserProfileUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
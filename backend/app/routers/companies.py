@@ -1,5 +1,8 @@
+from collections import defaultdict
+
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func
+from sqlalchemy.orm import Session
 
 from ..db import get_db
 from ..deps import get_current_user
@@ -8,25 +11,78 @@ from ..models.customer import Customer
 from ..models.department import Department
 from ..models.supplier import Supplier
 from ..models.user import User
-from ..schemas.company import CompanyCreate, CompanyRead, CompanyUpdate
+from ..schemas.company import CompanyCreate, CompanyRead, CompanySummary, CompanyUpdate
+from ..schemas.department import DepartmentRead
+from ..schemas.suggest import Suggestion
+from ..services import membership, suggest
 
 
 router = APIRouter()
 
 
-@router.get("/", response_model=list[CompanyRead])
+def _company_access_filter(db: Session, current_user: User):
+    return membership.access_filter(db, current_user.id, membership.COMPANIES, Company.id)
+
+
+@router.get("/", response_model=list[CompanySummary])
 def list_customer_companies(
     skip: int = 0,
     limit: int = 100,
     q: str | None = None,
+    include_departments: bool = True,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    query = db.query(Company).filter(Company.vendors.any(User.id == current_user.id))
+    """分两步取数：先按 id 分页取公司，再用 IN 查询批量取部门和（当前用户可见的）成员数。
+
+    不再 joinedload 部门，避免结果行按部门数翻倍、分页被包成子查询。
+    include_departments=false 时不返回部门（departments 为 null）。
+    """
+    query = db.query(Company).filter(_company_access_filter(db, current_user))
     if q:
         like = f"%{q}%"
         query = query.filter(Company.name.ilike(like))
-    return query.options(joinedload(Company.departments)).offset(skip).limit(limit).all()
+    companies = query.order_by(Company.id).offset(skip).limit(limit).all()
+    company_ids = [company.id for company in companies]
+    if not company_ids:
+        return []
+
+    member_counts = dict(
+        db.query(Customer.company_id, func.count(Customer.id))
+        .filter(
+            Customer.company_id.in_(company_ids),
+            membership.access_filter(db, current_user.id, membership.CUSTOMERS, Customer.id),
+        )
+        .group_by(Customer.company_id)
+        .all()
+    )
+    departments: dict[int, list[DepartmentRead]] | None = None
+    if include_departments:
+        departments = defaultdict(list)
+        rows = (
+            db.query(Department.id, Department.name, Department.company_id, Department.parent_id)
+            .filter(Department.company_id.in_(company_ids))
+            .order_by(Department.id)
+            .all()
+        )
+        for department_id, name, company_id, parent_id in rows:
+            departments[company_id].append(
+                DepartmentRead(id=department_id, name=name, company_id=company_id, parent_id=parent_id)
+            )
+
+    return [
+        CompanySummary(
+            id=company.id,
+            name=company.name,
+            address=company.address,
+            legal_person=company.legal_person,
+            phone=company.phone,
+            email=company.email,
+            departments=departments[company.id] if departments is not None else None,
+            member_count=member_counts.get(company.id, 0),
+        )
+        for company in companies
+    ]
 
 
 @router.get("/count", response_model=int)
@@ -35,13 +91,26 @@ def count_companies(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    query = db.query(Company).filter(Company.vendors.any(User.id == current_user.id))
-    if q:
-        like = f"%{q}%"
-        query = query.filter(Company.name.ilike(like))
+    if not q:
+        # The cached access set already is the answer
+        return len(membership.accessible_ids(db, current_user.id, membership.COMPANIES))
+    query = db.query(Company).filter(_company_access_filter(db, current_user), Company.name.ilike(f"%{q}%"))
     return query.count()
 
 
+@router.get("/suggest", response_model=list[Suggestion])
+def suggest_companies(
+    q: str | None = None,
+    limit: int = 10,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """按名称前缀（或拼音首字母）联想公司，供选择框输入时调用。"""
+    if not 1 <= limit <= suggest.MAX_SUGGESTIONS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {suggest.MAX_SUGGESTIONS}")
+    return suggest.suggest(db, current_user.id, suggest.COMPANIES, q, limit)
+
+
 @router.post("/", response_model=CompanyRead)
 def create_company(
     data: CompanyCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
@@ -49,7 +118,7 @@ def create_company(
     payload = data.model_dump()
     existing = (
         db.query(Company)
-        .filter(Company.name == data.name, Company.vendors.any(User.id == current_user.id))
+        .filter(Company.name == data.name, _company_access_filter(db, current_user))
         .first()
     )
     if existing:
@@ -73,7 +142,7 @@ def get_company(
 ):
     company = (
         db.query(Company)
-        .filter(Company.id == company_id, Company.vendors.any(User.id == current_user.id))
+        .filter(Company.id == company_id, _company_access_filter(db, current_user))
         .first()
     )
     if not company:
@@ -90,7 +159,7 @@ def update_company(
 ):
     company = (
         db.query(Company)
-        .filter(Company.id == company_id, Company.vendors.any(User.id == current_user.id))
+        .filter(Company.id == company_id, _company_access_filter(db, current_user))
         .first()
     )
     if not company:
@@ -109,7 +178,7 @@ def delete_company(
 ):
     company = (
         db.query(Company)
-        .filter(Company.id == company_id, Company.vendors.any(User.id == current_user.id))
+        .filter(Company.id == company_id, _company_access_filter(db, current_user))
         .first()
     )
     if not company:
@@ -1,54 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import and_, case, or_, select
+from functools import lru_cache
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from pydantic import TypeAdapter, create_model
+from sqlalchemy import case, distinct, func, or_
 from sqlalchemy.orm import Session, joinedload
 
 from ..db import get_db
-from ..deps import get_current_user
+from ..deps import data_etag, field_projection, get_current_user, projected_response
 from ..models.company import Company
 from ..models.customer import Customer
 from ..models.sale import Sale
 from ..models.department import Department
 from ..models.user import User
 
-from ..schemas.customer import CustomerCreate, CustomerGroup, CustomerRead, CustomerUpdate
-from ..models.user_company import user_company_table
+from ..schemas.customer import (
+    CustomerCreate,
+    CustomerDirectory,
+    CustomerDirectoryGroup,
+    CustomerGroup,
+    CustomerRead,
+    CustomerUpdate,
+)
+from ..schemas.projection import projected_model
+from ..schemas.suggest import Suggestion
+from ..services import department_tree, membership, suggest
 
 router = APIRouter()
 
 
-def _customer_access_filter(current_user: User):
-    return Customer.vendors.any(User.id == current_user.id)
+def _customer_access_filter(db: Session, current_user: User):
+    return membership.access_filter(db, current_user.id, membership.CUSTOMERS, Customer.id)
+
+
+def _company_access_filter(db: Session, current_user: User):
+    return membership.access_filter(db, current_user.id, membership.COMPANIES, Company.id)
 
 
 def _get_accessible_department(db: Session, current_user: User, department_id: int) -> Department | None:
     return (
         db.query(Department)
         .join(Company)
-        .filter(Department.id == department_id, Company.vendors.any(User.id == current_user.id))
+        .filter(Department.id == department_id, _company_access_filter(db, current_user))
         .first()
     )
 
 
-@router.get("/", response_model=list[CustomerGroup])
-def list_customers(
-    skip: int = 0,
-    limit: int = 100,
-    company_id: int | None = None,
-    department_id: int | None = None,
-    q: str | None = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+def _apply_customer_filters(
+    query, company_id: int | None, department_id: int | None, q: str | None, include_subdepartments: bool = False
 ):
-    access_filter = _customer_access_filter(current_user)
-    query = (
-        db.query(Customer)
-        .options(joinedload(Customer.company), joinedload(Customer.department))
-        .filter(access_filter)
-    )
     if company_id is not None:
         query = query.filter(Customer.company_id == company_id)
     if department_id is not None:
-        query = query.filter(Customer.department_id == department_id)
+        if include_subdepartments:
+            query = query.filter(Customer.department_id.in_(department_tree.subtree_ids(department_id)))
+        else:
+            query = query.filter(Customer.department_id == department_id)
     if q:
         like = f"%{q}%"
         query = query.filter(
@@ -59,16 +65,82 @@ def list_customers(
                 Customer.position.ilike(like),
             )
         )
-    order_expr = case((Customer.company_id == 0, 0), else_=1)
-    customers = query.order_by(order_expr, Customer.company_id, Customer.id).offset(skip).limit(limit).all()
-    groups: dict[int, list[Customer]] = {}
+    return query
+
+
+# 个人客户（company_id == 0）分组排在最前，其余按公司 id 排序
+_GROUP_ORDER = (case((Customer.company_id == 0, 0), else_=1), Customer.company_id)
+MAX_DIRECTORY_GROUPS = 100
+MAX_DIRECTORY_PREVIEW = 50
+MAX_DIRECTORY_MEMBERS = 100
+
+
+@lru_cache(maxsize=64)
+def _projected_groups(fields: frozenset[str]) -> TypeAdapter:
+    customer = projected_model(CustomerRead, fields)
+    group = create_model(f"CustomerGroup[{customer.__name__}]", company_id=(int, ...), customers=(list[customer], ...))
+    return TypeAdapter(list[group])
+
+
+def _projected_customers(query, fields: frozenset[str], skip: int, limit: int) -> list[dict]:
+    """Customer rows with only ``fields`` (plus company_id for grouping); joins only for requested names."""
+    columns = [getattr(Customer, name) for name in sorted(fields - {"company_name", "department_name"})]
+    if "company_id" not in fields:
+        columns.append(Customer.company_id)
+    if "company_name" in fields:
+        query = query.outerjoin(Company, Company.id == Customer.company_id)
+        columns.append(Company.name.label("company_name"))
+    if "department_name" in fields:
+        query = query.outerjoin(Department, Department.id == Customer.department_id)
+        columns.append(Department.name.label("department_name"))
+    query = query.order_by(*_GROUP_ORDER, Customer.id).offset(skip).limit(limit)
+    rows = []
+    for row in query.with_entities(*columns):
+        values = dict(row._mapping)
+        if "company_name" in fields and values["company_id"] == 0:
+            values["company_name"] = "个人客户"
+        rows.append(values)
+    return rows
+
+
+@router.get("/", response_model=list[CustomerGroup], dependencies=[Depends(data_etag())])
+def list_customers(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    company_id: int | None = None,
+    department_id: int | None = None,
+    q: str | None = None,
+    include_subdepartments: bool = False,
+    fields: frozenset[str] | None = Depends(field_projection(CustomerRead)),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    access_filter = _customer_access_filter(db, current_user)
+    query = db.query(Customer).filter(access_filter)
+    query = _apply_customer_filters(query, company_id, department_id, q, include_subdepartments)
+    if fields is not None:
+        customers = _projected_customers(query, fields, skip, limit)
+    else:
+        customers = (
+            query.options(joinedload(Customer.company), joinedload(Customer.department))
+            .order_by(*_GROUP_ORDER, Customer.id)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+    groups: dict[int, list] = {}
     order: list[int] = []
     for item in customers:
-        key = item.company_id
+        key = item["company_id"] if fields is not None else item.company_id
         if key not in groups:
             groups[key] = []
             order.append(key)
         groups[key].append(item)
+    if fields is not None:
+        adapter = _projected_groups(fields)
+        projected = adapter.validate_python([{"company_id": key, "customers": groups[key]} for key in order])
+        return projected_response(adapter.dump_json(projected), response)
     return [
         CustomerGroup(
             company_id=company_key,
@@ -83,28 +155,131 @@ def count_customers(
     company_id: int | None = None,
     department_id: int | None = None,
     q: str | None = None,
+    include_subdepartments: bool = False,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    access_filter = _customer_access_filter(current_user)
+    access_filter = _customer_access_filter(db, current_user)
     query = db.query(Customer).filter(access_filter)
-    if company_id is not None:
-        query = query.filter(Customer.company_id == company_id)
-    if department_id is not None:
-        query = query.filter(Customer.department_id == department_id)
-    if q:
-        like = f"%{q}%"
-        query = query.filter(
-            or_(
-                Customer.name.ilike(like),
-                Customer.phone_number.ilike(like),
-                Customer.email.ilike(like),
-                Customer.position.ilike(like),
-            )
-        )
+    query = _apply_customer_filters(query, company_id, department_id, q, include_subdepartments)
     return query.count()
 
 
+@router.get("/directory", response_model=CustomerDirectory)
+def customer_directory(
+    skip: int = 0,
+    limit: int = 20,
+    preview: int = 0,
+    department_id: int | None = None,
+    q: str | None = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """按公司分组的通讯录：分页单位是公司分组，成员数由 SQL 统计。
+
+    ``preview`` > 0 时每组附带前 N 个成员，其余成员通过 ``/directory/{company_id}`` 按需展开。
+    """
+    if skip < 0:
+        raise HTTPException(status_code=400, detail="skip must not be negative")
+    if not 1 <= limit <= MAX_DIRECTORY_GROUPS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_DIRECTORY_GROUPS}")
+    if not 0 <= preview <= MAX_DIRECTORY_PREVIEW:
+        raise HTTPException(status_code=400, detail=f"preview must be between 0 and {MAX_DIRECTORY_PREVIEW}")
+    filtered = _apply_customer_filters(
+        db.query(Customer).filter(_customer_access_filter(db, current_user)), None, department_id, q
+    )
+
+    total_groups, total_customers = filtered.with_entities(
+        func.count(distinct(Customer.company_id)), func.count(Customer.id)
+    ).one()
+    counts = (
+        filtered.with_entities(Customer.company_id, func.count(Customer.id))
+        .group_by(Customer.company_id)
+        .order_by(*_GROUP_ORDER)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    company_ids = [company_key for company_key, _ in counts]
+    names = dict(
+        db.query(Company.id, Company.name).filter(Company.id.in_([key for key in company_ids if key != 0])).all()
+    )
+
+    members: dict[int, list[CustomerRead]] = {key: [] for key in company_ids}
+    if preview and company_ids:
+        position = (
+            func.row_number().over(partition_by=Customer.company_id, order_by=Customer.id).label("position")
+        )
+        ranked = (
+            filtered.with_entities(Customer.id.label("id"), position)
+            .filter(Customer.company_id.in_(company_ids))
+            .subquery()
+        )
+        rows = (
+            db.query(Customer)
+            .options(joinedload(Customer.company), joinedload(Customer.department))
+            .join(ranked, ranked.c.id == Customer.id)
+            .filter(ranked.c.position <= preview)
+            .order_by(Customer.company_id, Customer.id)
+            .all()
+        )
+        for row in rows:
+            members[row.company_id].append(CustomerRead.model_validate(row))
+
+    return CustomerDirectory(
+        groups=[
+            CustomerDirectoryGroup(
+                company_id=company_key,
+                company_name="个人客户" if company_key == 0 else names.get(company_key),
+                member_count=member_count,
+                customers=members[company_key],
+            )
+            for company_key, member_count in counts
+        ],
+        total_groups=total_groups,
+        total_customers=total_customers,
+    )
+
+
+@router.get("/directory/{company_id}", response_model=list[CustomerRead])
+def customer_directory_members(
+    company_id: int,
+    skip: int = 0,
+    limit: int = 50,
+    department_id: int | None = None,
+    q: str | None = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """展开通讯录中的单个公司分组"""
+    if skip < 0:
+        raise HTTPException(status_code=400, detail="skip must not be negative")
+    if not 1 <= limit <= MAX_DIRECTORY_MEMBERS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_DIRECTORY_MEMBERS}")
+    query = _apply_customer_filters(
+        db.query(Customer)
+        .options(joinedload(Customer.company), joinedload(Customer.department))
+        .filter(_customer_access_filter(db, current_user)),
+        company_id,
+        department_id,
+        q,
+    )
+    return query.order_by(Customer.id).offset(skip).limit(limit).all()
+
+
+@router.get("/suggest", response_model=list[Suggestion])
+def suggest_customers(
+    q: str | None = None,
+    limit: int = 10,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """按名称前缀（或拼音首字母）联想客户，供选择框输入时调用。"""
+    if not 1 <= limit <= suggest.MAX_SUGGESTIONS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {suggest.MAX_SUGGESTIONS}")
+    return suggest.suggest(db, current_user.id, suggest.CUSTOMERS, q, limit)
+
+
 @router.post("/", response_model=CustomerRead)
 def create_customer(
     data: CustomerCreate,
@@ -118,7 +293,7 @@ def create_customer(
     if company_id != 0:
         company = (
             db.query(Company)
-            .filter(Company.id == company_id, Company.vendors.any(User.id == current_user.id))
+            .filter(Company.id == company_id, _company_access_filter(db, current_user))
             .first()
         )
         if not company:
@@ -136,7 +311,7 @@ def create_customer(
             Customer.name == payload.get("name"),
             Customer.company_id == company_id,
             Customer.department_id == department_id,
-            _customer_access_filter(current_user),
+            _customer_access_filter(db, current_user),
         )
         .first()
     )
@@ -157,20 +332,12 @@ def get_customer(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    access_filter = _customer_access_filter(current_user)
+    access_filter = _customer_access_filter(db, current_user)
     customer = db.query(Customer).filter(Customer.id == customer_id, access_filter).first()
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     if customer.company_id > 0:
-        link_exists = db.execute(
-            select(user_company_table.c.company_id).where(
-                and_(
-                    user_company_table.c.user_id == current_user.id,
-                    user_company_table.c.company_id == customer.company_id,
-                )
-            )
-        ).first()
-        if not link_exists:
+        if not membership.has_access(db, current_user.id, membership.COMPANIES, customer.company_id):
             raise HTTPException(status_code=403, detail="Customer not accessible")
     return customer
 
@@ -182,7 +349,7 @@ def update_customer(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    access_filter = _customer_access_filter(current_user)
+    access_filter = _customer_access_filter(db, current_user)
     customer = db.query(Customer).filter(Customer.id == customer_id, access_filter).first()
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
@@ -201,7 +368,7 @@ def update_customer(
         else:
             company = (
                 db.query(Company)
-                .filter(Company.id == new_company_id, Company.vendors.any(User.id == current_user.id))
+                .filter(Company.id == new_company_id, _company_access_filter(db, current_user))
                 .first()
             )
             if not company:
@@ -229,7 +396,7 @@ def delete_customer(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    access_filter = _customer_access_filter(current_user)
+    access_filter = _customer_access_filter(db, current_user)
     customer = db.query(Customer).filter(Customer.id == customer_id, access_filter).first()
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
@@ -8,16 +8,21 @@ from ..models.customer import Customer
 from ..models.department import Department
 from ..models.user import User
 from ..schemas.department import DepartmentCreate, DepartmentRead, DepartmentUpdate
+from ..services import department_tree, membership
 
 router = APIRouter()
 
 
+def _company_access_filter(db: Session, current_user: User):
+    return membership.access_filter(db, current_user.id, membership.COMPANIES, Company.id)
+
+
 def _get_accessible_company(db: Session, current_user: User, company_id: int) -> Company | None:
     if company_id is None:
         return None
     return (
         db.query(Company)
-        .filter(Company.id == company_id, Company.vendors.any(User.id == current_user.id))
+        .filter(Company.id == company_id, _company_access_filter(db, current_user))
         .first()
     )
 
@@ -28,11 +33,20 @@ def _get_accessible_department(db: Session, current_user: User, dept_id: int) ->
     return (
         db.query(Department)
         .join(Company)
-        .filter(Department.id == dept_id, Company.vendors.any(User.id == current_user.id))
+        .filter(Department.id == dept_id, _company_access_filter(db, current_user))
         .first()
     )
 
 
+def _validate_parent(db: Session, current_user: User, parent_id: int, company_id: int) -> Department:
+    parent = _get_accessible_department(db, current_user, parent_id)
+    if not parent:
+        raise HTTPException(status_code=404, detail="没有找到上级部门")
+    if parent.company_id != company_id:
+        raise HTTPException(status_code=400, detail="上级部门必须属于同一公司")
+    return parent
+
+
 # Leader validation removed: departments no longer have a designated leader.
 
 
@@ -41,12 +55,16 @@ def list_departments(
     skip: int = 0,
     limit: int = 200,
     company_id: int | None = None,
+    ancestor_id: int | None = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    query = db.query(Department).join(Company).filter(Company.vendors.any(User.id == current_user.id))
+    """ancestor_id: 只返回该部门及其所有下级部门"""
+    query = db.query(Department).join(Company).filter(_company_access_filter(db, current_user))
     if company_id is not None:
         query = query.filter(Department.company_id == company_id)
+    if ancestor_id is not None:
+        query = query.filter(Department.id.in_(department_tree.subtree_ids(ancestor_id)))
     departments = (
         query.order_by(Department.company_id.asc(), Department.name.asc()).offset(skip).limit(limit).all()
     )
@@ -67,7 +85,9 @@ def create_department(
     )
     if existing:
         raise HTTPException(status_code=400, detail="部门名称已存在")
-    department = Department(name=data.name, company_id=company.id)
+    if data.parent_id is not None:
+        _validate_parent(db, current_user, data.parent_id, company.id)
+    department = Department(name=data.name, company_id=company.id, parent_id=data.parent_id)
 
     db.add(department)
     db.commit()
@@ -95,10 +115,23 @@ def update_department(
         company = _get_accessible_company(db, current_user, new_company_id)
         if not company:
             raise HTTPException(status_code=404, detail="Company not found")
-        department.company_id = company.id
+        if company.id != department.company_id:
+            if department_tree.has_children(db, department.id):
+                raise HTTPException(status_code=400, detail="部门下有子部门，不能移动到其他公司")
+            department.company_id = company.id
+            if "parent_id" not in payload:
+                department.parent_id = None
     else:
         company = department.company
 
+    if "parent_id" in payload:
+        parent_id = payload["parent_id"]
+        if parent_id is not None:
+            _validate_parent(db, current_user, parent_id, department.company_id)
+            if department_tree.is_in_subtree(db, department.id, parent_id):
+                raise HTTPException(status_code=400, detail="不能把部门移动到它自己或其下级部门之下")
+        department.parent_id = parent_id
+
     if "name" in payload and payload["name"]:
         department.name = payload["name"]
 
@@ -123,6 +156,8 @@ def delete_department(
     has_members = db.query(Customer.id).filter(Customer.department_id == department_id).first()
     if has_members:
         raise HTTPException(status_code=400, detail="Department has linked customers")
+    if department_tree.has_children(db, department_id):
+        raise HTTPException(status_code=400, detail="Department has sub-departments")
     db.delete(department)
     db.commit()
     return {"ok": True}
@@ -4,14 +4,14 @@ from datetime import date
 from decimal import Decimal, ROUND_HALF_UP
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Response
 from sqlalchemy import func, or_
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 from pydantic import ValidationError
 from starlette.datastructures import UploadFile as StarletteUploadFile
 
 from ..db import get_db
-from ..deps import get_current_user
+from ..deps import data_etag, field_projection, get_current_user, projected_response
 from ..models.type import Type
 from ..models.supplier import Supplier
 from ..models.purchase import Purchase, PurchaseStatusEnum
@@ -23,7 +23,12 @@ from ..schemas.purchase import (
     PurchaseRead,
     PurchaseUpdate,
 )
+from ..schemas.projection import projected_page
 from ..services.image_uploader import ImageUploadError, uploader
+from ..services.forecast import forget_models
+from ..services.period_snapshots import invalidate_periods
+from ..services import display_names  # noqa: F401  (registers the name-maintenance listener)
+from ..services import membership, tombstones
 
 logger = logging.getLogger(__name__)
 
@@ -75,13 +80,13 @@ def _apply_price_validation(payload: dict, current_purchase: Purchase | None = N
     return payload
 
 
-def _supplier_access_filter(current_user: User):
-    return Supplier.customers.any(User.id == current_user.id)
+def _supplier_access_filter(db: Session, current_user: User):
+    return membership.access_filter(db, current_user.id, membership.SUPPLIERS, Supplier.id)
 
 
 def _get_accessible_supplier(db: Session, current_user: User, supplier_id: int) -> Supplier | None:
     return (
-        db.query(Supplier).filter(Supplier.id == supplier_id, _supplier_access_filter(current_user)).first()
+        db.query(Supplier).filter(Supplier.id == supplier_id, _supplier_access_filter(db, current_user)).first()
     )
 
 
@@ -162,8 +167,9 @@ def _normalize_purchase_update_payload(payload: dict[str, Any]) -> dict[str, Any
     return normalized
 
 
-@router.get("/", response_model=PurchaseList)
+@router.get("/", response_model=PurchaseList, dependencies=[Depends(data_etag())])
 def list_purchases(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     type_id: int | None = None,
@@ -174,18 +180,12 @@ def list_purchases(
     date_to: date | None = None,
     amount_min: Decimal | None = None,
     amount_max: Decimal | None = None,
+    fields: frozenset[str] | None = Depends(field_projection(PurchaseRead)),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """List purchases with advanced filtering similar to sales."""
     query = db.query(Purchase).filter(Purchase.owner_id == current_user.id)
-    joined_supplier = False
-
-    def ensure_supplier_join():
-        nonlocal query, joined_supplier
-        if not joined_supplier:
-            query = query.join(Supplier)
-            joined_supplier = True
 
     if status:
         normalized_status = status.strip().lower()
@@ -201,12 +201,11 @@ def list_purchases(
     if supplier_id is not None:
         query = query.filter(Purchase.supplier_id == supplier_id)
     if search and search.strip():
-        ensure_supplier_join()
         keyword = f"%{search.strip().lower()}%"
         query = query.filter(
             or_(
                 func.lower(func.coalesce(Purchase.item_name, "")).like(keyword),
-                func.lower(func.coalesce(Supplier.name, "")).like(keyword),
+                func.lower(func.coalesce(Purchase.supplier_name, "")).like(keyword),
             )
         )
     if date_from is not None:
@@ -239,31 +238,14 @@ def list_purchases(
 
     total = query.count()
 
-    # Add eager loading to avoid N+1 queries
-    query = query.options(
-        joinedload(Purchase.supplier),
-        joinedload(Purchase.type),
-    )
-
-    items = query.order_by(Purchase.date.desc(), Purchase.id.desc()).offset(skip).limit(limit).all()
-
-    enriched = []
-    for purchase in items:
-        supplier = purchase.supplier
-        purchase_type = getattr(purchase, "type", None)
-
-        supplier_name = supplier.name if supplier else None
-        type_name = purchase_type.name if purchase_type else None
-
-        enriched.append(
-            PurchaseRead(
-                **purchase.__dict__,
-                supplier_name=supplier_name,
-                type_name=type_name,
-            )
-        )
-
-    return PurchaseList(items=enriched, total=total)
+    # Names come from the denormalized columns, so the page is a single-table read
+    query = query.order_by(Purchase.date.desc(), Purchase.id.desc()).offset(skip).limit(limit)
+    if fields is not None:
+        # Only the requested columns are selected
+        rows = query.with_entities(*(getattr(Purchase, name) for name in sorted(fields))).all()
+        page = projected_page(PurchaseRead, fields)(items=[dict(row._mapping) for row in rows], total=total)
+        return projected_response(page.model_dump_json().encode(), response)
+    return PurchaseList(items=[PurchaseRead.model_validate(purchase) for purchase in query.all()], total=total)
 
 
 @router.post("/", response_model=PurchaseRead)
@@ -282,7 +264,10 @@ def create_purchase(
             raise HTTPException(status_code=404, detail="Supplier not found")
     purchase = Purchase(**payload, owner_id=current_user.id)
     db.add(purchase)
+    affected_dates = [purchase.date]
+    invalidate_periods(db, Purchase, current_user.id, affected_dates)
     db.commit()
+    forget_models(current_user.id, affected_dates)
     db.refresh(purchase)
     return purchase
 
@@ -368,10 +353,14 @@ async def update_purchase(
         update_payload["image_url"] = new_image_url
 
     update_payload = _apply_price_validation(update_payload, current_purchase=purchase)
+    previous_date = purchase.date
     for k, v in update_payload.items():
         setattr(purchase, k, v)
     db.add(purchase)
+    affected_dates = [previous_date, purchase.date]
+    invalidate_periods(db, Purchase, current_user.id, affected_dates)
     db.commit()
+    forget_models(current_user.id, affected_dates)
     db.refresh(purchase)
 
     if previous_image_url and (
@@ -394,18 +383,19 @@ def delete_purchase(
     if not purchase:
         raise HTTPException(status_code=404, detail="Purchase not found")
 
-    # 记录图片URL以便在删除记录前删除图片
-    image_url = purchase.image_url
-
-    # 删除数据库记录
-    db.delete(purchase)
-    db.commit()
+    # 软删除：保留记录以便撤销，图片和记录由后台压缩任务在保留期后清除
+    tombstones.soft_delete(db, purchase)
+    return {"ok": True}
 
-    # 最佳努力删除七牛云上的图片
-    if image_url:
-        try:
-            uploader.delete(image_url)
-        except ImageUploadError as exc:
-            logger.warning("Failed to delete purchase image %s: %s", image_url, exc)
 
-    return {"ok": True}
+@router.post("/{purchase_id}/restore", response_model=PurchaseRead)
+def restore_purchase(
+    purchase_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+):
+    """撤销删除（仅在保留期内、记录尚未被清除时可用）"""
+    purchase = tombstones.get_deleted(db, Purchase, purchase_id, current_user.id)
+    if not purchase:
+        raise HTTPException(status_code=404, detail="Deleted purchase not found")
+    tombstones.restore(db, purchase)
+    db.refresh(purchase)
+    return purchase
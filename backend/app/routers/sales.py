@@ -2,24 +2,29 @@ from datetime import date
 from decimal import Decimal, ROUND_HALF_UP
 import json
 import logging
-from typing import Any
+from typing import Any, Callable
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Response
 from sqlalchemy import func, or_
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 from pydantic import ValidationError
 from starlette.datastructures import UploadFile as StarletteUploadFile
 
 from ..db import get_db
-from ..deps import get_current_user
-from ..models.company import Company
+from ..deps import data_etag, field_projection, get_current_user, projected_response
 from ..models.customer import Customer
 from ..models.sale import Sale, SaleStatusEnum
 from ..models.type import Type
 from ..models.user import User
+from ..schemas.department import DepartmentRead
+from ..schemas.projection import projected_page
 from ..schemas.sale import SaleCreate, SaleImageUploadResponse, SaleList, SaleRead, SaleUpdate
 from ..services.image_uploader import ImageUploadError, uploader
+from ..services.forecast import forget_models
+from ..services.period_snapshots import invalidate_periods
+from ..services import display_names  # noqa: F401  (registers the name-maintenance listener)
+from ..services import department_tree, membership, tombstones
 
 logger = logging.getLogger(__name__)
 
@@ -72,16 +77,63 @@ def _apply_price_validation(payload: dict, current_sale: Sale | None = None) ->
     return payload
 
 
-def _customer_access_filter(current_user: User):
-    return Customer.vendors.any(User.id == current_user.id)
+def _customer_access_filter(db: Session, current_user: User):
+    return membership.access_filter(db, current_user.id, membership.CUSTOMERS, Customer.id)
 
 
 def _get_accessible_customer(db: Session, current_user: User, customer_id: int) -> Customer | None:
     return (
-        db.query(Customer).filter(Customer.id == customer_id, _customer_access_filter(current_user)).first()
+        db.query(Customer).filter(Customer.id == customer_id, _customer_access_filter(db, current_user)).first()
     )
 
 
+def _display_overrides(column: Callable[[str], Any]) -> dict[str, Any]:
+    """Display defaults for missing references; ``column`` reads a column of the sale by name."""
+    overrides: dict[str, Any] = {}
+    if column("customer_id") is None:
+        overrides["customer_name"] = "陌生客户"
+    elif column("customer_company_id") == 0:
+        overrides["company_name"] = "个人客户"
+    if column("customer_department_id") is not None:
+        overrides["customer_department"] = DepartmentRead(
+            id=column("customer_department_id"),
+            name=column("department_name") or "",
+            company_id=column("department_company_id") or 0,
+        )
+    return overrides
+
+
+def _sale_read(sale: Sale) -> SaleRead:
+    """Serialize a sale for list pages, applying the display defaults for missing references."""
+    data = SaleRead.model_validate(sale)
+    for key, value in _display_overrides(lambda name: getattr(sale, name)).items():
+        setattr(data, key, value)
+    return data
+
+
+# Columns a projected field is derived from besides its own (see _display_overrides)
+_DERIVED_FROM = {
+    "customer_name": ("customer_id",),
+    "company_name": ("customer_id", "customer_company_id"),
+    "customer_department": ("customer_department_id", "department_name", "department_company_id"),
+}
+
+
+def _projected_sales(query, fields: frozenset[str], total: int, response: Response) -> Response:
+    """Select only the columns ``fields`` need and serialize them with a model of just those fields."""
+    columns = {name for name in fields if name != "customer_department"}
+    for name in fields:
+        columns.update(_DERIVED_FROM.get(name, ()))
+    items = []
+    for row in query.with_entities(*(getattr(Sale, name) for name in sorted(columns))):
+        values = row._mapping
+        item = {name: values[name] for name in fields if name in values}
+        item.update((key, value) for key, value in _display_overrides(values.get).items() if key in fields)
+        items.append(item)
+    page = projected_page(SaleRead, fields)(items=items, total=total)
+    return projected_response(page.model_dump_json().encode(), response)
+
+
 async def _parse_sale_update_request(request: Request) -> tuple[dict[str, Any], UploadFile | None]:
     content_type = request.headers.get("content-type", "").lower()
     if "multipart/form-data" in content_type:
@@ -170,38 +222,27 @@ def _normalize_update_payload_types(payload: dict[str, Any]) -> dict[str, Any]:
     return normalized
 
 
-@router.get("/", response_model=SaleList)
+@router.get("/", response_model=SaleList, dependencies=[Depends(data_etag())])
 def list_sales(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     type_id: int | None = None,
     customer_id: int | None = None,
     company_id: int | None = None,
+    department_id: int | None = None,
+    include_subdepartments: bool = False,
     status: str | None = None,
     search: str | None = None,
     date_from: date | None = None,
     date_to: date | None = None,
     amount_min: Decimal | None = None,
     amount_max: Decimal | None = None,
+    fields: frozenset[str] | None = Depends(field_projection(SaleRead)),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     query = db.query(Sale).filter(Sale.owner_id == current_user.id)
-    joined_customer = False
-    joined_company = False
-
-    def ensure_customer_join():
-        nonlocal query, joined_customer
-        if not joined_customer:
-            query = query.join(Customer)
-            joined_customer = True
-
-    def ensure_company_join():
-        nonlocal query, joined_company
-        ensure_customer_join()
-        if not joined_company:
-            query = query.outerjoin(Company, Customer.company_id == Company.id)
-            joined_company = True
 
     if status:
         normalized_status = status.strip().lower()
@@ -213,16 +254,19 @@ def list_sales(
     if customer_id is not None:
         query = query.filter(Sale.customer_id == customer_id)
     if company_id is not None:
-        ensure_customer_join()
-        query = query.filter(Customer.company_id == company_id)
+        query = query.filter(Sale.customer_company_id == company_id)
+    if department_id is not None:
+        if include_subdepartments:
+            query = query.filter(Sale.customer_department_id.in_(department_tree.subtree_ids(department_id)))
+        else:
+            query = query.filter(Sale.customer_department_id == department_id)
     if search and search.strip():
-        ensure_company_join()
         keyword = f"%{search.strip().lower()}%"
         query = query.filter(
             or_(
                 func.lower(func.coalesce(Sale.item_name, "")).like(keyword),
-                func.lower(func.coalesce(Customer.name, "")).like(keyword),
-                func.lower(func.coalesce(Company.name, "")).like(keyword),
+                func.lower(func.coalesce(Sale.customer_name, "")).like(keyword),
+                func.lower(func.coalesce(Sale.company_name, "")).like(keyword),
             )
         )
     if date_from is not None:
@@ -245,47 +289,11 @@ def list_sales(
 
     total = query.count()
 
-    # Add eager loading to avoid N+1 queries
-    query = query.options(
-        joinedload(Sale.customer).joinedload(Customer.company),
-        joinedload(Sale.customer).joinedload(Customer.department),
-        joinedload(Sale.type),
-    )
-
-    items = query.order_by(Sale.date.desc(), Sale.id.desc()).offset(skip).limit(limit).all()
-
-    # Enrich each sale with customer department info
-    enriched = []
-    from ..schemas.department import DepartmentRead
-
-    for sale in items:
-        customer = sale.customer
-        dept = getattr(customer, "department", None) if customer else None
-        company = getattr(customer, "company", None) if customer else None
-        sale_type = getattr(sale, "type", None)
-
-        company_name = None
-        customer_name = "陌生客户"
-
-        if customer:
-            customer_name = customer.name
-            if customer.company_id == 0:
-                company_name = "个人客户"
-            elif company:
-                company_name = company.name
-
-        enriched.append(
-            SaleRead(
-                **sale.__dict__,
-                customer_department_id=getattr(customer, "department_id", None) if customer else None,
-                customer_department=DepartmentRead.model_validate(dept) if dept else None,
-                company_name=company_name,
-                department_name=dept.name if dept else None,
-                customer_name=customer_name,
-                type_name=sale_type.name if sale_type else None,
-            )
-        )
-    return SaleList(items=enriched, total=total)
+    # Names come from the denormalized columns, so the page is a single-table read
+    query = query.order_by(Sale.date.desc(), Sale.id.desc()).offset(skip).limit(limit)
+    if fields is not None:
+        return _projected_sales(query, fields, total, response)
+    return SaleList(items=[_sale_read(sale) for sale in query.all()], total=total)
 
 
 @router.post("/", response_model=SaleRead)
@@ -304,7 +312,10 @@ def create_sale(
             raise HTTPException(status_code=404, detail="Customer not found")
     sale = Sale(**payload, owner_id=current_user.id)
     db.add(sale)
+    affected_dates = [sale.date]
+    invalidate_periods(db, Sale, current_user.id, affected_dates)
     db.commit()
+    forget_models(current_user.id, affected_dates)
     db.refresh(sale)
     return sale
 
@@ -383,10 +394,14 @@ async def update_sale(
         update_payload["image_url"] = new_image_url
 
     update_payload = _apply_price_validation(update_payload, current_sale=sale)
+    previous_date = sale.date
     for k, v in update_payload.items():
         setattr(sale, k, v)
     db.add(sale)
+    affected_dates = [previous_date, sale.date]
+    invalidate_periods(db, Sale, current_user.id, affected_dates)
     db.commit()
+    forget_models(current_user.id, affected_dates)
     db.refresh(sale)
     # Best-effort cleanup: delete previous image if replaced or explicitly removed
     if previous_image_url and (
@@ -405,18 +420,17 @@ def delete_sale(sale_id: int, db: Session = Depends(get_db), current_user: User
     if not sale:
         raise HTTPException(status_code=404, detail="Sale not found")
 
-    # 记录图片URL以便在删除记录前删除图片
-    image_url = sale.image_url
+    # 软删除：保留记录以便撤销，图片和记录由后台压缩任务在保留期后清除
+    tombstones.soft_delete(db, sale)
+    return {"ok": True}
 
-    # 删除数据库记录
-    db.delete(sale)
-    db.commit()
 
-    # 最佳努力删除七牛云上的图片
-    if image_url:
-        try:
-            uploader.delete(image_url)
-        except ImageUploadError as exc:
-            logger.warning("Failed to delete sale image %s: %s", image_url, exc)
-
-    return {"ok": True}
+@router.post("/{sale_id}/restore", response_model=SaleRead)
+def restore_sale(sale_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """撤销删除（仅在保留期内、记录尚未被清除时可用）"""
+    sale = tombstones.get_deleted(db, Sale, sale_id, current_user.id)
+    if not sale:
+        raise HTTPException(status_code=404, detail="Deleted sale not found")
+    tombstones.restore(db, sale)
+    db.refresh(sale)
+    return sale
@@ -1,23 +1,102 @@
+import json
 import logging
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 from typing import Any, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func, extract, and_
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, and_
 from sqlalchemy.orm import Session
 
+from ..core.config import settings
 from ..db import get_db
-from ..deps import get_current_user
-from ..models.purchase import Purchase
-from ..models.sale import Sale
+from ..deps import data_etag, get_current_user
+from ..models.purchase import OPEN_PURCHASE_CONDITION, Purchase
+from ..models.sale import OPEN_SALE_CONDITION, Sale
+from ..models.supplier import Supplier
 from ..models.user import User
 from ..models.customer import Customer
+from ..models.department import Department
+from ..models.department_path import department_path_table
+from ..services import department_tree, membership
+from ..services.aging import AGING_BUCKETS, aging_report
+from ..services.forecast import forecast_cash_flow
+from ..services.live_updates import live_updates
+from ..services.period_snapshots import SNAPSHOT_GRANULARITIES, period_totals
+from ..services.sales_rollups import company_department_breakdowns, customer_breakdown
+from ..services.summary import financial_summary
+from ..services.supplier_spend import supplier_spend
+from ..services.timeseries import (
+    DAY,
+    GRANULARITIES,
+    MONTH,
+    QUARTER,
+    WEEK,
+    YEAR,
+    BucketRange,
+    BucketSeries,
+    TrendSeries,
+    sql_bucket,
+    to_bucket_date,
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 单次请求允许的最大分桶数量（约10年的按天数据）
+MAX_BUCKETS = 3660
+
+# 仅指定 granularity 而未给出日期范围时的默认跨度（天）
+_DEFAULT_SPAN_DAYS = {DAY: 30, WEEK: 182, MONTH: 365, QUARTER: 730, YEAR: 1825}
+
+# 对比数据取最近的分桶数量
+_COMPARISON_WINDOW = {DAY: 30, WEEK: 12, MONTH: 12, QUARTER: 8, YEAR: 5}
+
+# 客户/公司/部门分析中单独列出的数量，其余合并为 others
+MAX_BREAKDOWN_SERIES = 5
+
+
+def _bucket_totals(db: Session, model, criteria, granularity: str):
+    """Return ``(bucket_date, amount)`` rows for ``model`` grouped at ``granularity``."""
+    bucket = sql_bucket(model.date, granularity)
+    rows = (
+        db.query(bucket, func.coalesce(func.sum(model.total_price), 0))
+        .filter(criteria)
+        .group_by(bucket)
+        .all()
+    )
+    return [(to_bucket_date(key), amount) for key, amount in rows]
+
+
+def _trend_totals(db: Session, model, criteria, owner_id: int, buckets: BucketRange):
+    """Bucket totals for a trend; closed months and years are served from snapshots."""
+    if buckets.granularity in SNAPSHOT_GRANULARITIES:
+        return period_totals(db, model, owner_id, buckets)
+    return _bucket_totals(db, model, criteria, buckets.granularity)
+
+
+def _shift_year(value: date, years: int) -> date:
+    try:
+        return value.replace(year=value.year + years)
+    except ValueError:  # 2月29日
+        return value.replace(year=value.year + years, day=28)
+
+
+def _analysis_range(start_date: Optional[date], end_date: Optional[date], granularity: str) -> BucketRange:
+    """分析类接口的分桶范围：缺省截止今天，起点按粒度取默认跨度"""
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail="Invalid granularity")
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=_DEFAULT_SPAN_DAYS[granularity])
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date cannot be after end_date")
+    buckets = BucketRange(start_date, end_date, granularity)
+    if buckets.size > MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail="Date range too large for the selected granularity")
+    return buckets
+
 
 @router.get("/summary")
 def get_financial_summary(
@@ -25,86 +104,191 @@ def get_financial_summary(
     current_user: User = Depends(get_current_user),
 ) -> dict[str, Any]:
     """获取财务统计数据，包括当月和年度的采购、销售总额及利润"""
-    today = date.today()
-    current_year = today.year
-    current_month = today.month
-
-    # 获取当月采购总额
-    monthly_purchase_total = (
-        db.query(func.coalesce(func.sum(Purchase.total_price), 0))
-        .filter(
-            Purchase.owner_id == current_user.id,
-            extract("year", Purchase.date) == current_year,
-            extract("month", Purchase.date) == current_month,
-        )
-        .scalar()
+    return financial_summary(db, current_user.id)
+
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def _summary_events(owner_id: int):
+    # 在生成器内订阅：响应未开始发送就断开的连接不会留下订阅
+    subscription, summary = await live_updates.subscribe(owner_id)
+    try:
+        # 首条事件带完整数据；retry 为断线后浏览器的重连间隔（毫秒）
+        yield f"retry: 3000\n{_sse('summary', summary)}"
+        while True:
+            delta = await subscription.next(settings.LIVE_UPDATES_HEARTBEAT_SECONDS)
+            # 空闲时发送注释行保活，同时尽早发现已断开的连接
+            yield _sse("delta", delta) if delta else ": keep-alive\n\n"
+    finally:
+        live_updates.unsubscribe(subscription)
+
+
+@router.get("/stream")
+async def stream_financial_summary(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> StreamingResponse:
+    """以 SSE 推送 /statistics/summary：先发送完整数据（summary），之后销售或采购变化时只发送变化的字段（delta）"""
+    owner_id = current_user.id
+    # 连接可能保持数小时，不占用数据库连接
+    db.close()
+    return StreamingResponse(
+        _summary_events(owner_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    # 获取当月销售总额
-    monthly_sale_total = (
-        db.query(func.coalesce(func.sum(Sale.total_price), 0))
-        .filter(
-            Sale.owner_id == current_user.id,
-            extract("year", Sale.date) == current_year,
-            extract("month", Sale.date) == current_month,
+
+@router.get("/aging")
+def get_aging_report(
+    as_of: Optional[date] = Query(None, description="账龄基准日 (YYYY-MM-DD)，默认今天"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> dict[str, Any]:
+    """应收/应付账龄分析：只统计未完结的销售(draft/sent)和采购(pending/ordered)，按客户/供应商分组"""
+    as_of = as_of or date.today()
+    return {
+        "asOf": as_of.isoformat(),
+        "buckets": list(AGING_BUCKETS),
+        "receivables": aging_report(
+            db, Sale, Sale.customer_id, Customer, OPEN_SALE_CONDITION, current_user.id, as_of, "陌生客户"
+        ),
+        "payables": aging_report(
+            db, Purchase, Purchase.supplier_id, Supplier, OPEN_PURCHASE_CONDITION, current_user.id, as_of
+        ),
+    }
+
+
+@router.get("/forecast")
+def get_cash_flow_forecast(
+    months: int = Query(6, ge=1, le=24, description="预测的月份数（从当月开始）"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> dict[str, Any]:
+    """现金流预测：基于历史月度销售/采购的季节性基线，预测未来若干个月的流入与流出"""
+    return forecast_cash_flow(db, current_user.id, months)
+
+
+@router.get("/suppliers")
+def get_supplier_analysis(
+    start_date: Optional[date] = Query(None, description="开始日期 (YYYY-MM-DD)，默认按粒度从 end_date 回溯"),
+    end_date: Optional[date] = Query(None, description="结束日期 (YYYY-MM-DD)，默认今天"),
+    granularity: str = Query(MONTH, description="分桶粒度: day/week/month/quarter/year"),
+    top: int = Query(5, ge=1, le=20, description="单独列出的供应商数量，其余合并为 others"),
+    items: int = Query(3, ge=0, le=10, description="每个供应商跟踪单价走势的商品数量"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> dict[str, Any]:
+    """供应商采购分析：按分桶统计前 top 个供应商的采购额（其余合并为 others），以及其主要商品的单价走势"""
+    buckets = _analysis_range(start_date, end_date, granularity)
+    return supplier_spend(db, current_user.id, buckets, top, items)
+
+
+@router.get("/departments/{department_id}")
+def get_department_rollup(
+    department_id: int,
+    start_date: Optional[date] = Query(None, description="开始日期 (YYYY-MM-DD)，默认按粒度从 end_date 回溯"),
+    end_date: Optional[date] = Query(None, description="结束日期 (YYYY-MM-DD)，默认今天"),
+    granularity: str = Query(MONTH, description="分桶粒度: day/week/month/quarter/year"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> dict[str, Any]:
+    """部门销售汇总（含全部下级部门）：按分桶的趋势，以及本部门直属和各直接下级部门（各含其下级）的合计"""
+    department = db.get(Department, department_id)
+    if not department or not membership.has_access(db, current_user.id, membership.COMPANIES, department.company_id):
+        raise HTTPException(status_code=404, detail="Department not found")
+    buckets = _analysis_range(start_date, end_date, granularity)
+    in_range = and_(Sale.owner_id == current_user.id, Sale.date >= buckets.start, Sale.date <= buckets.end)
+
+    trend = BucketSeries(buckets)
+    trend.scatter_add(
+        _bucket_totals(
+            db, Sale, and_(in_range, Sale.customer_department_id.in_(department_tree.subtree_ids(department_id))),
+            granularity,
         )
-        .scalar()
     )
 
-    # 获取年度采购总额
-    yearly_purchase_total = (
-        db.query(func.coalesce(func.sum(Purchase.total_price), 0))
-        .filter(Purchase.owner_id == current_user.id, extract("year", Purchase.date) == current_year)
-        .scalar()
+    # 每个直接下级部门的合计：经闭包表一次分组查询得到，与层级深度无关
+    children = (
+        db.query(Department.id, Department.name)
+        .filter(Department.parent_id == department_id)
+        .order_by(Department.name, Department.id)
+        .all()
     )
-
-    # 获取年度销售总额
-    yearly_sale_total = (
+    child_totals = {}
+    if children:
+        paths = department_path_table
+        child_totals = dict(
+            db.query(paths.c.ancestor_id, func.coalesce(func.sum(Sale.total_price), 0))
+            .select_from(Sale)
+            .join(paths, paths.c.descendant_id == Sale.customer_department_id)
+            .filter(in_range, paths.c.ancestor_id.in_([child_id for child_id, _ in children]))
+            .group_by(paths.c.ancestor_id)
+            .all()
+        )
+    direct = (
         db.query(func.coalesce(func.sum(Sale.total_price), 0))
-        .filter(Sale.owner_id == current_user.id, extract("year", Sale.date) == current_year)
+        .filter(in_range, Sale.customer_department_id == department_id)
         .scalar()
     )
 
-    # 计算利润
-    monthly_profit = float(monthly_sale_total) - float(monthly_purchase_total)
-    yearly_profit = float(yearly_sale_total) - float(yearly_purchase_total)
-
     return {
-        "monthly": {
-            "purchase_total": float(monthly_purchase_total),
-            "sale_total": float(monthly_sale_total),
-            "profit": monthly_profit,
-        },
-        "yearly": {
-            "purchase_total": float(yearly_purchase_total),
-            "sale_total": float(yearly_sale_total),
-            "profit": yearly_profit,
+        "department": {
+            "id": department.id,
+            "name": department.name,
+            "companyId": department.company_id,
+            "parentId": department.parent_id,
         },
+        "categories": buckets.labels(),
+        "granularity": granularity,
+        "total": float(trend.total),
+        "data": trend.tolist(),
+        "direct": float(direct),
+        "children": [
+            {"id": child_id, "name": name, "total": float(child_totals.get(child_id, 0))}
+            for child_id, name in children
+        ],
     }
 
 
-@router.get("/")
+# 默认日期范围和对比窗口以今天为准，ETag 按天变化
+@router.get("/", dependencies=[Depends(data_etag(daily=True))])
 def get_detailed_statistics(
     start_date: Optional[str] = Query(None, description="开始日期 (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="结束日期 (YYYY-MM-DD)"),
     analysis_type: Optional[str] = Query("yearly", description="分析类型: yearly(年度) 或 monthly(月度)"),
+    granularity: Optional[str] = Query(
+        None, description="分桶粒度: day/week/month/quarter/year，覆盖 analysis_type 的默认粒度"
+    ),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ) -> dict[str, Any]:
     """获取详细的统计数据，包括趋势分析、对比分析等"""
 
+    if granularity is not None and granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail="Invalid granularity")
+
     # 设置默认日期范围
     if not start_date or not end_date:
         end_date = date.today()
-        if analysis_type == "monthly":
+        if granularity is not None:
+            start_date = end_date - timedelta(days=_DEFAULT_SPAN_DAYS[granularity])
+        elif analysis_type == "monthly":
             # 月度分析：最近12个月
             start_date = end_date - timedelta(days=365)  # 12个月
         else:
             # 年度分析：最近6个月
             start_date = end_date - timedelta(days=180)  # 6个月
     else:
-        start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-        end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+        try:
+            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail="Invalid date format, expected YYYY-MM-DD") from exc
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date cannot be after end_date")
 
     # 基础过滤条件
     base_filter = and_(
@@ -112,241 +296,46 @@ def get_detailed_statistics(
     )
     sale_base_filter = and_(Sale.owner_id == current_user.id, Sale.date >= start_date, Sale.date <= end_date)
 
-    # 1. 获取概览数据
-    purchase_total = db.query(func.coalesce(func.sum(Purchase.total_price), 0)).filter(base_filter).scalar()
-    sale_total = db.query(func.coalesce(func.sum(Sale.total_price), 0)).filter(sale_base_filter).scalar()
-    profit = float(sale_total) - float(purchase_total)
-    profit_rate = float(profit) / float(sale_total)
-
-    # 2. 获取趋势数据
-    if analysis_type == "monthly":
-        # 月度分析：按天统计
-        purchase_trend = (
-            db.query(
-                extract("year", Purchase.date).label("year"),
-                extract("month", Purchase.date).label("month"),
-                extract("day", Purchase.date).label("day"),
-                func.coalesce(func.sum(Purchase.total_price), 0).label("purchase_amount"),
-            )
-            .filter(base_filter)
-            .group_by(
-                extract("year", Purchase.date), extract("month", Purchase.date), extract("day", Purchase.date)
-            )
-            .order_by("year", "month", "day")
-            .all()
-        )
-
-        sale_trend = (
-            db.query(
-                extract("year", Sale.date).label("year"),
-                extract("month", Sale.date).label("month"),
-                extract("day", Sale.date).label("day"),
-                func.coalesce(func.sum(Sale.total_price), 0).label("sale_amount"),
-            )
-            .filter(sale_base_filter)
-            .group_by(extract("year", Sale.date), extract("month", Sale.date), extract("day", Sale.date))
-            .order_by("year", "month", "day")
-            .all()
-        )
-
-        # 处理月度趋势数据
-        trend_data = {}
-        for trend in purchase_trend:
-            key = f"{int(trend.year)}-{int(trend.month):02d}-{int(trend.day):02d}"
-            trend_data[key] = {"purchase": float(trend.purchase_amount), "sale": 0.0}
-
-        for trend in sale_trend:
-            key = f"{int(trend.year)}-{int(trend.month):02d}-{int(trend.day):02d}"
-            if key in trend_data:
-                trend_data[key]["sale"] = float(trend.sale_amount)
-            else:
-                trend_data[key] = {"purchase": 0.0, "sale": float(trend.sale_amount)}
-
-        # 转换为前端需要的格式
-        days = sorted(trend_data.keys())
-        purchase_data = [trend_data[day]["purchase"] for day in days]
-        sale_data = [trend_data[day]["sale"] for day in days]
-        profit_data = [trend_data[day]["sale"] - trend_data[day]["purchase"] for day in days]
-
-        # 月度对比数据：最近30天
-        comparison_days = days[-30:] if len(days) > 30 else days
-        comparison_purchase_data = purchase_data[-30:] if len(purchase_data) > 30 else purchase_data
-        comparison_sale_data = sale_data[-30:] if len(sale_data) > 30 else sale_data
-
-    else:
-        # 年度分析：按月统计
-        monthly_trend = (
-            db.query(
-                extract("year", Purchase.date).label("year"),
-                extract("month", Purchase.date).label("month"),
-                func.coalesce(func.sum(Purchase.total_price), 0).label("purchase_amount"),
-            )
-            .filter(base_filter)
-            .group_by(extract("year", Purchase.date), extract("month", Purchase.date))
-            .order_by("year", "month")
-            .all()
-        )
-
-        monthly_sale_trend = (
-            db.query(
-                extract("year", Sale.date).label("year"),
-                extract("month", Sale.date).label("month"),
-                func.coalesce(func.sum(Sale.total_price), 0).label("sale_amount"),
-            )
-            .filter(sale_base_filter)
-            .group_by(extract("year", Sale.date), extract("month", Sale.date))
-            .order_by("year", "month")
-            .all()
+    # 各部分的分桶粒度：显式 granularity 优先，否则沿用 analysis_type 的默认值
+    trend_granularity = granularity or (DAY if analysis_type == "monthly" else MONTH)
+    customer_granularity = granularity or (MONTH if analysis_type == "monthly" else YEAR)
+    trend_buckets = BucketRange(start_date, end_date, trend_granularity)
+    customer_buckets = BucketRange(start_date, end_date, customer_granularity)
+    if max(trend_buckets.size, customer_buckets.size) > MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail="Date range too large for the selected granularity")
+
+    # 1. 获取趋势数据（按粒度分桶，概览总额由分桶的精确合计得到）
+    trend = TrendSeries(trend_buckets)
+    trend.purchase.scatter_add(_trend_totals(db, Purchase, base_filter, current_user.id, trend_buckets))
+    trend.sale.scatter_add(_trend_totals(db, Sale, sale_base_filter, current_user.id, trend_buckets))
+
+    # 2. 概览数据
+    purchase_total = trend.purchase_total
+    sale_total = trend.sale_total
+    profit = float(trend.profit_total)
+    profit_rate = profit / float(sale_total) if sale_total else 0.0
+
+    trend_categories = trend.buckets.labels()
+    # 对比数据：取最近的若干个分桶（按天30个，按月12个……）
+    window = _COMPARISON_WINDOW[trend_granularity]
+    comparison = trend.comparison(window)
+    if trend_granularity in SNAPSHOT_GRANULARITIES:
+        # 同比：对比窗口整体前移一年，历史月份/年份均来自快照
+        first_index = max(0, trend_buckets.size - window)
+        window_start = trend_buckets.bucket_start(first_index) if first_index else start_date
+        previous = TrendSeries(
+            BucketRange(_shift_year(window_start, -1), _shift_year(end_date, -1), trend_granularity)
         )
-
-        # 处理趋势数据
-        trend_data = {}
-        for trend in monthly_trend:
-            key = f"{int(trend.year)}-{int(trend.month):02d}"
-            trend_data[key] = {"purchase": float(trend.purchase_amount), "sale": 0.0}
-
-        for trend in monthly_sale_trend:
-            key = f"{int(trend.year)}-{int(trend.month):02d}"
-            if key in trend_data:
-                trend_data[key]["sale"] = float(trend.sale_amount)
-            else:
-                trend_data[key] = {"purchase": 0.0, "sale": float(trend.sale_amount)}
-
-        # 转换为前端需要的格式
-        months = sorted(trend_data.keys())
-        purchase_data = [trend_data[month]["purchase"] for month in months]
-        sale_data = [trend_data[month]["sale"] for month in months]
-        profit_data = [trend_data[month]["sale"] - trend_data[month]["purchase"] for month in months]
-
-        # 年度对比数据：最近12个月
-        comparison_months = months[-12:] if len(months) > 12 else months
-        comparison_purchase_data = purchase_data[-12:] if len(purchase_data) > 12 else purchase_data
-        comparison_sale_data = sale_data[-12:] if len(sale_data) > 12 else sale_data
-
-    # 3. 获取分类对比数据（按业务类型）
-    purchase_by_type = (
-        db.query(Purchase.type, func.coalesce(func.sum(Purchase.total_price), 0).label("amount"))
-        .filter(base_filter)
-        .group_by(Purchase.type)
-        .all()
+        previous.purchase.scatter_add(period_totals(db, Purchase, current_user.id, previous.buckets))
+        previous.sale.scatter_add(period_totals(db, Sale, current_user.id, previous.buckets))
+        comparison["previousYear"] = previous.comparison(window)
+
+    # 3. 客户、公司、部门销售额分析：均按 id 分组（同名客户不再合并），其余合并为 others
+    customer_series = customer_breakdown(db, sale_base_filter, customer_buckets, MAX_BREAKDOWN_SERIES)
+    company_series, department_series = company_department_breakdowns(
+        db, sale_base_filter, customer_buckets, MAX_BREAKDOWN_SERIES
     )
-
-    sale_by_type = (
-        db.query(Sale.type, func.coalesce(func.sum(Sale.total_price), 0).label("amount"))
-        .filter(sale_base_filter)
-        .group_by(Sale.type)
-        .all()
-    )
-
-    # 4. 获取客户销售额分析数据
-    customer_sales = []
-    categories = []
-
-    if analysis_type == "yearly":
-        # 年度分析：按年份和客户分组
-        customer_sales = (
-            db.query(
-                Customer.name.label("customer_name"),
-                extract("year", Sale.date).label("year"),
-                func.coalesce(func.sum(Sale.total_price), 0).label("sale_amount"),
-            )
-            .select_from(Sale)
-            .join(Customer, Sale.customer_id == Customer.id)
-            .filter(sale_base_filter)
-            .group_by(Customer.name, extract("year", Sale.date))
-            .order_by("year", "customer_name")
-            .all()
-        )
-
-        # 获取所有年份
-        years_query = (
-            db.query(extract("year", Sale.date).distinct().label("year"))
-            .filter(sale_base_filter)
-            .order_by("year")
-            .all()
-        )
-        categories = [str(int(year.year)) for year in years_query]
-    else:
-        # 月度分析：按月份和客户分组
-        customer_sales = (
-            db.query(
-                Customer.name.label("customer_name"),
-                extract("year", Sale.date).label("year"),
-                extract("month", Sale.date).label("month"),
-                func.coalesce(func.sum(Sale.total_price), 0).label("sale_amount"),
-            )
-            .select_from(Sale)
-            .join(Customer, Sale.customer_id == Customer.id)
-            .filter(sale_base_filter)
-            .group_by(Customer.name, extract("year", Sale.date), extract("month", Sale.date))
-            .order_by("year", "month", "customer_name")
-            .all()
-        )
-
-        # 获取所有月份
-        months_query = (
-            db.query(extract("year", Sale.date).label("year"), extract("month", Sale.date).label("month"))
-            .filter(sale_base_filter)
-            .group_by("year", "month")
-            .order_by("year", "month")
-            .all()
-        )
-        categories = [f"{int(month.year)}-{int(month.month):02d}" for month in months_query]
-
-    # 构建客户销售额数据结构
-    customer_data = {}
-    customers = set()
-
-    for sale in customer_sales:
-        customer = sale.customer_name
-        customers.add(customer)
-
-        if analysis_type == "yearly":
-            key = str(int(sale.year))
-        else:
-            key = f"{int(sale.year)}-{int(sale.month):02d}"
-
-        if key not in customer_data:
-            customer_data[key] = {}
-        customer_data[key][customer] = float(sale.sale_amount)
-
-    # 初始化每个分类的所有客户数据（确保所有客户在每个分类都有数据点）
-    customers = sorted(list(customers))
-    for category in categories:
-        if category not in customer_data:
-            customer_data[category] = {}
-        for customer in customers:
-            if customer not in customer_data[category]:
-                customer_data[category][customer] = 0.0
-
-    # 计算每个客户的总销售额
-    customer_totals = {}
-    for customer in customers:
-        total = sum(customer_data[category].get(customer, 0.0) for category in categories)
-        customer_totals[customer] = total
-
-    # 按销售额排序客户
-    sorted_customers = sorted(customers, key=lambda c: customer_totals[c], reverse=True)
-
-    # 限制最多显示客户，其余合并为others
-    MAX_CUSTOMERS = 5
-    top_customers = sorted_customers[:MAX_CUSTOMERS]
-    others = sorted_customers[MAX_CUSTOMERS:]
-
-    # 准备前端需要的数据格式
-    customer_series = []
-    for customer in top_customers:
-        series_data = [customer_data[category].get(customer, 0.0) for category in categories]
-        customer_series.append({"name": customer, "type": "line", "stack": "Total", "data": series_data})
-
-    # 如果有其他客户，合并为others
-    if others:
-        others_data = []
-        for category in categories:
-            category_others_total = sum(customer_data[category].get(c, 0.0) for c in others)
-            others_data.append(category_others_total)
-
-        customer_series.append({"name": "others", "type": "line", "stack": "Total", "data": others_data})
+    customer_categories = customer_buckets.labels()
 
     return {
         "overview": {
@@ -356,26 +345,41 @@ def get_detailed_statistics(
             "profitRate": profit_rate,
         },
         "trend": {
-            "categories": days if analysis_type == "monthly" else months,
-            "purchaseData": purchase_data,
-            "saleData": sale_data,
+            "categories": trend_categories,
+            "purchaseData": trend.purchase.tolist(),
+            "saleData": trend.sale.tolist(),
             "analysisType": analysis_type,
+            "granularity": trend_granularity,
         },
         "comparison": {
-            "categories": comparison_days if analysis_type == "monthly" else comparison_months,
-            "purchaseData": comparison_purchase_data,
-            "saleData": comparison_sale_data,
+            **comparison,
             "analysisType": analysis_type,
+            "granularity": trend_granularity,
         },
         "profit": {
-            "categories": days if analysis_type == "monthly" else months,
-            "profitData": profit_data,
+            "categories": trend_categories,
+            "profitData": trend.profit().tolist(),
+            "cumulativeData": trend.cumulative_profit().tolist(),
             "analysisType": analysis_type,
+            "granularity": trend_granularity,
         },
         "ratio": {"purchaseTotal": float(purchase_total), "saleTotal": float(sale_total)},
         "customerAnalysis": {
-            "categories": categories,
+            "categories": customer_categories,
             "series": customer_series,
             "analysisType": analysis_type,
+            "granularity": customer_granularity,
+        },
+        "companyAnalysis": {
+            "categories": customer_categories,
+            "series": company_series,
+            "analysisType": analysis_type,
+            "granularity": customer_granularity,
+        },
+        "departmentAnalysis": {
+            "categories": customer_categories,
+            "series": department_series,
+            "analysisType": analysis_type,
+            "granularity": customer_granularity,
         },
     }
@@ -9,12 +9,14 @@ from ..models.purchase import Purchase
 from ..models.user import User
 
 from ..schemas.supplier import SupplierCreate, SupplierRead, SupplierUpdate
+from ..schemas.suggest import Suggestion
+from ..services import membership, suggest
 
 router = APIRouter()
 
 
-def _supplier_access_filter(current_user: User):
-    return Supplier.customers.any(User.id == current_user.id)
+def _supplier_access_filter(db: Session, current_user: User):
+    return membership.access_filter(db, current_user.id, membership.SUPPLIERS, Supplier.id)
 
 
 @router.get("/", response_model=list[SupplierRead])
@@ -25,7 +27,7 @@ def list_suppliers(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    access_filter = _supplier_access_filter(current_user)
+    access_filter = _supplier_access_filter(db, current_user)
     query = db.query(Supplier).filter(access_filter)
     if q:
         like = f"%{q}%"
@@ -47,7 +49,7 @@ def count_suppliers(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    access_filter = _supplier_access_filter(current_user)
+    access_filter = _supplier_access_filter(db, current_user)
     query = db.query(Supplier).filter(access_filter)
     if q:
         like = f"%{q}%"
@@ -62,13 +64,26 @@ def count_suppliers(
     return query.count()
 
 
+@router.get("/suggest", response_model=list[Suggestion])
+def suggest_suppliers(
+    q: str | None = None,
+    limit: int = 10,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """按名称前缀（或拼音首字母）联想供应商，供选择框输入时调用。"""
+    if not 1 <= limit <= suggest.MAX_SUGGESTIONS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {suggest.MAX_SUGGESTIONS}")
+    return suggest.suggest(db, current_user.id, suggest.SUPPLIERS, q, limit)
+
+
 @router.post("/", response_model=SupplierRead)
 def create_supplier(
     data: SupplierCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    access_filter = _supplier_access_filter(current_user)
+    access_filter = _supplier_access_filter(db, current_user)
     payload = data.model_dump()
     existing = db.query(Supplier).filter(Supplier.name == payload.get("name"), access_filter).first()
     if existing:
@@ -89,7 +104,7 @@ def get_supplier(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    access_filter = _supplier_access_filter(current_user)
+    access_filter = _supplier_access_filter(db, current_user)
     supplier = db.query(Supplier).filter(Supplier.id == supplier_id, access_filter).first()
     if not supplier:
         raise HTTPException(status_code=404, detail="Supplier not found")
@@ -103,7 +118,7 @@ def update_supplier(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    access_filter = _supplier_access_filter(current_user)
+    access_filter = _supplier_access_filter(db, current_user)
     supplier = db.query(Supplier).filter(Supplier.id == supplier_id, access_filter).first()
     if not supplier:
         raise HTTPException(status_code=404, detail="Supplier not found")
@@ -124,7 +139,7 @@ def delete_supplier(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    access_filter = _supplier_access_filter(current_user)
+    access_filter = _supplier_access_filter(db, current_user)
     supplier = db.query(Supplier).filter(Supplier.id == supplier_id, access_filter).first()
     if not supplier:
         raise HTTPException(status_code=404, detail="Supplier not found")
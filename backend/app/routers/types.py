@@ -2,17 +2,19 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from ..db import get_db
-from ..deps import get_current_user
+from ..deps import data_etag, get_current_user
 from ..models.type import Type
 from ..models.purchase import Purchase
 from ..models.sale import Sale
 from ..models.user import User
 from ..schemas.type import TypeCreate, TypeRead, TypeUpdate
+from ..schemas.suggest import Suggestion
+from ..services import suggest
 
 router = APIRouter()
 
 
-@router.get("/", response_model=list[TypeRead])
+@router.get("/", response_model=list[TypeRead], dependencies=[Depends(data_etag())])
 def list_types(
     skip: int = 0,
     limit: int = 100,
@@ -38,6 +40,19 @@ def count_types(
     return query.count()
 
 
+@router.get("/suggest", response_model=list[Suggestion])
+def suggest_types(
+    q: str | None = None,
+    limit: int = 10,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """按名称前缀（或拼音首字母）联想类型，供选择框输入时调用。"""
+    if not 1 <= limit <= suggest.MAX_SUGGESTIONS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {suggest.MAX_SUGGESTIONS}")
+    return suggest.suggest(db, current_user.id, suggest.TYPES, q, limit)
+
+
 @router.post("/", response_model=TypeRead, status_code=201)
 def create_type(
     data: TypeCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
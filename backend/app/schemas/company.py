@@ -31,3 +31,10 @@ class CompanyRead(CompanyBase):
     departments: list[DepartmentRead] = []
     # Pydantic v2 style config
     model_config = ConfigDict(from_attributes=True)
+
+
+class CompanySummary(CompanyRead):
+    """Row of the companies listing; ``departments`` is None when they were not requested."""
+
+    departments: Optional[list[DepartmentRead]] = None
+    member_count: int = 0
@@ -35,3 +35,16 @@ class CustomerRead(CustomerBase):
 class CustomerGroup(BaseModel):
     company_id: int
     customers: list[CustomerRead]
+
+
+class CustomerDirectoryGroup(BaseModel):
+    company_id: int
+    company_name: Optional[str] = None
+    member_count: int
+    customers: list[CustomerRead] = []
+
+
+class CustomerDirectory(BaseModel):
+    groups: list[CustomerDirectoryGroup]
+    total_groups: int
+    total_customers: int
@@ -8,6 +8,7 @@ from pydantic import BaseModel, ConfigDict, Field
 class DepartmentBase(BaseModel):
     name: str
     company_id: int
+    parent_id: Optional[int] = None
 
 
 class DepartmentCreate(DepartmentBase):
@@ -17,6 +18,7 @@ class DepartmentCreate(DepartmentBase):
 class DepartmentUpdate(BaseModel):
     name: Optional[str] = None
     company_id: Optional[int] = None
+    parent_id: Optional[int] = None
 
 
 class DepartmentRead(DepartmentBase):
@@ -0,0 +1,44 @@
+"""Response models for sparse fieldsets (``?fields=`` on list endpoints).
+
+``projected_model`` derives a model with only the requested fields of a read
+schema, keeping their types and defaults; models are built once per distinct
+projection and cached, so a table view that always asks for the same columns
+always gets the same class.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+from pydantic import BaseModel, ConfigDict, create_model
+
+
+def parse_fields(
+    fields: str | None, model: type[BaseModel], always: tuple[str, ...] = ("id",)
+) -> frozenset[str] | None:
+    """The field names in a comma-separated ``fields`` value, or ``None`` for every field.
+
+    Raises ``ValueError`` listing names ``model`` does not have.
+    """
+    if fields is None or not fields.strip():
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - model.model_fields.keys()
+    if unknown:
+        raise ValueError(", ".join(sorted(unknown)))
+    return frozenset(requested | set(always))
+
+
+@lru_cache(maxsize=256)
+def projected_model(model: type[BaseModel], fields: frozenset[str]) -> type[BaseModel]:
+    """``model`` restricted to ``fields``, in ``model``'s field order."""
+    definitions = {name: (info.annotation, info) for name, info in model.model_fields.items() if name in fields}
+    name = f"{model.__name__}[{','.join(definitions)}]"
+    return create_model(name, __config__=ConfigDict(from_attributes=True), **definitions)
+
+
+@lru_cache(maxsize=256)
+def projected_page(model: type[BaseModel], fields: frozenset[str]) -> type[BaseModel]:
+    """``{"items": [...], "total": n}`` page of ``projected_model(model, fields)``."""
+    item = projected_model(model, fields)
+    return create_model(f"Page[{item.__name__}]", items=(list[item], ...), total=(int, ...))
@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class Suggestion(BaseModel):
+    id: int
+    name: str
@@ -9,7 +9,7 @@ class UserBase(BaseModel):
 
 class UserCreate(UserBase):
     company_name: str
-    enc_password: str  # RSA-encrypted password (base64)
+    enc_password: str  # RSA-encrypted password (base64) or session ciphertext from /auth/handshake
 
 
 class UserRead(UserBase):
@@ -28,6 +28,11 @@ class UserProfileUpdate(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: str | None = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 
 class LoginRequest(BaseModel):
@@ -38,3 +43,14 @@ class LoginRequest(BaseModel):
 class ChangePasswordRequest(BaseModel):
     enc_current_password: str
     enc_new_password: str
+
+
+class HandshakeRequest(BaseModel):
+    client_public: str  # raw X25519 public key (base64/base64url)
+
+
+class HandshakeResponse(BaseModel):
+    alg: str
+    session_id: str
+    server_public: str  # raw X25519 public key (base64url)
+    expires_in: int
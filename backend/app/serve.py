@@ -0,0 +1,44 @@
+"""Production launcher: prepare once, then serve with several uvicorn workers.
+
+    python -m app.serve --workers 4
+
+Schema migration and key generation run here, in the parent, before any
+worker starts (see ``app.startup``); each worker's lifespan then only checks
+that they are done. Without ``cache.backend: sqlite`` every worker keeps its
+own cache: cached data is recomputed per worker, invalidations (for instance
+of membership after a link changes) only reach the worker that handled the
+write, and a password transport session from ``/auth/handshake`` is only
+known to the worker that created it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+
+import uvicorn
+
+from . import db, startup
+from .core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the Financial Manager API with multiple workers")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if startup.prepare(db.engine):
+        logger.info("database schema upgraded to revision %s", startup.head_revision())
+    db.engine.dispose()  # workers open their own connections
+    if args.workers > 1 and settings.CACHE_BACKEND != "sqlite":
+        logger.warning("%s workers with a per-process cache; set cache.backend to sqlite to share it", args.workers)
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=max(1, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Receivable / payable aging over open (non-terminal) sales and purchases."""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import Date, case, func, literal_column, text
+from sqlalchemy.orm import Session
+
+AGING_BUCKETS = ("0-30", "31-60", "61-90", "90+")
+
+
+def _age_bucket(column, as_of: date):
+    return case(
+        (column >= as_of - timedelta(days=30), 0),
+        (column >= as_of - timedelta(days=60), 1),
+        (column >= as_of - timedelta(days=90), 2),
+        else_=3,
+    )
+
+
+def aging_report(
+    db: Session,
+    model,
+    party_column,
+    party_model,
+    open_condition: str,
+    owner_id: int,
+    as_of: date,
+    unknown_name: str | None = None,
+) -> dict:
+    """Outstanding amounts of ``model`` per party, bucketed by age in days.
+
+    ``open_condition`` must be the literal predicate of the model's partial
+    index so the scan only touches open rows. Items dated after ``as_of`` did
+    not exist yet on that day and are left out.
+    """
+    bucket = _age_bucket(model.date, as_of)
+    # Unary plus keeps SQLite from picking the (owner_id, date) range over the
+    # covering open-items index; nearly every open item is dated before as_of.
+    unindexed_date = literal_column(f"+{model.__tablename__}.date", type_=Date)
+    rows = (
+        db.query(party_column, bucket, func.coalesce(func.sum(model.total_price), 0))
+        .filter(model.owner_id == owner_id, unindexed_date <= as_of, text(open_condition))
+        .group_by(party_column, bucket)
+        .all()
+    )
+
+    amounts: dict[int | None, list[Decimal]] = {}
+    for party_id, index, amount in rows:
+        slots = amounts.setdefault(party_id, [Decimal(0)] * len(AGING_BUCKETS))
+        slots[int(index)] += Decimal(str(amount))
+
+    known_ids = [party_id for party_id in amounts if party_id is not None]
+    names = {}
+    if known_ids:
+        names = dict(db.query(party_model.id, party_model.name).filter(party_model.id.in_(known_ids)).all())
+
+    bucket_totals = [Decimal(0)] * len(AGING_BUCKETS)
+    items = []
+    for party_id, slots in amounts.items():
+        for index, amount in enumerate(slots):
+            bucket_totals[index] += amount
+        items.append(
+            {
+                "id": party_id,
+                "name": names.get(party_id, unknown_name) if party_id is not None else unknown_name,
+                "amounts": [float(amount) for amount in slots],
+                "total": sum(slots, Decimal(0)),
+            }
+        )
+    items.sort(key=lambda item: (-item["total"], item["name"] or ""))
+    for item in items:
+        item["total"] = float(item["total"])
+
+    return {
+        "bucketTotals": [float(amount) for amount in bucket_totals],
+        "total": float(sum(bucket_totals, Decimal(0))),
+        "items": items,
+    }
@@ -0,0 +1,263 @@
+"""Change-data-capture log of sales, purchases and the entities they reference.
+
+An ``after_flush`` listener appends one ``change_log`` row per inserted,
+updated or deleted object of a ``TRACKED`` model, in the flush's own
+transaction: a change and its log entry commit or roll back together.
+Entries carry the changed columns as ``[old, new]`` (every non-empty column
+for inserts and deletes) and vendor links added or removed from either side
+as ``{"added": [...], "removed": [...]}`` user ids.
+
+Consumers tail the log from a watermark, the last entry id they processed,
+which is kept per consumer name in ``change_log_consumers``. ``consume``
+passes a batch to a handler and advances the watermark in the same
+transaction as whatever the handler wrote, so a consumer resumes exactly
+where it stopped after a restart. SQLite has one writer at a time, so ids
+are assigned in commit order and a watermark never skips an entry that
+commits later.
+
+Logging a change also bumps the affected ``data_versions`` counters.
+
+Writes that bypass the ORM unit of work (bulk ``UPDATE``/``DELETE``) are not
+seen by the listener; they call ``record`` themselves. The denormalized name
+updates of ``display_names`` are derived data and are not logged.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any
+
+from sqlalchemy import delete, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from ..models.change_log import change_log_consumer_table as consumers
+from ..models.change_log import change_log_table as log
+from ..models.company import Company
+from ..models.customer import Customer
+from ..models.department import Department
+from ..models.purchase import Purchase
+from ..models.sale import Sale
+from ..models.supplier import Supplier
+from ..models.type import Type
+from ..models.user import User
+from . import data_versions
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+TRACKED = (Sale, Purchase, Customer, Supplier, Company, Department, Type)
+
+# model -> its relationship to linked users, and the user-side name of the same link
+_LINKS = {
+    Customer: ("vendors", "customers"),
+    Supplier: ("customers", "suppliers"),
+    Company: ("vendors", "customer_companies"),
+}
+
+MAX_BATCH = 1000
+
+
+def _json(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _row_values(obj) -> dict[str, Any]:
+    # Loaded values only: a deleted object must not be refreshed from its (gone) row
+    state = inspect(obj)
+    values = {}
+    for column in state.mapper.column_attrs:
+        value = state.dict.get(column.key)
+        if value is not None:
+            values[column.key] = _json(value)
+    return values
+
+
+def _column_changes(obj) -> dict[str, list]:
+    state = inspect(obj)
+    changes = {}
+    for column in state.mapper.column_attrs:
+        history = state.attrs[column.key].history
+        if history.has_changes():
+            old = history.deleted[0] if history.deleted else None
+            new = history.added[0] if history.added else None
+            if old != new:
+                changes[column.key] = [_json(old), _json(new)]
+    return changes
+
+
+def _link_changes(obj, relationship: str) -> dict[str, list[int]]:
+    history = inspect(obj).attrs[relationship].history
+    added = sorted(user.id for user in history.added)
+    removed = sorted(user.id for user in history.deleted)
+    result = {}
+    if added:
+        result["added"] = added
+    if removed:
+        result["removed"] = removed
+    return result
+
+
+def _entry(obj, operation: str, changes: dict, now: datetime) -> dict:
+    return {
+        "table_name": obj.__tablename__,
+        "row_id": obj.id,
+        "operation": operation,
+        "owner_id": getattr(obj, "owner_id", None),
+        "changes": changes,
+        "changed_at": now,
+    }
+
+
+@event.listens_for(Session, "after_flush")
+def _capture(session: Session, flush_context) -> None:
+    now = datetime.now(timezone.utc)
+    entries: list[dict] = []
+    # (table, row id) -> pending update entry, so link changes from either side merge into it
+    updates: dict[tuple[str, int], dict] = {}
+
+    for obj in session.new:
+        if isinstance(obj, TRACKED):
+            values = {key: [None, value] for key, value in _row_values(obj).items()}
+            entries.append(_entry(obj, INSERT, values, now))
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            for relationship, user_side in _LINKS.values():
+                history = inspect(obj).attrs[user_side].history
+                for target, side in [(item, "added") for item in history.added] + [
+                    (item, "removed") for item in history.deleted
+                ]:
+                    entry = updates.get((target.__tablename__, target.id))
+                    if entry is None:
+                        entry = updates[(target.__tablename__, target.id)] = _entry(target, UPDATE, {}, now)
+                    link = entry["changes"].setdefault(relationship, {})
+                    ids = link.setdefault(side, [])
+                    if obj.id not in ids:
+                        ids.append(obj.id)
+            continue
+        if not isinstance(obj, TRACKED) or obj in session.new:
+            continue
+        changes = _column_changes(obj)
+        if type(obj) in _LINKS:
+            links = _link_changes(obj, _LINKS[type(obj)][0])
+            if links:
+                changes[_LINKS[type(obj)][0]] = links
+        if changes:
+            entry = updates.get((obj.__tablename__, obj.id))
+            if entry is None:
+                updates[(obj.__tablename__, obj.id)] = _entry(obj, UPDATE, changes, now)
+            else:
+                entry["changes"].update(changes)
+    for obj in session.deleted:
+        if isinstance(obj, TRACKED):
+            values = {key: [value, None] for key, value in _row_values(obj).items()}
+            entries.append(_entry(obj, DELETE, values, now))
+
+    entries.extend(entry for entry in updates.values() if entry["changes"])
+    if entries:
+        connection = session.connection()
+        connection.execute(insert(log), entries)
+        data_versions.bump(connection, [entry["owner_id"] for entry in entries], now)
+
+
+def record(db: Session, model, operation: str, rows: Iterable[tuple[int, int | None]]) -> None:
+    """Log a write made outside the unit of work (e.g. a bulk delete) to ``(row id, owner id)`` rows.
+
+    Runs in the caller's transaction; the entries carry no column changes.
+    """
+    now = datetime.now(timezone.utc)
+    entries = [
+        {
+            "table_name": model.__tablename__,
+            "row_id": row_id,
+            "operation": operation,
+            "owner_id": owner_id,
+            "changes": {},
+            "changed_at": now,
+        }
+        for row_id, owner_id in rows
+    ]
+    if entries:
+        db.execute(insert(log), entries)
+        data_versions.bump(db.connection(), [entry["owner_id"] for entry in entries], now)
+
+
+def changes_since(db: Session, watermark: int, limit: int = MAX_BATCH, tables: Iterable[str] | None = None) -> list:
+    """Entries after ``watermark`` in id order, optionally only for ``tables``."""
+    query = select(log).where(log.c.id > watermark).order_by(log.c.id).limit(min(limit, MAX_BATCH))
+    if tables is not None:
+        query = query.where(log.c.table_name.in_(list(tables)))
+    return db.execute(query).all()
+
+
+def latest_id(db: Session) -> int:
+    return db.execute(select(func.coalesce(func.max(log.c.id), 0))).scalar_one()
+
+
+def watermark(db: Session, consumer: str) -> int:
+    """Last id ``consumer`` processed; a new consumer starts at the current end of the log."""
+    value = db.execute(select(consumers.c.watermark).where(consumers.c.name == consumer)).scalar()
+    if value is None:
+        value = latest_id(db)
+        db.execute(
+            insert(consumers)
+            .prefix_with("OR IGNORE")
+            .values(name=consumer, watermark=value, updated_at=datetime.now(timezone.utc))
+        )
+        db.commit()
+    return value
+
+
+def consume(
+    db: Session,
+    consumer: str,
+    handler: Callable[[Session, list], None],
+    tables: Iterable[str] | None = None,
+    batch_size: int = MAX_BATCH,
+) -> int:
+    """Feed entries after ``consumer``'s watermark to ``handler`` in batches; return how many were handled.
+
+    Each batch commits the handler's writes together with the new watermark.
+    If the handler raises, the batch rolls back and is retried on the next call.
+    """
+    wanted_tables = None if tables is None else set(tables)
+    handled = 0
+    current = watermark(db, consumer)
+    while True:
+        # Entries for other tables are skipped but still move the watermark
+        batch = changes_since(db, current, batch_size)
+        if not batch:
+            return handled
+        wanted = batch if wanted_tables is None else [entry for entry in batch if entry.table_name in wanted_tables]
+        try:
+            if wanted:
+                handler(db, wanted)
+            current = batch[-1].id
+            db.execute(
+                update(consumers)
+                .where(consumers.c.name == consumer)
+                .values(watermark=current, updated_at=datetime.now(timezone.utc))
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        handled += len(wanted)
+
+
+def prune(db: Session, retention: timedelta, now: datetime | None = None) -> int:
+    """Delete entries older than ``retention`` that every consumer has processed."""
+    cutoff = (now or datetime.now(timezone.utc)) - retention
+    lowest = db.execute(select(func.min(consumers.c.watermark))).scalar()
+    criteria = [log.c.changed_at < cutoff]
+    if lowest is not None:
+        criteria.append(log.c.id <= lowest)
+    result = db.execute(delete(log).where(*criteria))
+    db.commit()
+    return result.rowcount
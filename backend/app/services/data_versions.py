@@ -0,0 +1,65 @@
+"""Per-user data versions behind conditional GETs.
+
+Every change written to the change log (see ``changelog``) also bumps a
+counter in ``data_versions``, in the same transaction: the owner's counter
+for owner-scoped rows (sales, purchases, types) and the shared one
+(``SHARED``) for customers, suppliers, companies and departments, which reach
+users through vendor links. What a user can read is unchanged as long as both
+of their counters are, so a list or statistics endpoint can answer
+``If-None-Match`` from one primary-key lookup (``app.deps.data_etag``)
+without running its own queries.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from ..models.data_version import data_version_table as versions
+
+SHARED = 0
+
+
+class DataVersion(NamedTuple):
+    own: int
+    shared: int
+    modified_at: datetime | None
+
+
+def bump(connection: Connection, owner_ids: Iterable[int | None], now: datetime) -> None:
+    """Increment the counters of ``owner_ids``; ``None`` stands for a shared row."""
+    scopes = sorted({SHARED if owner_id is None else owner_id for owner_id in owner_ids})
+    if not scopes:
+        return
+    statement = insert(versions)
+    statement = statement.on_conflict_do_update(
+        index_elements=[versions.c.scope],
+        set_={"version": versions.c.version + 1, "updated_at": statement.excluded.updated_at},
+    )
+    connection.execute(statement, [{"scope": scope, "version": 1, "updated_at": now} for scope in scopes])
+
+
+def lookup(db: Session, user_id: int) -> DataVersion:
+    """The counters ``user_id``'s data depends on, and when the later of them last moved."""
+    rows = db.execute(
+        select(versions.c.scope, versions.c.version, versions.c.updated_at).where(
+            versions.c.scope.in_([user_id, SHARED])
+        )
+    ).all()
+    own = shared = 0
+    modified_at = None
+    for scope, version, updated_at in rows:
+        if scope == SHARED:
+            shared = version
+        else:
+            own = version
+        if updated_at.tzinfo is None:  # SQLite drops the offset; values are written in UTC
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        modified_at = updated_at if modified_at is None else max(modified_at, updated_at)
+    return DataVersion(own, shared, modified_at)
@@ -0,0 +1,111 @@
+"""Department hierarchy stored as a closure table.
+
+``department_paths`` holds a row for every (ancestor, descendant) pair of the
+``Department.parent_id`` tree, each department included as its own ancestor at
+depth 0. "This division and all of its teams" is then a single indexed lookup
+(``descendant_id IN (SELECT descendant_id ... WHERE ancestor_id = ?)``) or
+join, however deep the tree is, instead of one query per level.
+
+An ``after_flush`` listener keeps the table in step with the ORM: inserting a
+department copies its parent's ancestor rows, re-parenting one re-links its
+whole subtree, and deleting one drops its rows. Callers must keep
+``parent_id`` acyclic and within the same company (see ``is_in_subtree``).
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import event, exists, insert, inspect, literal, select, true
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session, aliased
+
+from ..models.department import Department
+from ..models.department_path import department_path_table as paths
+
+
+def subtree_ids(department_id: int):
+    """Subquery of ``department_id`` and every department below it."""
+    return select(paths.c.descendant_id).where(paths.c.ancestor_id == department_id)
+
+
+def is_in_subtree(db: Session, ancestor_id: int, department_id: int) -> bool:
+    """Whether ``department_id`` is ``ancestor_id`` or one of its descendants."""
+    row = db.execute(
+        select(paths.c.depth).where(paths.c.ancestor_id == ancestor_id, paths.c.descendant_id == department_id)
+    ).first()
+    return row is not None
+
+
+def has_children(db: Session, department_id: int) -> bool:
+    return db.query(Department.id).filter(Department.parent_id == department_id).first() is not None
+
+
+def _link(connection: Connection, department_id: int, parent_id: int | None) -> None:
+    connection.execute(insert(paths).values(ancestor_id=department_id, descendant_id=department_id, depth=0))
+    if parent_id is not None:
+        connection.execute(
+            insert(paths).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(paths.c.ancestor_id, literal(department_id), paths.c.depth + 1).where(
+                    paths.c.descendant_id == parent_id
+                ),
+            )
+        )
+
+
+def _move(connection: Connection, department_id: int, parent_id: int | None) -> None:
+    subtree = select(paths.c.descendant_id).where(paths.c.ancestor_id == department_id)
+    # Detach the subtree from its former ancestors, keeping its internal paths
+    connection.execute(
+        paths.delete().where(paths.c.descendant_id.in_(subtree), paths.c.ancestor_id.not_in(subtree))
+    )
+    if parent_id is None:
+        return
+    above = aliased(paths)
+    below = aliased(paths)
+    connection.execute(
+        insert(paths).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + 1)
+            .select_from(above.join(below, true()))
+            .where(above.c.descendant_id == parent_id, below.c.ancestor_id == department_id),
+        )
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _maintain_paths(session: Session, flush_context) -> None:
+    connection = session.connection()
+    for obj in session.new:
+        if isinstance(obj, Department):
+            _link(connection, obj.id, obj.parent_id)
+    for obj in session.dirty:
+        if isinstance(obj, Department) and inspect(obj).attrs["parent_id"].history.has_changes():
+            _move(connection, obj.id, obj.parent_id)
+    for obj in session.deleted:
+        if isinstance(obj, Department):
+            connection.execute(
+                paths.delete().where((paths.c.ancestor_id == obj.id) | (paths.c.descendant_id == obj.id))
+            )
+
+
+def ensure_department_tree(engine: Engine) -> None:
+    """Add ``departments.parent_id`` to older databases and give every department its self path."""
+    with engine.begin() as connection:
+        table = Department.__table__
+        if table.name not in inspect(connection).get_table_names():
+            return
+        present = {column["name"] for column in inspect(connection).get_columns(table.name)}
+        if "parent_id" not in present:
+            connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN parent_id INTEGER")
+            for index in table.indexes:
+                if index.columns.contains_column(table.c.parent_id):
+                    index.create(connection, checkfirst=True)
+        # Departments that predate the closure table are top-level
+        connection.execute(
+            insert(paths).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(table.c.id, table.c.id, literal(0)).where(
+                    ~exists().where(paths.c.descendant_id == table.c.id)
+                ),
+            )
+        )
@@ -0,0 +1,224 @@
+"""Write-maintained display names on sales and purchases.
+
+``Sale`` carries the names (and ids) of its customer, the customer's company
+and department, and its type; ``Purchase`` carries its supplier and type name.
+List endpoints read them straight from the row instead of joining four tables
+per page.
+
+A ``before_flush`` listener keeps the copies consistent:
+
+* new or re-pointed sales/purchases get their names filled in from the
+  referenced rows (normally already in the identity map);
+* renaming (or re-parenting) a customer, company, department, type or
+  supplier fans out as one bulk ``UPDATE`` per changed row, matched on the
+  denormalized id column, inside the same flush;
+* deleting one of them clears the copied names the same way.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from ..models.company import Company
+from ..models.customer import Customer
+from ..models.department import Department
+from ..models.purchase import Purchase
+from ..models.sale import Sale
+from ..models.supplier import Supplier
+from ..models.type import Type
+
+SALE_NAME_COLUMNS = (
+    "customer_name",
+    "customer_company_id",
+    "company_name",
+    "customer_department_id",
+    "department_name",
+    "department_company_id",
+    "type_name",
+)
+PURCHASE_NAME_COLUMNS = ("supplier_name", "type_name")
+
+_sales = Sale.__table__
+_purchases = Purchase.__table__
+
+
+def _changed(obj, *names: str) -> bool:
+    attrs = inspect(obj).attrs
+    return any(attrs[name].history.has_changes() for name in names)
+
+
+def _referenced(session: Session, obj, fk: str, relationship: str, model):
+    """The row ``obj`` points at, whether it was assigned by id or by object."""
+    attrs = inspect(obj).attrs
+    if attrs[relationship].history.has_changes() and not attrs[fk].history.has_changes():
+        return getattr(obj, relationship)
+    value = getattr(obj, fk)
+    return session.get(model, value) if value is not None else None
+
+
+def _customer_values(session: Session, customer: Customer | None) -> dict:
+    if customer is None:
+        return {name: None for name in SALE_NAME_COLUMNS if name != "type_name"}
+    company = session.get(Company, customer.company_id) if customer.company_id else None
+    department = session.get(Department, customer.department_id) if customer.department_id else None
+    return {
+        "customer_name": customer.name,
+        "customer_company_id": customer.company_id,
+        "company_name": company.name if company else None,
+        "customer_department_id": customer.department_id,
+        "department_name": department.name if department else None,
+        "department_company_id": department.company_id if department else None,
+    }
+
+
+def _type_name(session: Session, obj) -> str | None:
+    type_obj = _referenced(session, obj, "type_id", "type", Type)
+    return type_obj.name if type_obj else None
+
+
+def _fill_sale(session: Session, sale: Sale, is_new: bool) -> None:
+    if is_new or _changed(sale, "customer_id", "customer"):
+        customer = _referenced(session, sale, "customer_id", "customer", Customer)
+        for name, value in _customer_values(session, customer).items():
+            setattr(sale, name, value)
+    if is_new or _changed(sale, "type_id", "type"):
+        sale.type_name = _type_name(session, sale)
+
+
+def _fill_purchase(session: Session, purchase: Purchase, is_new: bool) -> None:
+    if is_new or _changed(purchase, "supplier_id", "supplier"):
+        supplier = _referenced(session, purchase, "supplier_id", "supplier", Supplier)
+        purchase.supplier_name = supplier.name if supplier else None
+    if is_new or _changed(purchase, "type_id", "type"):
+        purchase.type_name = _type_name(session, purchase)
+
+
+def _fan_out(session: Session, obj) -> None:
+    """Propagate a changed referenced row to the sales/purchases that copy it."""
+    if isinstance(obj, Customer) and _changed(obj, "name", "company_id", "department_id"):
+        session.execute(
+            update(_sales).where(_sales.c.customer_id == obj.id).values(**_customer_values(session, obj))
+        )
+    elif isinstance(obj, Company) and _changed(obj, "name"):
+        session.execute(update(_sales).where(_sales.c.customer_company_id == obj.id).values(company_name=obj.name))
+    elif isinstance(obj, Department) and _changed(obj, "name", "company_id"):
+        session.execute(
+            update(_sales)
+            .where(_sales.c.customer_department_id == obj.id)
+            .values(department_name=obj.name, department_company_id=obj.company_id)
+        )
+    elif isinstance(obj, Type) and _changed(obj, "name"):
+        for table in (_sales, _purchases):
+            session.execute(update(table).where(table.c.type_id == obj.id).values(type_name=obj.name))
+    elif isinstance(obj, Supplier) and _changed(obj, "name"):
+        session.execute(
+            update(_purchases).where(_purchases.c.supplier_id == obj.id).values(supplier_name=obj.name)
+        )
+
+
+def _clear(session: Session, obj) -> None:
+    """Drop copied names that point at a row being deleted."""
+    if isinstance(obj, Customer):
+        session.execute(
+            update(_sales)
+            .where(_sales.c.customer_id == obj.id)
+            .values({name: None for name in SALE_NAME_COLUMNS if name != "type_name"})
+        )
+    elif isinstance(obj, Company):
+        session.execute(update(_sales).where(_sales.c.customer_company_id == obj.id).values(company_name=None))
+    elif isinstance(obj, Department):
+        session.execute(
+            update(_sales)
+            .where(_sales.c.customer_department_id == obj.id)
+            .values(customer_department_id=None, department_name=None, department_company_id=None)
+        )
+    elif isinstance(obj, Type):
+        for table in (_sales, _purchases):
+            session.execute(update(table).where(table.c.type_id == obj.id).values(type_name=None))
+    elif isinstance(obj, Supplier):
+        session.execute(update(_purchases).where(_purchases.c.supplier_id == obj.id).values(supplier_name=None))
+
+
+@event.listens_for(Session, "before_flush")
+def _maintain_display_names(session: Session, flush_context, instances) -> None:
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Sale):
+                _fill_sale(session, obj, True)
+            elif isinstance(obj, Purchase):
+                _fill_purchase(session, obj, True)
+        for obj in session.dirty:
+            if isinstance(obj, Sale):
+                _fill_sale(session, obj, False)
+            elif isinstance(obj, Purchase):
+                _fill_purchase(session, obj, False)
+            elif obj.__class__ in (Customer, Company, Department, Type, Supplier):
+                _fan_out(session, obj)
+        for obj in session.deleted:
+            _clear(session, obj)
+
+
+def backfill_display_names(connection: Connection) -> None:
+    """Recompute every copied name from the referenced tables."""
+    customers = Customer.__table__
+    companies = Company.__table__
+    departments = Department.__table__
+    types = Type.__table__
+    suppliers = Supplier.__table__
+
+    def customer_field(column):
+        return select(column).where(customers.c.id == _sales.c.customer_id).scalar_subquery()
+
+    company_name = (
+        select(companies.c.name)
+        .select_from(customers.join(companies, companies.c.id == customers.c.company_id))
+        .where(customers.c.id == _sales.c.customer_id)
+        .scalar_subquery()
+    )
+
+    def department_field(column):
+        return (
+            select(column)
+            .select_from(customers.join(departments, departments.c.id == customers.c.department_id))
+            .where(customers.c.id == _sales.c.customer_id)
+            .scalar_subquery()
+        )
+
+    connection.execute(
+        update(_sales).values(
+            customer_name=customer_field(customers.c.name),
+            customer_company_id=customer_field(customers.c.company_id),
+            company_name=company_name,
+            customer_department_id=customer_field(customers.c.department_id),
+            department_name=department_field(departments.c.name),
+            department_company_id=department_field(departments.c.company_id),
+            type_name=select(types.c.name).where(types.c.id == _sales.c.type_id).scalar_subquery(),
+        )
+    )
+    connection.execute(
+        update(_purchases).values(
+            supplier_name=select(suppliers.c.name).where(suppliers.c.id == _purchases.c.supplier_id).scalar_subquery(),
+            type_name=select(types.c.name).where(types.c.id == _purchases.c.type_id).scalar_subquery(),
+        )
+    )
+
+
+def ensure_display_name_columns(engine: Engine) -> None:
+    """Add the copied-name columns to databases created before they existed, then backfill them."""
+    added = False
+    with engine.begin() as connection:
+        existing_tables = set(inspect(connection).get_table_names())
+        for table, names in ((_sales, SALE_NAME_COLUMNS), (_purchases, PURCHASE_NAME_COLUMNS)):
+            if table.name not in existing_tables:
+                continue
+            present = {column["name"] for column in inspect(connection).get_columns(table.name)}
+            for name in names:
+                if name in present:
+                    continue
+                column_type = table.c[name].type.compile(dialect=connection.dialect)
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}")
+                added = True
+        if added:
+            backfill_display_names(connection)
@@ -0,0 +1,235 @@
+"""Cash-flow forecasting from monthly sale and purchase history.
+
+Every series (total inflow/outflow, inflow and outflow per type, inflow per
+customer) is modelled as a seasonal baseline: additive month-of-year indices
+estimated against a centred 2x12 moving average, plus an exponentially
+smoothed level whose smoothing factor is picked by one-step-ahead error.
+Only closed months are fitted, so writes to the open month never touch a model.
+
+Fitted parameters are cached per user. When another month closes the cached
+models are advanced by one smoothing step per new month from a small grouped
+query instead of being refit from raw rows; a write backdated into an already
+fitted month discards the user's models so the next request refits them.
+"""
+
+from __future__ import annotations
+
+import copy
+from array import array
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Iterable, Sequence
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..core.cache import cache
+from ..models.customer import Customer
+from ..models.purchase import Purchase
+from ..models.sale import Sale
+from ..models.type import Type
+from .timeseries import MONTH, bucket_label, sql_bucket, to_bucket_date
+
+HISTORY_MONTHS = 36
+TOP_SERIES = 10
+_ALPHAS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9)
+
+# (flow, dimension, model, key attribute) combinations fitted for every user.
+_GROUPINGS = (
+    ("inflow", "type", Sale, "type_id"),
+    ("outflow", "type", Purchase, "type_id"),
+    ("inflow", "customer", Sale, "customer_id"),
+)
+
+
+def _month_index(value: date) -> int:
+    return value.year * 12 + value.month - 1
+
+
+def _month_start(index: int) -> date:
+    year, month = divmod(index, 12)
+    return date(year, month + 1, 1)
+
+
+def _cache_key(owner_id: int) -> str:
+    return f"forecast:{owner_id}"
+
+
+def fit_series(values: Sequence[float], first_month: int) -> dict:
+    """Fit seasonal indices and a smoothed level to a monthly series."""
+    n = len(values)
+    seasonal = [0.0] * 12
+    if n >= 24:
+        prefix = array("d", accumulate(values, initial=0.0))
+        sums = [0.0] * 12
+        counts = [0] * 12
+        for t in range(6, n - 6):
+            # Centred 2x12 moving average: x[t-5..t+5] fully, x[t-6] and x[t+6] at half weight.
+            average = (prefix[t + 6] - prefix[t - 5] + 0.5 * (values[t - 6] + values[t + 6])) / 12
+            slot = (first_month + t) % 12
+            sums[slot] += values[t] - average
+            counts[slot] += 1
+        seasonal = [total / count if count else 0.0 for total, count in zip(sums, counts)]
+        mean = sum(seasonal) / 12
+        seasonal = [value - mean for value in seasonal]
+
+    deseasonalized = array("d", (values[t] - seasonal[(first_month + t) % 12] for t in range(n)))
+    head = deseasonalized[: min(12, n)]
+    initial = sum(head) / len(head) if head else 0.0
+    best = (float("inf"), _ALPHAS[0], initial)
+    for alpha in _ALPHAS:
+        level = initial
+        sse = 0.0
+        for value in deseasonalized:
+            error = value - level
+            sse += error * error
+            level += alpha * error
+        if sse < best[0]:
+            best = (sse, alpha, level)
+    _, alpha, level = best
+    return {"alpha": alpha, "level": level, "seasonal": seasonal, "total": float(sum(values))}
+
+
+def advance(state: dict, month: int, value: float) -> None:
+    """Feed one more closed month into a fitted series."""
+    error = value - state["seasonal"][month % 12] - state["level"]
+    state["level"] += state["alpha"] * error
+    state["total"] += value
+
+
+def project(state: dict, first_month: int, count: int) -> list[float]:
+    level = state["level"]
+    seasonal = state["seasonal"]
+    return [max(0.0, level + seasonal[(first_month + h) % 12]) for h in range(count)]
+
+
+def _monthly_history(db: Session, owner_id: int, first: int, last: int) -> dict[str, dict[int, float]]:
+    """Return ``{series key: {month index: amount}}`` for months ``first..last``."""
+    start = _month_start(first)
+    end = _month_start(last + 1) - timedelta(days=1)
+    history: dict[str, dict[int, float]] = defaultdict(dict)
+    for flow, dimension, model, attribute in _GROUPINGS:
+        key_column = getattr(model, attribute)
+        bucket = sql_bucket(model.date, MONTH)
+        rows = (
+            db.query(key_column, bucket, func.coalesce(func.sum(model.total_price), 0))
+            .filter(model.owner_id == owner_id, model.date >= start, model.date <= end)
+            .group_by(key_column, bucket)
+            .all()
+        )
+        for key, month, amount in rows:
+            index = _month_index(to_bucket_date(month))
+            value = float(amount)
+            history[f"{flow}:{dimension}:{key}"][index] = value
+            if dimension == "type":
+                totals = history[f"{flow}:total:all"]
+                totals[index] = totals.get(index, 0.0) + value
+    return history
+
+
+def _fit_months(months: dict[int, float], through: int) -> dict:
+    start = min(months)  # a series begins at its first recorded month
+    values = array("d", (months.get(index, 0.0) for index in range(start, through + 1)))
+    return fit_series(values, start)
+
+
+def _fit_user(db: Session, owner_id: int, through: int) -> dict:
+    history = _monthly_history(db, owner_id, through - HISTORY_MONTHS + 1, through)
+    series = {key: _fit_months(months, through) for key, months in history.items()}
+    return {"through": through, "series": series}
+
+
+def _advance_user(db: Session, owner_id: int, models: dict, through: int) -> dict:
+    first = models["through"] + 1
+    history = _monthly_history(db, owner_id, first, through)
+    series = models["series"]
+    for key, state in series.items():
+        months = history.get(key, {})
+        for index in range(first, through + 1):
+            advance(state, index, months.get(index, 0.0))
+    for key, months in history.items():
+        if key not in series:
+            series[key] = _fit_months(months, through)
+    models["through"] = through
+    return models
+
+
+def load_models(db: Session, owner_id: int, today: date | None = None) -> dict:
+    """Return fitted models for ``owner_id`` through the last closed month."""
+    through = _month_index(today or date.today()) - 1
+    key = _cache_key(owner_id)
+    models = cache.get(key)
+    if models is None or models["through"] > through:
+        models = _fit_user(db, owner_id, through)
+    elif models["through"] < through:
+        models = _advance_user(db, owner_id, copy.deepcopy(models), through)
+    else:
+        return models
+    cache.set(key, models)
+    return models
+
+
+def forget_models(owner_id: int, dates: Iterable[date | None]) -> None:
+    """Discard cached models if any of ``dates`` falls in an already fitted month."""
+    models = cache.get(_cache_key(owner_id))
+    if models is None:
+        return
+    if any(value is not None and _month_index(value) <= models["through"] for value in dates):
+        cache.delete(_cache_key(owner_id))
+
+
+def _named_series(db: Session, models: dict, flow: str, dimension: str, first: int, count: int) -> list[dict]:
+    prefix = f"{flow}:{dimension}:"
+    entries = [(key[len(prefix):], state) for key, state in models["series"].items() if key.startswith(prefix)]
+    entries.sort(key=lambda entry: -entry[1]["total"])
+    top, rest = entries[:TOP_SERIES], entries[TOP_SERIES:]
+
+    ids = [int(raw) for raw, _ in top if raw != "None"]
+    if dimension == "type":
+        names = dict(db.query(Type.id, Type.name).filter(Type.id.in_(ids)).all()) if ids else {}
+        unknown = "未分类"
+    else:
+        names = dict(db.query(Customer.id, Customer.name).filter(Customer.id.in_(ids)).all()) if ids else {}
+        unknown = "陌生客户"
+
+    result = []
+    for raw, state in top:
+        entity_id = None if raw == "None" else int(raw)
+        result.append(
+            {
+                "id": entity_id,
+                "name": names.get(entity_id, unknown) if entity_id is not None else unknown,
+                "data": [round(value, 2) for value in project(state, first, count)],
+            }
+        )
+    if rest:
+        others = [0.0] * count
+        for _, state in rest:
+            others = [a + b for a, b in zip(others, project(state, first, count))]
+        result.append({"id": None, "name": "others", "data": [round(value, 2) for value in others]})
+    return result
+
+
+def forecast_cash_flow(db: Session, owner_id: int, months: int, today: date | None = None) -> dict:
+    """Project inflow (sales) and outflow (purchases) for the next ``months`` months.
+
+    The projection starts at the current (open) month.
+    """
+    models = load_models(db, owner_id, today)
+    first = models["through"] + 1
+    empty = {"level": 0.0, "seasonal": [0.0] * 12, "alpha": 0.0, "total": 0.0}
+    inflow = project(models["series"].get("inflow:total:all", empty), first, months)
+    outflow = project(models["series"].get("outflow:total:all", empty), first, months)
+    return {
+        "basedOn": bucket_label(_month_start(models["through"]), MONTH),
+        "categories": [bucket_label(_month_start(first + h), MONTH) for h in range(months)],
+        "inflow": [round(value, 2) for value in inflow],
+        "outflow": [round(value, 2) for value in outflow],
+        "net": [round(a - b, 2) for a, b in zip(inflow, outflow)],
+        "byType": {
+            "inflow": _named_series(db, models, "inflow", "type", first, months),
+            "outflow": _named_series(db, models, "outflow", "type", first, months),
+        },
+        "byCustomer": _named_series(db, models, "inflow", "customer", first, months),
+    }
@@ -4,13 +4,20 @@ import io
 import logging
 import uuid
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
 from urllib.parse import urlparse
 
-from PIL import Image
-from qiniu import Auth, BucketManager, put_data  # type: ignore
-
 from ..core.config import settings
 
+# Pillow and the qiniu SDK are imported on first use: most requests never touch
+# images, and loading them at import time slows down every worker start.
+if TYPE_CHECKING:  # pragma: no cover
+    from qiniu import Auth, BucketManager  # type: ignore
+
+
+# Qiniu accepts at most this many operations in one batch request
+_BATCH_LIMIT = 1000
+
 
 class ImageUploadError(Exception):
     """Raised when an image cannot be processed or uploaded."""
@@ -50,6 +57,8 @@ class ImageUploader:
         ):
             raise ImageUploadError("七牛云未配置，请检查config.yaml中的uploads配置")
         if self._auth is None:
+            from qiniu import Auth  # type: ignore
+
             self._auth = Auth(self._config.access_key, self._config.secret_key)
             self._bucket_manager = None  # reset so it uses the new auth instance
 
@@ -57,9 +66,13 @@ class ImageUploader:
         self._ensure_configured()
         if self._bucket_manager is None:
             assert self._auth is not None  # for type checker
+            from qiniu import BucketManager  # type: ignore
+
             self._bucket_manager = BucketManager(self._auth)
 
     def _compress_image(self, data: bytes) -> tuple[bytes, str]:
+        from PIL import Image
+
         try:
             with Image.open(io.BytesIO(data)) as img:
                 image = img.convert("RGB")
@@ -98,6 +111,8 @@ class ImageUploader:
         key = self._build_key(filename, ext)
         assert self._auth is not None  # for type checker
         token = self._auth.upload_token(self._config.bucket, key, 3600)
+        from qiniu import put_data  # type: ignore
+
         ret, info = put_data(token, key, compressed)
         if info.status_code not in (200, 201) or not ret:
             raise ImageUploadError("七牛云上传失败，请稍后重试")
@@ -137,5 +152,38 @@ class ImageUploader:
             self._logger.warning("Unexpected Qiniu status %s when deleting %s", info.status_code, key)
             raise ImageUploadError("七牛云删除旧图片失败")
 
+    def delete_many(self, urls: list[str]) -> list[str]:
+        """Delete images with Qiniu batch requests; return the urls that were not deleted."""
+        urls_by_key: dict[str, list[str]] = {}
+        for url in urls:
+            key = self._extract_key(url)
+            if key:
+                urls_by_key.setdefault(key, []).append(url)
+        if not urls_by_key:
+            return []
+        self._ensure_bucket_manager()
+        assert self._bucket_manager is not None
+        from qiniu import build_batch_delete  # type: ignore
+
+        keys = list(urls_by_key)
+        failed: list[str] = []
+        for start in range(0, len(keys), _BATCH_LIMIT):
+            chunk = keys[start : start + _BATCH_LIMIT]
+            try:
+                ret, info = self._bucket_manager.batch(build_batch_delete(self._config.bucket, chunk))
+            except Exception as exc:  # pragma: no cover - network failures
+                self._logger.warning("Failed to delete %s images: %s", len(chunk), exc)
+                failed.extend(chunk)
+                continue
+            results = ret if isinstance(ret, list) else []
+            for index, key in enumerate(chunk):
+                code = results[index].get("code") if index < len(results) else info.status_code
+                # 612: already gone
+                if code not in (200, 204, 612):
+                    failed.append(key)
+        if failed:
+            self._logger.warning("Qiniu did not delete %s of %s images", len(failed), len(keys))
+        return [url for key in failed for url in urls_by_key[key]]
+
 
 uploader = ImageUploader()
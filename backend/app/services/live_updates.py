@@ -0,0 +1,150 @@
+"""Summary updates pushed to ``/statistics/stream`` clients.
+
+Each worker has one ``LiveUpdates`` hub. While anyone is subscribed, a single
+task reads new ``sales`` and ``purchases`` entries from the change log (see
+``changelog``) every ``LIVE_UPDATES_POLL_SECONDS``, recomputes the summary
+once per affected owner that has subscribers, and hands the fields that
+changed to each of that owner's subscriptions. Reading the shared log rather
+than hooking the request that made the change also picks up writes handled
+by other workers, by the compaction task and by scripts.
+
+A subscription holds at most one pending delta: deltas carry new values, not
+increments, so a client that reads slowly gets later deltas merged into the
+pending one instead of a growing queue, and the hub never waits for a
+client. An idle subscription is an ``asyncio.Event`` and a small dict.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import date
+from typing import Any
+
+from starlette.concurrency import run_in_threadpool
+
+from ..core.config import settings
+from ..db import SessionLocal
+from ..models.purchase import Purchase
+from ..models.sale import Sale
+from . import changelog
+from .summary import financial_summary, summary_delta
+
+logger = logging.getLogger(__name__)
+
+_TABLES = (Sale.__tablename__, Purchase.__tablename__)
+
+
+class Subscription:
+    __slots__ = ("owner_id", "_pending", "_ready")
+
+    def __init__(self, owner_id: int):
+        self.owner_id = owner_id
+        self._pending: dict[str, Any] | None = None
+        self._ready = asyncio.Event()
+
+    def push(self, delta: dict[str, Any]) -> None:
+        if self._pending is None:
+            self._pending = {period: dict(values) for period, values in delta.items()}
+        else:
+            for period, values in delta.items():
+                self._pending.setdefault(period, {}).update(values)
+        self._ready.set()
+
+    async def next(self, timeout: float) -> dict[str, Any] | None:
+        """The merged pending delta, or ``None`` if nothing changed within ``timeout`` seconds."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._ready.clear()
+        delta, self._pending = self._pending, None
+        return delta
+
+
+class LiveUpdates:
+    def __init__(self, poll_interval: float):
+        self.poll_interval = poll_interval
+        self._subscriptions: dict[int, set[Subscription]] = {}
+        # Last summary each subscribed owner's deltas were computed against
+        self._summaries: dict[int, dict[str, Any]] = {}
+        self._watermark: int | None = None
+        self._today: date | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def _snapshot(self, owner_id: int) -> dict[str, Any]:
+        db = SessionLocal()
+        try:
+            # Start tailing before reading, so a change made meanwhile is delivered rather than lost
+            if self._watermark is None:
+                self._watermark = changelog.latest_id(db)
+                self._today = date.today()
+            return financial_summary(db, owner_id)
+        finally:
+            db.close()
+
+    async def subscribe(self, owner_id: int) -> tuple[Subscription, dict[str, Any]]:
+        """Register a subscription for ``owner_id``; return it with the current summary."""
+        summary = await run_in_threadpool(self._snapshot, owner_id)
+        subscription = Subscription(owner_id)
+        self._subscriptions.setdefault(owner_id, set()).add(subscription)
+        # Keep an existing baseline: its subscribers may not have been sent newer values yet
+        self._summaries.setdefault(owner_id, summary)
+        if self._task is None or self._task.done() or self._task.get_loop() is not asyncio.get_running_loop():
+            self._task = asyncio.create_task(self._run())
+        return subscription, summary
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.owner_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.owner_id]
+            self._summaries.pop(subscription.owner_id, None)
+
+    def _changed_summaries(self, owners: set[int]) -> dict[int, dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            changed: set[int] = set()
+            while True:
+                entries = changelog.changes_since(db, self._watermark, tables=_TABLES)
+                if not entries:
+                    break
+                self._watermark = entries[-1].id
+                changed.update(entry.owner_id for entry in entries if entry.owner_id in owners)
+            # "This month" and "this year" move at midnight without any change
+            if self._today != date.today():
+                self._today = date.today()
+                changed = owners
+            return {owner_id: financial_summary(db, owner_id, self._today) for owner_id in changed}
+        finally:
+            db.close()
+
+    async def poll(self) -> None:
+        """Push the deltas of every subscribed owner whose sales or purchases changed since the last poll."""
+        summaries = await run_in_threadpool(self._changed_summaries, set(self._subscriptions))
+        for owner_id, summary in summaries.items():
+            subscriptions = self._subscriptions.get(owner_id)
+            if not subscriptions:
+                continue
+            delta = summary_delta(self._summaries.get(owner_id), summary)
+            self._summaries[owner_id] = summary
+            if delta:
+                for subscription in subscriptions:
+                    subscription.push(delta)
+
+    async def _run(self) -> None:
+        while self._subscriptions:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.poll()
+            except Exception:  # pragma: no cover - retried next poll
+                logger.exception("Live update poll failed")
+
+
+live_updates = LiveUpdates(settings.LIVE_UPDATES_POLL_SECONDS)
@@ -0,0 +1,134 @@
+"""Cached per-user access sets for customers, suppliers and companies.
+
+Access to a customer, supplier or company is granted by a row in
+``user_customers``, ``user_suppliers`` or ``user_companies``. Instead of
+compiling ``Customer.vendors.any(User.id == ...)`` into a correlated EXISTS on
+every request, routers filter with ``id IN (...)`` over the user's id set,
+which is read once from the association table and cached.
+
+The sets are invalidated from session events: any flush that adds or removes
+a link (from either side of the relationship) or deletes a linked entity marks
+the affected users, and their sets are dropped once the transaction commits.
+Sets also expire after ``_TTL_SECONDS`` as a bound on changes made outside the
+ORM.
+
+Set keys carry a per-user generation that ``forget_user`` bumps, so a request
+that read the links before a commit and stores its set after the
+invalidation writes it under the old generation, where nothing reads it.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from ..core.cache import cache
+from ..models.company import Company
+from ..models.customer import Customer
+from ..models.supplier import Supplier
+from ..models.user import User
+from ..models.user_company import user_company_table
+from ..models.user_customer import user_customer_table
+from ..models.user_supplier import user_supplier_table
+
+CUSTOMERS = "customers"
+SUPPLIERS = "suppliers"
+COMPANIES = "companies"
+
+# kind -> (association table, entity id column)
+_LINKS = {
+    CUSTOMERS: (user_customer_table, user_customer_table.c.customer_id),
+    SUPPLIERS: (user_supplier_table, user_supplier_table.c.supplier_id),
+    COMPANIES: (user_company_table, user_company_table.c.company_id),
+}
+
+# model -> name of its relationship to the linked users
+_ENTITY_LINKS = {Customer: "vendors", Supplier: "customers", Company: "vendors"}
+_USER_LINKS = ("customers", "suppliers", "customer_companies")
+
+_TTL_SECONDS = 300
+# Above this size the filter uses an IN subquery instead of inlining the ids
+_MAX_INLINE_IDS = 500
+_PENDING_KEY = "membership_invalidate"
+
+
+def _generation(user_id: int) -> int:
+    return cache.get(f"membership:gen:{user_id}", 0)
+
+
+def _cache_key(user_id: int, kind: str, generation: int) -> str:
+    return f"membership:{user_id}:{generation}:{kind}"
+
+
+def accessible_ids(db: Session, user_id: int, kind: str) -> list[int]:
+    """Sorted ids of the ``kind`` entities linked to ``user_id``."""
+    # The generation is read before the links, never after
+    key = _cache_key(user_id, kind, _generation(user_id))
+    ids = cache.get(key)
+    if ids is None:
+        table, id_column = _LINKS[kind]
+        ids = sorted(db.execute(select(id_column).where(table.c.user_id == user_id)).scalars())
+        cache.set(key, ids, ttl=_TTL_SECONDS)
+    return ids
+
+
+def has_access(db: Session, user_id: int, kind: str, entity_id: int) -> bool:
+    ids = accessible_ids(db, user_id, kind)
+    index = bisect_left(ids, entity_id)
+    return index < len(ids) and ids[index] == entity_id
+
+
+def access_filter(db: Session, user_id: int, kind: str, column):
+    """Filter criterion restricting ``column`` (an entity id) to ids linked to ``user_id``."""
+    ids = accessible_ids(db, user_id, kind)
+    if len(ids) <= _MAX_INLINE_IDS:
+        return column.in_(ids)
+    table, id_column = _LINKS[kind]
+    return column.in_(select(id_column).where(table.c.user_id == user_id))
+
+
+def forget_user(user_id: int) -> None:
+    generation = _generation(user_id)
+    cache.set(f"membership:gen:{user_id}", generation + 1)
+    for kind in _LINKS:
+        cache.delete(_cache_key(user_id, kind, generation))
+
+
+def _mark(session: Session, user_ids) -> None:
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    pending.update(user_id for user_id in user_ids if user_id is not None)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_link_changes(session: Session, flush_context, instances) -> None:
+    for obj in list(session.new) + list(session.dirty):
+        state = inspect(obj)
+        if isinstance(obj, User):
+            if any(state.attrs[name].history.has_changes() for name in _USER_LINKS):
+                _mark(session, [obj.id])
+            continue
+        attribute = _ENTITY_LINKS.get(type(obj))
+        if attribute is not None:
+            history = state.attrs[attribute].history
+            _mark(session, [user.id for user in (*history.added, *history.deleted)])
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            _mark(session, [obj.id])
+            continue
+        attribute = _ENTITY_LINKS.get(type(obj))
+        if attribute is not None:
+            # Deleting the entity removes its link rows; its id may also be reused later
+            _mark(session, [user.id for user in getattr(obj, attribute)])
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        forget_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
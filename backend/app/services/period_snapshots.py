@@ -0,0 +1,197 @@
+"""Snapshot-backed period totals for closed months and years.
+
+Sales and purchases in a month that has already ended only change when someone
+backdates an edit, so their per-owner totals are frozen into
+``statistics_snapshots`` the first time they are needed. Writes call
+``invalidate_periods`` inside their own transaction, which drops the snapshots
+of the month and year the affected dates fall in. Reads then combine snapshot
+lookups for closed periods with one live grouped query for the open period and
+any partially covered buckets at the range edges.
+
+Deleting or restoring a record moves its whole total in or out of the
+periods; ``adjust_periods`` applies that difference to the snapshots in place
+rather than dropping them.
+"""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Iterable
+
+from sqlalchemy import and_, func, insert, literal, or_, select
+from sqlalchemy.orm import Session
+
+from ..models.statistics_snapshot import StatisticsSnapshot
+from .timeseries import MONTH, YEAR, BucketRange, sql_bucket, to_bucket_date
+
+SNAPSHOT_GRANULARITIES = (MONTH, YEAR)
+
+_ONE_DAY = timedelta(days=1)
+
+
+def _period_start(value: date, granularity: str) -> date:
+    if granularity == MONTH:
+        return value.replace(day=1)
+    return value.replace(month=1, day=1)
+
+
+def _next_period_start(start: date, granularity: str) -> date:
+    if granularity == MONTH:
+        return (start + timedelta(days=32)).replace(day=1)
+    return start.replace(year=start.year + 1)
+
+
+def _live_totals(db: Session, model, owner_id: int, ranges: list[tuple[date, date]], granularity: str):
+    bucket = sql_bucket(model.date, granularity)
+    rows = (
+        db.query(bucket, func.coalesce(func.sum(model.total_price), 0))
+        .filter(
+            model.owner_id == owner_id,
+            or_(*(and_(model.date >= start, model.date <= end) for start, end in ranges)),
+        )
+        .group_by(bucket)
+        .all()
+    )
+    return [(to_bucket_date(key), amount) for key, amount in rows]
+
+
+def _freeze(db: Session, model, owner_id: int, missing: list[date], granularity: str) -> None:
+    """Compute and store snapshots for the closed periods in ``missing``.
+
+    The aggregate is written with a single ``INSERT ... SELECT`` so it reads and
+    writes in one transaction; a concurrent write either commits first (and is
+    included) or invalidates the new rows after this commit. Periods without
+    rows are stored as zero so they are not recomputed on the next request.
+
+    The rows are written on a short-lived session of their own, so the caller's
+    session is neither committed nor expired by a read.
+    """
+    kind = model.__tablename__
+    first = missing[0]
+    last = _next_period_start(missing[-1], granularity) - _ONE_DAY
+    bucket = sql_bucket(model.date, granularity)
+    aggregate = (
+        select(
+            literal(owner_id),
+            literal(kind),
+            literal(granularity),
+            bucket,
+            func.coalesce(func.sum(model.total_price), 0),
+        )
+        # INSERT ... SELECT bypasses the ORM criteria that hide tombstones
+        .where(model.owner_id == owner_id, model.date >= first, model.date <= last, model.deleted_at.is_(None))
+        .group_by(bucket)
+    )
+    columns = ["owner_id", "kind", "granularity", "period_start", "amount"]
+    with Session(db.get_bind()) as writer, writer.begin():
+        writer.execute(insert(StatisticsSnapshot).from_select(columns, aggregate).prefix_with("OR IGNORE"))
+        writer.execute(
+            insert(StatisticsSnapshot).prefix_with("OR IGNORE"),
+            [
+                {"owner_id": owner_id, "kind": kind, "granularity": granularity, "period_start": start, "amount": 0}
+                for start in missing
+            ],
+        )
+
+
+def period_totals(
+    db: Session, model, owner_id: int, buckets: BucketRange, today: date | None = None
+) -> list[tuple[date, Decimal]]:
+    """Return ``(bucket_start, amount)`` rows for a month or year ``BucketRange``.
+
+    Buckets that are fully inside the range and already closed come from
+    snapshots (computed on first use); everything else is aggregated live.
+    """
+    granularity = buckets.granularity
+    if granularity not in SNAPSHOT_GRANULARITIES:
+        raise ValueError(f"Snapshots are not kept for granularity {granularity}")
+    open_start = _period_start(today or date.today(), granularity)
+
+    closed: list[date] = []
+    for index in range(buckets.size):
+        start = buckets.bucket_start(index)
+        following = _next_period_start(start, granularity)
+        if start >= buckets.start and following - _ONE_DAY <= buckets.end and following <= open_start:
+            closed.append(start)
+    if not closed:
+        return _live_totals(db, model, owner_id, [(buckets.start, buckets.end)], granularity)
+
+    kind = model.__tablename__
+
+    def _lookup() -> dict[date, Decimal]:
+        rows = (
+            db.query(StatisticsSnapshot.period_start, StatisticsSnapshot.amount)
+            .filter(
+                StatisticsSnapshot.owner_id == owner_id,
+                StatisticsSnapshot.kind == kind,
+                StatisticsSnapshot.granularity == granularity,
+                StatisticsSnapshot.period_start >= closed[0],
+                StatisticsSnapshot.period_start <= closed[-1],
+            )
+            .all()
+        )
+        return {start: amount for start, amount in rows}
+
+    snapshots = _lookup()
+    missing = [start for start in closed if start not in snapshots]
+    if missing:
+        _freeze(db, model, owner_id, missing, granularity)
+        snapshots = _lookup()
+
+    live_ranges = []
+    if buckets.start < closed[0]:
+        live_ranges.append((buckets.start, closed[0] - _ONE_DAY))
+    closed_end = _next_period_start(closed[-1], granularity) - _ONE_DAY
+    if closed_end < buckets.end:
+        live_ranges.append((closed_end + _ONE_DAY, buckets.end))
+
+    rows = [(start, snapshots.get(start, Decimal(0))) for start in closed]
+    if live_ranges:
+        rows.extend(_live_totals(db, model, owner_id, live_ranges, granularity))
+    return rows
+
+
+def _snapshot_filter(model, owner_id: int, starts):
+    return and_(
+        StatisticsSnapshot.owner_id == owner_id,
+        StatisticsSnapshot.kind == model.__tablename__,
+        or_(
+            *(
+                and_(StatisticsSnapshot.granularity == granularity, StatisticsSnapshot.period_start == start)
+                for granularity, start in starts
+            )
+        ),
+    )
+
+
+def adjust_periods(db: Session, model, owner_id: int, day: date, delta: Decimal) -> None:
+    """Add ``delta`` to the month and year snapshots covering ``day``, in the caller's transaction.
+
+    Periods without a snapshot yet are left alone; they are computed from the
+    live rows when first needed.
+    """
+    starts = [(granularity, _period_start(day, granularity)) for granularity in SNAPSHOT_GRANULARITIES]
+    db.query(StatisticsSnapshot).filter(_snapshot_filter(model, owner_id, starts)).update(
+        {StatisticsSnapshot.amount: StatisticsSnapshot.amount + delta}, synchronize_session=False
+    )
+
+
+def invalidate_periods(db: Session, model, owner_id: int, dates: Iterable[date | None]) -> None:
+    """Drop the month and year snapshots covering ``dates`` for ``owner_id``.
+
+    Call before committing a write to ``model`` so the invalidation is part of
+    the same transaction. Dates in the open period have no snapshot, so the
+    common case of editing current records deletes nothing.
+    """
+    starts = set()
+    for value in dates:
+        if value is None:
+            continue
+        for granularity in SNAPSHOT_GRANULARITIES:
+            starts.add((granularity, _period_start(value, granularity)))
+    if not starts:
+        return
+    db.query(StatisticsSnapshot).filter(_snapshot_filter(model, owner_id, starts)).delete(
+        synchronize_session=False
+    )
@@ -0,0 +1,154 @@
+"""Sales breakdowns by customer, company and department, keyed by id.
+
+Sales carry their customer's company and department ids (see
+``display_names``), so the company and department breakdowns come from one
+query grouped by ``(customer_company_id, customer_department_id, bucket)``.
+Its size depends on how many companies and departments sold in the range, not
+on how many customers there are. Each breakdown is then ranked and folded with
+``fold_top``.
+
+Grouping by id keeps two customers (or departments) that share a name apart;
+when such names both make the top, the company name is appended to tell them
+apart.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models.company import Company
+from ..models.customer import Customer
+from ..models.department import Department
+from ..models.sale import Sale
+from .timeseries import BucketRange, BucketSeries, fold_top, sql_bucket, to_bucket_date
+
+PERSONAL_COMPANY = "个人客户"
+UNKNOWN_CUSTOMER = "陌生客户"
+NO_DEPARTMENT = "未分配部门"
+
+# fold_top breaks ties by key, so missing ids get comparable stand-ins
+_NO_COMPANY = -1
+_NO_KEY = 0
+
+
+def _series(buckets: BucketRange, rows_by_key: dict) -> dict:
+    series = {}
+    for key, rows in rows_by_key.items():
+        entry = BucketSeries(buckets)
+        entry.scatter_add(rows)
+        series[key] = entry
+    return series
+
+
+def _chart(top: list, others: BucketSeries | None, labels: dict, extra: dict) -> list[dict]:
+    """Chart series for the ranked keys; ``extra[key]`` adds or overrides fields (e.g. ``id`` for stand-ins)."""
+    result = []
+    for key, entry in top:
+        item = {"id": key, "name": labels[key], **extra.get(key, {})}
+        result.append({**item, "type": "line", "stack": "Total", "data": entry.tolist()})
+    if others is not None:
+        result.append({"id": None, "name": "others", "type": "line", "stack": "Total", "data": others.tolist()})
+    return result
+
+
+def _disambiguate(labels: dict, companies: dict) -> dict:
+    """Append the company name to labels that would otherwise repeat."""
+    repeated = {name for name, count in Counter(labels.values()).items() if count > 1}
+    return {
+        key: f"{name}（{companies[key]}）" if name in repeated and companies.get(key) else name
+        for key, name in labels.items()
+    }
+
+
+def _company_names(db: Session, company_ids) -> dict[int, str]:
+    ids = [company_id for company_id in company_ids if company_id > 0]
+    if not ids:
+        return {}
+    return dict(db.query(Company.id, Company.name).filter(Company.id.in_(ids)).all())
+
+
+def customer_breakdown(db: Session, criteria, buckets: BucketRange, limit: int) -> list[dict]:
+    """Top ``limit`` customers by sales (plus "others"), one series per customer id."""
+    bucket = sql_bucket(Sale.date, buckets.granularity)
+    rows = (
+        db.query(Sale.customer_id, bucket, func.coalesce(func.sum(Sale.total_price), 0))
+        .filter(criteria)
+        .group_by(Sale.customer_id, bucket)
+        .all()
+    )
+    rows_by_customer: dict[int, list] = {}
+    for customer_id, key, amount in rows:
+        rows_by_customer.setdefault(customer_id or _NO_KEY, []).append((to_bucket_date(key), amount))
+    top, others = fold_top(_series(buckets, rows_by_customer), limit)
+
+    ids = [customer_id for customer_id, _ in top if customer_id != _NO_KEY]
+    customers = {}
+    if ids:
+        customers = {
+            customer_id: (name, company_id)
+            for customer_id, name, company_id in db.query(Customer.id, Customer.name, Customer.company_id)
+            .filter(Customer.id.in_(ids))
+            .all()
+        }
+    company_names = _company_names(db, [company_id for _, company_id in customers.values()])
+    labels = {key: customers[key][0] if key in customers else UNKNOWN_CUSTOMER for key, _ in top}
+    companies = {
+        key: PERSONAL_COMPANY if customers[key][1] == 0 else company_names.get(customers[key][1])
+        for key in customers
+    }
+    labels = _disambiguate(labels, companies)
+    return _chart(top, others, labels, {_NO_KEY: {"id": None}})
+
+
+def company_department_breakdowns(
+    db: Session, criteria, buckets: BucketRange, limit: int
+) -> tuple[list[dict], list[dict]]:
+    """Top ``limit`` companies and departments by sales, from one grouped query."""
+    bucket = sql_bucket(Sale.date, buckets.granularity)
+    rows = (
+        db.query(
+            Sale.customer_company_id,
+            Sale.customer_department_id,
+            bucket,
+            func.coalesce(func.sum(Sale.total_price), 0),
+        )
+        .filter(criteria)
+        .group_by(Sale.customer_company_id, Sale.customer_department_id, bucket)
+        .all()
+    )
+
+    by_company: dict[int, list] = {}
+    by_department: dict[int, list] = {}
+    for company_id, department_id, key, amount in rows:
+        point = (to_bucket_date(key), amount)
+        by_company.setdefault(_NO_COMPANY if company_id is None else company_id, []).append(point)
+        by_department.setdefault(department_id or _NO_KEY, []).append(point)
+
+    top_companies, other_companies = fold_top(_series(buckets, by_company), limit)
+    company_names = _company_names(db, [key for key, _ in top_companies])
+    company_labels = {
+        key: PERSONAL_COMPANY if key == 0 else UNKNOWN_CUSTOMER if key == _NO_COMPANY else company_names.get(key, "")
+        for key, _ in top_companies
+    }
+    companies = _chart(top_companies, other_companies, company_labels, {_NO_COMPANY: {"id": None}})
+
+    top_departments, other_departments = fold_top(_series(buckets, by_department), limit)
+    ids = [key for key, _ in top_departments if key != _NO_KEY]
+    departments = {}
+    if ids:
+        departments = {
+            department_id: (name, company_id)
+            for department_id, name, company_id in db.query(Department.id, Department.name, Department.company_id)
+            .filter(Department.id.in_(ids))
+            .all()
+        }
+    department_company_names = _company_names(db, [company_id for _, company_id in departments.values()])
+    labels = {key: departments[key][0] if key in departments else NO_DEPARTMENT for key, _ in top_departments}
+    labels = _disambiguate(labels, {key: department_company_names.get(value[1]) for key, value in departments.items()})
+    extra = {key: {"companyId": value[1]} for key, value in departments.items()}
+    extra[_NO_KEY] = {"id": None, "companyId": None}
+    return companies, _chart(top_departments, other_departments, labels, extra)
+
@@ -0,0 +1,198 @@
+"""Prefix search ("typeahead") over customer, supplier, company and type names.
+
+Each of those tables carries two derived, indexed columns:
+
+* ``name_key``: the name NFKC-normalised, case-folded and stripped of
+  whitespace, so "Acme  Corp" is found by typing "acmec";
+* ``name_initials``: the same with every Chinese character replaced by the
+  initial of its pinyin, so "张三" is found by typing "zs".
+
+Both are kept up to date by a ``before_flush`` listener. A prefix becomes a
+``key >= prefix AND key < upper`` range, which SQLite answers from the index
+instead of scanning every row as ``name ILIKE '%q%'`` does.
+
+Pinyin initials come from the GB2312 code layout: its level-1 characters
+(the 3755 most common ones) are sorted by pinyin, so the initial is the
+letter whose block contains the character's code. Rarer characters keep
+themselves in ``name_initials``.
+
+Results are cached per user and prefix for a few seconds; any committed change
+to one of the tables moves that kind to a new cache generation, so users never
+see a stale list after their own edits.
+"""
+
+from __future__ import annotations
+
+import unicodedata
+from bisect import bisect_right
+
+from sqlalchemy import bindparam, case, event, inspect, or_, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from ..core.cache import cache
+from ..models.company import Company
+from ..models.customer import Customer
+from ..models.supplier import Supplier
+from ..models.type import Type
+from ..models.user import User
+from . import membership
+
+CUSTOMERS = membership.CUSTOMERS
+SUPPLIERS = membership.SUPPLIERS
+COMPANIES = membership.COMPANIES
+TYPES = "types"
+
+_MODELS = {CUSTOMERS: Customer, SUPPLIERS: Supplier, COMPANIES: Company, TYPES: Type}
+_KINDS = {model: kind for kind, model in _MODELS.items()}
+KEY_COLUMNS = ("name_key", "name_initials")
+
+MAX_SUGGESTIONS = 50
+_TTL_SECONDS = 15
+_PENDING_KEY = "suggest_invalidate"
+
+# First GB2312 code of each pinyin initial within the level-1 block (0xB0A1-0xD7F9).
+_GB2312_INITIALS = (
+    (0xB0A1, "a"), (0xB0C5, "b"), (0xB2C1, "c"), (0xB4EE, "d"), (0xB6EA, "e"), (0xB7A2, "f"),
+    (0xB8C1, "g"), (0xB9FE, "h"), (0xBBF7, "j"), (0xBFA6, "k"), (0xC0AC, "l"), (0xC2E8, "m"),
+    (0xC4C3, "n"), (0xC5B6, "o"), (0xC5BE, "p"), (0xC6DA, "q"), (0xC8BB, "r"), (0xC8F6, "s"),
+    (0xCBFA, "t"), (0xCDDA, "w"), (0xCEF4, "x"), (0xD1B9, "y"), (0xD4D1, "z"),
+)
+_GB2312_STARTS = [code for code, _ in _GB2312_INITIALS]
+_GB2312_LEVEL1_END = 0xD7F9
+
+
+def name_key(name: str | None) -> str:
+    if not name:
+        return ""
+    return "".join(unicodedata.normalize("NFKC", name).casefold().split())
+
+
+def _initial(char: str) -> str:
+    try:
+        encoded = char.encode("gb2312")
+    except UnicodeEncodeError:
+        return char
+    if len(encoded) != 2:
+        return char
+    code = encoded[0] << 8 | encoded[1]
+    if not _GB2312_STARTS[0] <= code <= _GB2312_LEVEL1_END:
+        return char
+    return _GB2312_INITIALS[bisect_right(_GB2312_STARTS, code) - 1][1]
+
+
+def name_initials(name: str | None) -> str:
+    return "".join(_initial(char) for char in name_key(name))
+
+
+def _prefix_range(column, prefix: str):
+    # Code point order equals the byte order SQLite compares UTF-8 text in.
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return (column >= prefix) & (column < upper)
+
+
+def _scope(db: Session, user_id: int, kind: str):
+    model = _MODELS[kind]
+    if kind == TYPES:
+        return model.owner_id == user_id
+    return membership.access_filter(db, user_id, kind, model.id)
+
+
+def _generation(kind: str) -> int:
+    return cache.get(f"suggest:gen:{kind}", 0)
+
+
+def suggest(db: Session, user_id: int, kind: str, q: str | None, limit: int) -> list[dict]:
+    """Return up to ``limit`` ``{"id", "name"}`` entries of ``kind`` whose name starts with ``q``.
+
+    ``q`` matches the normalised name, or, as typed, its pinyin initials (so
+    "张" does not also match "赵四"); matches on the name itself come first. An empty ``q`` lists the first names in order.
+    """
+    prefix = name_key(q)
+    key = f"suggest:{kind}:{_generation(kind)}:{user_id}:{limit}:{prefix}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    model = _MODELS[kind]
+    query = select(model.id, model.name).where(_scope(db, user_id, kind))
+    order = [model.name_key, model.id]
+    if prefix:
+        by_key = _prefix_range(model.name_key, prefix)
+        query = query.where(or_(by_key, _prefix_range(model.name_initials, prefix)))
+        order.insert(0, case((by_key, 0), else_=1))
+    rows = db.execute(query.order_by(*order).limit(limit)).all()
+    result = [{"id": entity_id, "name": name} for entity_id, name in rows]
+    cache.set(key, result, ttl=_TTL_SECONDS)
+    return result
+
+
+def _fill(obj) -> None:
+    obj.name_key = name_key(obj.name)
+    obj.name_initials = name_initials(obj.name)
+
+
+@event.listens_for(Session, "before_flush")
+def _maintain_name_keys(session: Session, flush_context, instances) -> None:
+    kinds: set[str] = session.info.setdefault(_PENDING_KEY, set())
+    for obj in session.new:
+        kind = _KINDS.get(type(obj))
+        if kind is not None:
+            _fill(obj)
+            kinds.add(kind)
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            # Links may have changed from the user's side
+            kinds.update((CUSTOMERS, SUPPLIERS, COMPANIES))
+            continue
+        kind = _KINDS.get(type(obj))
+        if kind is None:
+            continue
+        if inspect(obj).attrs["name"].history.has_changes():
+            _fill(obj)
+        kinds.add(kind)
+    for obj in session.deleted:
+        kind = _KINDS.get(type(obj))
+        if kind is not None:
+            kinds.add(kind)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    for kind in session.info.pop(_PENDING_KEY, ()):
+        cache.set(f"suggest:gen:{kind}", _generation(kind) + 1)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def ensure_name_key_columns(engine: Engine) -> None:
+    """Add the key columns and their indexes to older databases and fill rows that lack keys."""
+    with engine.begin() as connection:
+        existing_tables = set(inspect(connection).get_table_names())
+        for model in _MODELS.values():
+            table = model.__table__
+            if table.name not in existing_tables:
+                continue
+            present = {column["name"] for column in inspect(connection).get_columns(table.name)}
+            for name in KEY_COLUMNS:
+                if name not in present:
+                    column_type = table.c[name].type.compile(dialect=connection.dialect)
+                    connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}")
+            for index in table.indexes:
+                if any(column.name in KEY_COLUMNS for column in index.columns):
+                    index.create(connection, checkfirst=True)
+
+            rows = connection.execute(select(table.c.id, table.c.name).where(table.c.name_key.is_(None))).all()
+            if rows:
+                connection.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("row_id"))
+                    .values(name_key=bindparam("key"), name_initials=bindparam("initials")),
+                    [
+                        {"row_id": row_id, "key": name_key(name), "initials": name_initials(name)}
+                        for row_id, name in rows
+                    ],
+                )
@@ -0,0 +1,53 @@
+"""Current month and year totals of a user's sales and purchases (``/statistics/summary``)."""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Any
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models.purchase import Purchase
+from ..models.sale import Sale
+
+
+def _total(db: Session, model, owner_id: int, start: date, end: date) -> float:
+    # 使用日期范围而非 extract()，以便 (owner_id, date) 索引可用
+    total = (
+        db.query(func.coalesce(func.sum(model.total_price), 0))
+        .filter(model.owner_id == owner_id, model.date >= start, model.date < end)
+        .scalar()
+    )
+    return float(total)
+
+
+def _period(db: Session, owner_id: int, start: date, end: date) -> dict[str, float]:
+    purchase_total = _total(db, Purchase, owner_id, start, end)
+    sale_total = _total(db, Sale, owner_id, start, end)
+    return {"purchase_total": purchase_total, "sale_total": sale_total, "profit": sale_total - purchase_total}
+
+
+def financial_summary(db: Session, owner_id: int, today: date | None = None) -> dict[str, Any]:
+    """当月和年度的采购、销售总额及利润"""
+    today = today or date.today()
+    month_start = today.replace(day=1)
+    year_start = today.replace(month=1, day=1)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    next_year = year_start.replace(year=year_start.year + 1)
+    return {
+        "monthly": _period(db, owner_id, month_start, next_month),
+        "yearly": _period(db, owner_id, year_start, next_year),
+    }
+
+
+def summary_delta(previous: dict[str, Any] | None, current: dict[str, Any]) -> dict[str, Any]:
+    """The fields of ``current`` that differ from ``previous``, with their new values."""
+    if previous is None:
+        return current
+    delta = {}
+    for period, values in current.items():
+        changed = {key: value for key, value in values.items() if previous.get(period, {}).get(key) != value}
+        if changed:
+            delta[period] = changed
+    return delta
@@ -0,0 +1,163 @@
+"""Supplier spend analysis: the purchase-side counterpart of ``customerAnalysis``.
+
+Spend is aggregated per ``(supplier_id, bucket)`` in SQL. For long windows
+the query is steered to the partial ``(owner_id, supplier_id, date,
+total_price, deleted_at)`` index over live purchases; with ``deleted_at``
+in the index it is a covering scan that never reads the table rows. Short
+windows are left to the planner, which range-scans ``(owner_id, date)``
+once the table has statistics. Suppliers are ranked by exact total and
+everything past the top ``limit`` is folded into "others". For the
+suppliers that made the top, the unit price of their largest items is
+tracked per bucket (weighted by quantity), with ``None`` for buckets
+without purchases.
+"""
+
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+
+from sqlalchemy import Date, func, literal_column, or_
+from sqlalchemy.orm import Session
+
+from ..models.purchase import Purchase
+from ..models.supplier import Supplier
+from .timeseries import BucketRange, BucketSeries, fold_top, sql_bucket, to_bucket_date
+
+UNKNOWN_SUPPLIER = "未知供应商"
+
+# Windows at least this long read the owner's whole slice of the covering
+# supplier index rather than range-scanning (owner_id, date) and visiting rows.
+_COVERING_SCAN_SPAN = timedelta(days=365)
+# Unary plus keeps SQLite from using the date range for index selection.
+_UNINDEXED_DATE = literal_column(f"+{Purchase.__tablename__}.date", type_=Date)
+
+# fold_top breaks ties by key, so purchases without a supplier need a comparable key
+_NO_SUPPLIER = 0
+
+
+def _supplier_criteria(supplier_ids: list[int]):
+    known = [supplier_id for supplier_id in supplier_ids if supplier_id != _NO_SUPPLIER]
+    criteria = [Purchase.supplier_id.in_(known)] if known else []
+    if _NO_SUPPLIER in supplier_ids:
+        criteria.append(Purchase.supplier_id.is_(None))
+    return or_(*criteria)
+
+
+def _unit_price_trends(
+    db: Session, owner_id: int, buckets: BucketRange, supplier_ids: list[int], names: dict, items_per_supplier: int
+) -> list[dict]:
+    bucket = sql_bucket(Purchase.date, buckets.granularity)
+    rows = (
+        db.query(
+            Purchase.supplier_id,
+            Purchase.item_name,
+            bucket,
+            func.sum(Purchase.total_price),
+            func.sum(Purchase.items_count),
+            func.sum(Purchase.unit_price * Purchase.items_count),
+            func.avg(Purchase.unit_price),
+        )
+        .filter(
+            Purchase.owner_id == owner_id,
+            Purchase.date >= buckets.start,
+            Purchase.date <= buckets.end,
+            _supplier_criteria(supplier_ids),
+        )
+        .group_by(Purchase.supplier_id, Purchase.item_name, bucket)
+        .all()
+    )
+
+    # (supplier key, item) -> [spend, {bucket offset: unit price}]
+    items: dict[tuple[int, str | None], list] = {}
+    for supplier_id, item_name, key, spend, count, weighted, average in rows:
+        index = buckets.offset(to_bucket_date(key))
+        if index is None:
+            continue
+        entry = items.setdefault((supplier_id or _NO_SUPPLIER, item_name), [Decimal(0), {}])
+        entry[0] += Decimal(str(spend or 0))
+        price = float(weighted) / count if count else float(average or 0)
+        entry[1][index] = round(price, 2)
+
+    result = []
+    for supplier_id in supplier_ids:
+        ranked = sorted(
+            ((item, entry) for (key, item), entry in items.items() if key == supplier_id),
+            key=lambda pair: (-pair[1][0], pair[0] or ""),
+        )
+        for item, (_, prices) in ranked[:items_per_supplier]:
+            result.append(
+                {
+                    "supplierId": supplier_id or None,
+                    "supplierName": names.get(supplier_id, UNKNOWN_SUPPLIER),
+                    "item": item,
+                    "data": [prices.get(index) for index in range(buckets.size)],
+                }
+            )
+    return result
+
+
+def supplier_spend(
+    db: Session, owner_id: int, buckets: BucketRange, limit: int, items_per_supplier: int
+) -> dict:
+    """Top ``limit`` suppliers by spend over ``buckets`` plus per-item unit-price trends."""
+    bucket = sql_bucket(Purchase.date, buckets.granularity)
+    date_column = _UNINDEXED_DATE if buckets.end - buckets.start >= _COVERING_SCAN_SPAN else Purchase.date
+    rows = (
+        db.query(Purchase.supplier_id, bucket, func.coalesce(func.sum(Purchase.total_price), 0))
+        .filter(Purchase.owner_id == owner_id, date_column >= buckets.start, date_column <= buckets.end)
+        .group_by(Purchase.supplier_id, bucket)
+        .all()
+    )
+
+    rows_by_supplier: dict[int, list] = {}
+    for supplier_id, key, amount in rows:
+        rows_by_supplier.setdefault(supplier_id or _NO_SUPPLIER, []).append((to_bucket_date(key), amount))
+    series_by_supplier: dict[int, BucketSeries] = {}
+    total = Decimal(0)
+    for supplier_id, supplier_rows in rows_by_supplier.items():
+        series = BucketSeries(buckets)
+        series.scatter_add(supplier_rows)
+        series_by_supplier[supplier_id] = series
+        total += series.total
+
+    top, others = fold_top(series_by_supplier, limit)
+    top_ids = [supplier_id for supplier_id, _ in top]
+    known_ids = [supplier_id for supplier_id in top_ids if supplier_id != _NO_SUPPLIER]
+    names = {}
+    if known_ids:
+        names = dict(db.query(Supplier.id, Supplier.name).filter(Supplier.id.in_(known_ids)).all())
+
+    series = [
+        {
+            "id": supplier_id or None,
+            "name": names.get(supplier_id, UNKNOWN_SUPPLIER),
+            "type": "line",
+            "stack": "Total",
+            "data": entry.tolist(),
+            "total": float(entry.total),
+        }
+        for supplier_id, entry in top
+    ]
+    if others is not None:
+        series.append(
+            {
+                "id": None,
+                "name": "others",
+                "type": "line",
+                "stack": "Total",
+                "data": others.tolist(),
+                "total": float(others.total),
+            }
+        )
+
+    unit_prices = []
+    if top_ids and items_per_supplier:
+        unit_prices = _unit_price_trends(db, owner_id, buckets, top_ids, names, items_per_supplier)
+    return {
+        "categories": buckets.labels(),
+        "granularity": buckets.granularity,
+        "total": float(total),
+        "series": series,
+        "unitPrice": unit_prices,
+    }
@@ -0,0 +1,229 @@
+"""Array-backed time-series buckets for the statistics trend builders.
+
+A date range is represented as a contiguous run of buckets (days, ISO weeks,
+months, quarters or years) indexed by their offset from the first bucket.
+Amounts are scattered into ``array('d')`` buffers so that derived series
+(profit, cumulative sums, trailing windows) are computed in single passes over
+flat memory instead of string-keyed dicts. Totals are kept separately as exact ``Decimal`` sums so the
+overview figures reconcile with the database to the cent.
+"""
+
+from __future__ import annotations
+
+from array import array
+from datetime import date
+from decimal import Decimal
+from itertools import accumulate
+from typing import Iterable
+
+from sqlalchemy import Integer, cast, func
+
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+QUARTER = "quarter"
+YEAR = "year"
+
+GRANULARITIES = (DAY, WEEK, MONTH, QUARTER, YEAR)
+
+
+def _zeros(size: int) -> array:
+    return array("d", bytes(8 * size))
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return Decimal(0)
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def _ordinal(value: date, granularity: str) -> int:
+    """Map a date to a dense integer index of its bucket at ``granularity``."""
+    if granularity == DAY:
+        return value.toordinal()
+    if granularity == WEEK:
+        # date.min (0001-01-01) is a Monday, so this counts ISO weeks.
+        return (value.toordinal() - 1) // 7
+    if granularity == MONTH:
+        return value.year * 12 + value.month - 1
+    if granularity == QUARTER:
+        return value.year * 4 + (value.month - 1) // 3
+    return value.year
+
+
+def _from_ordinal(index: int, granularity: str) -> date:
+    """Return the first day of the bucket with ordinal ``index``."""
+    if granularity == DAY:
+        return date.fromordinal(index)
+    if granularity == WEEK:
+        return date.fromordinal(index * 7 + 1)
+    if granularity == MONTH:
+        year, month = divmod(index, 12)
+        return date(year, month + 1, 1)
+    if granularity == QUARTER:
+        year, quarter = divmod(index, 4)
+        return date(year, quarter * 3 + 1, 1)
+    return date(index, 1, 1)
+
+
+def bucket_label(start: date, granularity: str) -> str:
+    if granularity == DAY:
+        return start.isoformat()
+    if granularity == WEEK:
+        iso_year, iso_week, _ = start.isocalendar()
+        return f"{iso_year}-W{iso_week:02d}"
+    if granularity == MONTH:
+        return f"{start.year}-{start.month:02d}"
+    if granularity == QUARTER:
+        return f"{start.year}-Q{(start.month - 1) // 3 + 1}"
+    return str(start.year)
+
+
+def sql_bucket(column, granularity: str):
+    """SQL expression yielding the first day of ``column``'s bucket.
+
+    Only the GROUP BY uses this expression; range predicates stay on the bare
+    column so the ``(owner_id, date)`` indexes remain usable. The modifiers are
+    SQLite ``date()`` syntax, matching the engine configured in ``app.db``.
+    """
+    if granularity == DAY:
+        return column
+    if granularity == WEEK:
+        return func.date(column, "weekday 0", "-6 days")
+    if granularity == MONTH:
+        return func.date(column, "start of month")
+    if granularity == QUARTER:
+        months_back = (cast(func.strftime("%m", column), Integer) - 1) % 3
+        return func.date(column, "start of month", func.printf("-%d months", months_back))
+    if granularity == YEAR:
+        return func.date(column, "start of year")
+    raise ValueError(f"Unsupported granularity: {granularity}")
+
+
+def to_bucket_date(value) -> date:
+    """Normalize a bucket key returned by ``sql_bucket`` to a ``date``."""
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+class BucketRange:
+    """Contiguous buckets of one granularity covering ``[start, end]`` inclusive."""
+
+    def __init__(self, start: date, end: date, granularity: str = DAY) -> None:
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        if end < start:
+            raise ValueError("end must not be before start")
+        self.start = start
+        self.end = end
+        self.granularity = granularity
+        self._first = _ordinal(start, granularity)
+        self.size = _ordinal(end, granularity) - self._first + 1
+
+    def offset(self, value: date) -> int | None:
+        """Return the bucket offset for ``value`` or None if it falls outside the range."""
+        index = _ordinal(value, self.granularity) - self._first
+        if 0 <= index < self.size:
+            return index
+        return None
+
+    def bucket_start(self, index: int) -> date:
+        return _from_ordinal(self._first + index, self.granularity)
+
+    def labels(self) -> list[str]:
+        return [bucket_label(self.bucket_start(i), self.granularity) for i in range(self.size)]
+
+
+class BucketSeries:
+    """A single float series over a ``BucketRange`` with an exact Decimal total."""
+
+    def __init__(self, buckets: BucketRange) -> None:
+        self.buckets = buckets
+        self.values = _zeros(buckets.size)
+        self.total = Decimal(0)
+
+    def scatter_add(self, rows: Iterable[tuple[date, object]]) -> None:
+        """Add ``(bucket_date, amount)`` rows into their bucket offsets.
+
+        Rows outside the range are ignored; the Decimal total only counts rows
+        that landed in a bucket so the series and its total always agree.
+        """
+        values = self.values
+        offset = self.buckets.offset
+        total = self.total
+        for bucket_date, amount in rows:
+            index = offset(bucket_date)
+            if index is None:
+                continue
+            exact = _to_decimal(amount)
+            values[index] += float(exact)
+            total += exact
+        self.total = total
+
+    def tail(self, count: int) -> array:
+        return self.values[-count:] if count < len(self.values) else self.values[:]
+
+    def cumulative(self) -> array:
+        return array("d", accumulate(self.values))
+
+    def tolist(self) -> list[float]:
+        return self.values.tolist()
+
+
+class TrendSeries:
+    """Paired purchase/sale series with derived profit and comparison views."""
+
+    def __init__(self, buckets: BucketRange) -> None:
+        self.buckets = buckets
+        self.purchase = BucketSeries(buckets)
+        self.sale = BucketSeries(buckets)
+
+    @property
+    def purchase_total(self) -> Decimal:
+        return self.purchase.total
+
+    @property
+    def sale_total(self) -> Decimal:
+        return self.sale.total
+
+    @property
+    def profit_total(self) -> Decimal:
+        return self.sale.total - self.purchase.total
+
+    def profit(self) -> array:
+        return array("d", map(float.__sub__, self.sale.values, self.purchase.values))
+
+    def cumulative_profit(self) -> array:
+        return array("d", accumulate(self.profit()))
+
+    def comparison(self, window: int) -> dict[str, list]:
+        """Trailing ``window`` buckets of both series with their labels."""
+        labels = self.buckets.labels()
+        return {
+            "categories": labels[-window:] if window < len(labels) else labels,
+            "purchaseData": self.purchase.tail(window).tolist(),
+            "saleData": self.sale.tail(window).tolist(),
+        }
+
+
+def fold_top(series: dict, limit: int) -> tuple[list, BucketSeries | None]:
+    """Split ``{key: BucketSeries}`` into the ``limit`` largest and an "others" fold.
+
+    Keys are ranked by exact total (descending) with ties broken by key so the
+    output is stable. The fold is None when nothing falls outside the top.
+    """
+    ranked = sorted(series.items(), key=lambda item: (-item[1].total, item[0]))
+    top, rest = ranked[:limit], ranked[limit:]
+    if not rest:
+        return top, None
+    others = BucketSeries(rest[0][1].buckets)
+    values = others.values
+    for _, entry in rest:
+        for index, value in enumerate(entry.values):
+            if value:
+                values[index] += value
+        others.total += entry.total
+    return top, others
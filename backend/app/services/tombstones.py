@@ -0,0 +1,161 @@
+"""Soft delete for sales and purchases, and compaction of the tombstones.
+
+Deleting a sale or purchase only sets ``deleted_at``; the row stays until
+``compact`` purges it after ``TOMBSTONE_RETENTION_DAYS``, so it can be
+restored in the meantime. A ``do_orm_execute`` listener adds
+``deleted_at IS NULL`` to every ORM select that involves either model, which
+is also the predicate of their partial indexes. Pass the execution option
+``include_deleted=True`` to see tombstones.
+
+Period snapshots are adjusted by the row's total when it is deleted or
+restored, instead of being recomputed. Purging a tombstone changes no totals,
+so compaction only deletes rows and their images (and logs the purge in the
+change log): images go first, in Qiniu batch requests, and a row whose image
+could not be deleted is kept for the next run.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, event
+from sqlalchemy.orm import ORMExecuteState, Session, with_loader_criteria
+from starlette.concurrency import run_in_threadpool
+
+from ..core.cache import cache
+from ..core.config import settings
+from ..db import SessionLocal
+from ..models.customer import Customer
+from ..models.purchase import Purchase
+from ..models.sale import Sale
+from ..models.supplier import Supplier
+from ..models.type import Type
+from . import changelog
+from .forecast import forget_models
+from .image_uploader import ImageUploadError, uploader
+from .period_snapshots import adjust_periods
+
+logger = logging.getLogger(__name__)
+
+INCLUDE_DELETED = "include_deleted"
+SOFT_DELETE_MODELS = (Sale, Purchase)
+
+# Referenced rows that may have been deleted while the record was a tombstone
+_REFERENCES = {
+    Sale: {"customer_id": Customer, "type_id": Type},
+    Purchase: {"supplier_id": Supplier, "type_id": Type},
+}
+_COMPACTION_LOCK = "tombstones:compaction"
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _hide_tombstones(state: ORMExecuteState) -> None:
+    if not state.is_select or state.is_column_load or state.execution_options.get(INCLUDE_DELETED, False):
+        return
+    state.statement = state.statement.options(
+        *(
+            with_loader_criteria(model, model.deleted_at.is_(None), include_aliases=True)
+            for model in SOFT_DELETE_MODELS
+        )
+    )
+
+
+def get_deleted(db: Session, model, record_id: int, owner_id: int):
+    """The tombstone ``record_id`` of ``owner_id``, or ``None``."""
+    return (
+        db.query(model)
+        .execution_options(**{INCLUDE_DELETED: True})
+        .filter(model.id == record_id, model.owner_id == owner_id, model.deleted_at.is_not(None))
+        .first()
+    )
+
+
+def soft_delete(db: Session, record) -> None:
+    """Mark ``record`` deleted and take its total out of the period snapshots; commits."""
+    model = type(record)
+    record.deleted_at = datetime.now(timezone.utc)
+    adjust_periods(db, model, record.owner_id, record.date, -record.total_price)
+    db.commit()
+    forget_models(record.owner_id, [record.date])
+
+
+def restore(db: Session, record) -> None:
+    """Bring a tombstone back, dropping references to rows deleted meanwhile; commits."""
+    model = type(record)
+    for column, target in _REFERENCES[model].items():
+        target_id = getattr(record, column)
+        if target_id is not None and db.get(target, target_id) is None:
+            setattr(record, column, None)
+    record.deleted_at = None
+    adjust_periods(db, model, record.owner_id, record.date, record.total_price)
+    db.commit()
+    forget_models(record.owner_id, [record.date])
+
+
+def _delete_images(urls: list[str]) -> set[str]:
+    """Delete ``urls`` from Qiniu; return those that may still exist."""
+    if not urls:
+        return set()
+    try:
+        return set(uploader.delete_many(urls))
+    except ImageUploadError as exc:
+        logger.warning("Failed to delete %s tombstone images: %s", len(urls), exc)
+        return set(urls)
+
+
+def compact(db: Session, retention: timedelta, batch_size: int = 500, now: datetime | None = None) -> int:
+    """Purge tombstones deleted more than ``retention`` ago, ``batch_size`` rows per transaction."""
+    cutoff = (now or datetime.now(timezone.utc)) - retention
+    purged = 0
+    for model in SOFT_DELETE_MODELS:
+        after_id = 0
+        while True:
+            rows = (
+                db.query(model.id, model.image_url, model.owner_id)
+                .execution_options(**{INCLUDE_DELETED: True})
+                .filter(model.deleted_at.is_not(None), model.deleted_at <= cutoff, model.id > after_id)
+                .order_by(model.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            after_id = rows[-1].id
+            kept = _delete_images([url for _, url, _ in rows if url])
+            purge = [(record_id, owner_id) for record_id, url, owner_id in rows if not url or url not in kept]
+            if purge:
+                db.execute(delete(model).where(model.id.in_([record_id for record_id, _ in purge])))
+                changelog.record(db, model, changelog.DELETE, purge)
+                db.commit()
+                purged += len(purge)
+    return purged
+
+
+def _compact_once() -> int:
+    db = SessionLocal()
+    try:
+        purged = compact(
+            db, timedelta(days=settings.TOMBSTONE_RETENTION_DAYS), settings.TOMBSTONE_COMPACTION_BATCH_SIZE
+        )
+        # The same housekeeping round trims change log entries every consumer has processed
+        changelog.prune(db, timedelta(days=settings.CHANGE_LOG_RETENTION_DAYS))
+        return purged
+    finally:
+        db.close()
+
+
+async def run_compaction(interval_seconds: float) -> None:
+    """Compact every ``interval_seconds``; with a shared cache only one worker runs each round."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        if not cache.add(_COMPACTION_LOCK, True, ttl=interval_seconds / 2):
+            continue
+        try:
+            purged = await run_in_threadpool(_compact_once)
+        except Exception:  # pragma: no cover - retried next round
+            logger.exception("Tombstone compaction failed")
+            continue
+        if purged:
+            logger.info("Purged %s tombstones", purged)
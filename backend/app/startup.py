@@ -0,0 +1,137 @@
+"""One-time start-up work shared by every worker process.
+
+``prepare`` upgrades the schema to the newest Alembic revision (see
+``migrations/``) and generates missing key material. It runs under an
+exclusive lock on a file next to the database, so when several workers start
+together exactly one of them does the work and the others wait for it and
+then find the database at head.
+
+Databases created with ``create_all`` before migrations existed have no
+``alembic_version`` table: the initial revision creates the tables they lack,
+their existing tables' columns are brought up to date by the ``ensure_*``
+steps, they are stamped at the initial revision, and the later revisions run
+as usual. Every step is idempotent, so an interrupted adoption is simply
+repeated on the next start.
+
+It then loads keys into the current process (``warm_up``) so the first
+request does not pay for them. ``app.main`` calls it from its lifespan;
+``app.serve`` also calls it in the parent before starting workers, so they
+only take the fast path.
+"""
+
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from functools import lru_cache
+
+from alembic import command
+from alembic.config import Config
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection, Engine
+
+from . import db
+from .core.config import settings
+from .core.crypto import get_public_key_pem
+from .core.jwt_keys import key_ring
+from .services.department_tree import ensure_department_tree
+from .services.display_names import ensure_display_name_columns
+from .services.suggest import ensure_name_key_columns
+
+ALEMBIC_INI = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "alembic.ini"))
+# Revision matching the schema that create_all produced before migrations existed
+INITIAL_REVISION = "0001"
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive advisory lock on ``path`` (created if missing)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a+b") as handle:
+        if os.name == "nt":
+            import msvcrt
+
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def _lock_path(engine: Engine) -> str:
+    return f"{engine.url.database or settings.SQLITE_DB_PATH}.lock"
+
+
+def alembic_config(connection: Connection | None = None, **attributes) -> Config:
+    """Alembic config that runs on ``connection`` and leaves the caller's logging alone."""
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logger"] = False
+    if connection is not None:
+        config.attributes["connection"] = connection
+    config.attributes.update(attributes)
+    return config
+
+
+@lru_cache(maxsize=1)
+def head_revision() -> str:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def current_revision(engine: Engine) -> str | None:
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+
+def _adopt_legacy_schema(engine: Engine) -> None:
+    """Bring a pre-migration database up to ``INITIAL_REVISION`` and stamp it."""
+    initial = ScriptDirectory.from_config(alembic_config()).get_revision(INITIAL_REVISION)
+    with engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            initial.module.upgrade()
+    ensure_display_name_columns(engine)
+    ensure_name_key_columns(engine)
+    ensure_department_tree(engine)
+    with engine.connect() as connection:
+        command.stamp(alembic_config(connection), INITIAL_REVISION)
+        connection.commit()
+
+
+def upgrade(engine: Engine, **attributes) -> None:
+    """Run every pending migration; ``attributes`` are passed to ``migrations/env.py``."""
+    if current_revision(engine) is None and db.Base.metadata.tables.keys() & set(inspect(engine).get_table_names()):
+        _adopt_legacy_schema(engine)
+    with engine.connect() as connection:
+        command.upgrade(alembic_config(connection, **attributes), "head")
+        connection.commit()
+
+
+def prepare(engine: Engine | None = None) -> bool:
+    """Bring the schema up to date and create missing keys; return whether the schema was migrated."""
+    engine = engine or db.engine
+    with file_lock(_lock_path(engine)):
+        migrated = current_revision(engine) != head_revision()
+        if migrated:
+            upgrade(engine)
+        # Under the lock so concurrent workers never generate different key files
+        warm_up()
+    return migrated
+
+
+def warm_up() -> None:
+    """Load (or create) the password transport and JWT signing keys in this process."""
+    get_public_key_pem()
+    if not settings.JWT_ALGORITHM.upper().startswith("HS"):
+        key_ring.signing_key()
@@ -0,0 +1,101 @@
+"""Import-time audit for the backend application.
+
+Runs ``python -X importtime -c "import app.main"`` in fresh interpreters and
+fails when the cumulative import time of the application module exceeds a
+budget, or when modules that should load lazily (Pillow, the qiniu SDK) are
+pulled in at import time. Uvicorn workers and the pytest session pay this
+cost on every start.
+
+    uv run -m app.utils.import_audit --budget-ms 1500 --top 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_TARGET = "app.main"
+DEFAULT_FORBIDDEN = ("PIL", "qiniu")
+
+
+@dataclass
+class ImportProfile:
+    target: str
+    total_us: int = 0
+    # module -> (self µs, cumulative µs)
+    modules: dict[str, tuple[int, int]] = field(default_factory=dict)
+
+    def loaded(self, package: str) -> list[str]:
+        return sorted(name for name in self.modules if name == package or name.startswith(package + "."))
+
+    def slowest(self, count: int) -> list[tuple[str, int]]:
+        ranked = sorted(((name, own) for name, (own, _) in self.modules.items()), key=lambda item: -item[1])
+        return ranked[:count]
+
+
+def parse_importtime(output: str, target: str) -> ImportProfile:
+    """Parse the stderr of ``-X importtime`` into an ``ImportProfile``."""
+    profile = ImportProfile(target=target)
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header row
+        own, cumulative, name = int(parts[0]), int(parts[1]), parts[2].strip()
+        profile.modules[name] = (own, cumulative)
+        if name == target:
+            profile.total_us = cumulative
+    return profile
+
+
+def profile_import(target: str = DEFAULT_TARGET) -> ImportProfile:
+    """Import ``target`` in a fresh interpreter and return its profile."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=BACKEND_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {target} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr, target)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Audit application import time")
+    parser.add_argument("--target", default=DEFAULT_TARGET, help="module to import (default: app.main)")
+    parser.add_argument("--budget-ms", type=float, default=2000.0, help="maximum cumulative import time")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to run; the fastest one is judged")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest modules to list")
+    parser.add_argument(
+        "--forbid", nargs="*", default=list(DEFAULT_FORBIDDEN), help="packages that must not load at import time"
+    )
+    args = parser.parse_args()
+
+    profiles = [profile_import(args.target) for _ in range(max(1, args.runs))]
+    best = min(profiles, key=lambda profile: profile.total_us)
+
+    print(f"{args.target}: {best.total_us / 1000:.1f} ms (budget {args.budget_ms:.0f} ms, best of {len(profiles)})")
+    for name, own in best.slowest(args.top):
+        print(f"  {own / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if best.total_us / 1000 > args.budget_ms:
+        failures.append(f"import time {best.total_us / 1000:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+    for package in args.forbid:
+        loaded = best.loaded(package)
+        if loaded:
+            failures.append(f"{package} is imported eagerly ({len(loaded)} modules)")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
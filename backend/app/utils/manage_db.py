@@ -5,6 +5,7 @@ from datetime import date, timedelta
 from decimal import Decimal
 
 from ..core.config import settings
+from .. import startup
 from ..db import Base, engine, SessionLocal
 from ..core.security import get_password_hash
 from ..core.crypto import get_public_key_pem, decrypt_password
@@ -29,6 +30,10 @@ from ..models.supplier import Supplier
 from ..models.type import Type
 from ..models.purchase import Purchase
 from ..models.sale import Sale
+from ..services import display_names  # noqa: F401  (fills Sale/Purchase display names on insert)
+from ..services import suggest  # noqa: F401  (fills prefix-search name keys on insert)
+from ..services import department_tree  # noqa: F401  (maintains the department closure table)
+from ..services import changelog  # noqa: F401  (logs seeded rows to the change log)
 
 
 def reset_sqlite_db() -> None:
@@ -36,7 +41,7 @@ def reset_sqlite_db() -> None:
 
     if os.path.exists(db_path):
         os.remove(db_path)
-    Base.metadata.create_all(bind=engine)
+    startup.prepare(engine)
     os.chmod(db_path, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IWGRP)
 
 
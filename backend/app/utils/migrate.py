@@ -0,0 +1,134 @@
+"""Apply or rehearse schema migrations.
+
+    python -m app.utils.migrate --action status
+    python -m app.utils.migrate --action dry-run [--database copy-of-production.db]
+    python -m app.utils.migrate --action upgrade
+
+``dry-run`` copies the database with SQLite's online backup (the source stays
+readable and writable meanwhile), upgrades the copy and reports how long each
+revision and each schema statement took. The copy is deleted afterwards. The
+longest single statement is the longest writers will wait during the real
+upgrade, since indexes are built and committed one at a time (revision 0002).
+``upgrade`` does what every worker does at start-up, under the same lock.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+from dataclasses import dataclass, field
+
+from sqlalchemy import create_engine, event, inspect, text
+
+from .. import startup
+from ..core.config import settings
+
+# Statements reported individually in a dry run
+_SCHEMA_PREFIXES = ("CREATE", "ALTER", "DROP", "INSERT", "UPDATE", "DELETE")
+
+
+@dataclass
+class DryRunReport:
+    rows: dict[str, int] = field(default_factory=dict)
+    revisions: list[tuple[str, float]] = field(default_factory=list)
+    statements: list[tuple[str, float]] = field(default_factory=list)
+    copy_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+    @property
+    def longest_statement(self) -> tuple[str, float] | None:
+        return max(self.statements, key=lambda item: item[1], default=None)
+
+
+def _copy_database(source: str, target: str) -> None:
+    with closing(sqlite3.connect(source)) as src, closing(sqlite3.connect(target)) as dst:
+        src.backup(dst)
+
+
+def dry_run(source: str) -> DryRunReport:
+    """Upgrade a temporary copy of ``source`` to head and time every step."""
+    report = DryRunReport()
+    with tempfile.TemporaryDirectory() as directory:
+        copy_path = os.path.join(directory, "dry-run.db")
+        started = time.perf_counter()
+        _copy_database(source, copy_path)
+        report.copy_seconds = time.perf_counter() - started
+
+        engine = create_engine(f"sqlite:///{copy_path}")
+        try:
+            with engine.connect() as connection:
+                for table in inspect(connection).get_table_names():
+                    report.rows[table] = connection.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar()
+
+            @event.listens_for(engine, "before_cursor_execute")
+            def _before(conn, cursor, statement, parameters, context, executemany):
+                conn.info["statement_started"] = time.perf_counter()
+
+            @event.listens_for(engine, "after_cursor_execute")
+            def _after(conn, cursor, statement, parameters, context, executemany):
+                if statement.lstrip().upper().startswith(_SCHEMA_PREFIXES):
+                    elapsed = time.perf_counter() - conn.info.pop("statement_started")
+                    report.statements.append((" ".join(statement.split()), elapsed))
+
+            revision_started = [time.perf_counter()]
+
+            def _on_version_apply(ctx, step, heads, run_args):
+                now = time.perf_counter()
+                script = step.up_revision
+                report.revisions.append((f"{script.revision} {script.doc or ''}".strip(), now - revision_started[0]))
+                revision_started[0] = now
+
+            started = time.perf_counter()
+            startup.upgrade(engine, on_version_apply=[_on_version_apply])
+            report.total_seconds = time.perf_counter() - started
+        finally:
+            engine.dispose()
+    return report
+
+
+def _print_report(source: str, report: DryRunReport) -> None:
+    print(f"dry run against a copy of {source} (copied in {report.copy_seconds:.2f}s)")
+    for table, count in sorted(report.rows.items()):
+        print(f"  {table:<24} {count:>10} rows")
+    if not report.revisions and not report.statements:
+        print("nothing to do: the database is already at head")
+        return
+    print("revisions:")
+    for label, seconds in report.revisions:
+        print(f"  {seconds:8.3f}s  {label.splitlines()[0]}")
+    print("slowest statements:")
+    for statement, seconds in sorted(report.statements, key=lambda item: -item[1])[:10]:
+        print(f"  {seconds:8.3f}s  {statement[:100]}")
+    longest = report.longest_statement
+    print(f"estimated upgrade time: {report.total_seconds:.2f}s")
+    if longest is not None:
+        print(f"longest write lock (single statement): {longest[1]:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or rehearse Financial Manager schema migrations")
+    parser.add_argument("--action", choices=["status", "dry-run", "upgrade"], default="status")
+    parser.add_argument("--database", default=settings.SQLITE_DB_PATH, help="SQLite file (default: config.yaml)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.database):
+        parser.error(f"database not found: {args.database}")
+    if args.action == "dry-run":
+        _print_report(args.database, dry_run(args.database))
+        return
+
+    engine = create_engine(f"sqlite:///{args.database}")
+    try:
+        if args.action == "upgrade":
+            startup.prepare(engine)
+        print(f"current revision: {startup.current_revision(engine)} (head: {startup.head_revision()})")
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Shared helpers for the load benchmarks.
+
+Each benchmark runs the real application under uvicorn in a background thread
+against a throwaway SQLite database (swapped in the same way as
+``tests/conftest.py``), so results reflect the actual request path including
+the threadpool and event loop.
+"""
+
+from __future__ import annotations
+
+import base64
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import httpx
+import uvicorn
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from sqlalchemy import create_engine
+
+import app.db as app_db
+from app.core import config
+from app.core.crypto import derive_session_key
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def temp_database() -> Iterator[str]:
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    original_path = config.settings.SQLITE_DB_PATH
+    original_engine = app_db.engine
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    config.settings.SQLITE_DB_PATH = path
+    app_db.engine = engine
+    app_db.SessionLocal.configure(bind=engine)
+    try:
+        yield path
+    finally:
+        app_db.SessionLocal.configure(bind=original_engine)
+        app_db.engine = original_engine
+        config.settings.SQLITE_DB_PATH = original_path
+        engine.dispose()
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+@contextmanager
+def running_server() -> Iterator[str]:
+    """Serve ``app.main:app`` on a free local port and yield its base URL."""
+    from app.main import app
+
+    with temp_database():
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        deadline = time.monotonic() + 15
+        while not server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("benchmark server did not start")
+            time.sleep(0.05)
+        try:
+            yield f"http://127.0.0.1:{port}"
+        finally:
+            server.should_exit = True
+            thread.join(timeout=15)
+
+
+def encrypt_password(pem: str, plaintext: str) -> str:
+    public_key = serialization.load_pem_public_key(pem.encode("utf-8"))
+    return base64.b64encode(public_key.encrypt(plaintext.encode("utf-8"), padding.PKCS1v15())).decode("utf-8")
+
+
+def open_transport_session(client: httpx.Client) -> tuple[str, bytes]:
+    """Run the /auth/handshake exchange and return ``(session_id, aes_key)``."""
+    private = X25519PrivateKey.generate()
+    public = private.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+    resp = client.post("/auth/handshake", json={"client_public": base64.b64encode(public).decode("ascii")})
+    resp.raise_for_status()
+    body = resp.json()
+    server_public = X25519PublicKey.from_public_bytes(base64.urlsafe_b64decode(body["server_public"] + "=" * (-len(body["server_public"]) % 4)))
+    return body["session_id"], derive_session_key(private.exchange(server_public), body["session_id"])
+
+
+def session_encrypt(session_id: str, key: bytes, plaintext: str) -> str:
+    nonce = os.urandom(12)
+    ciphertext = AESGCM(key).encrypt(nonce, plaintext.encode("utf-8"), session_id.encode("ascii"))
+    return f"s1.{session_id}.{base64.urlsafe_b64encode(nonce + ciphertext).decode('ascii')}"
+
+
+def register_user(client: httpx.Client, email: str, password: str = "1234") -> str:
+    """Register ``email`` and return its encrypted password for later logins."""
+    pem = client.get("/auth/pubkey").json()["pem"]
+    enc_password = encrypt_password(pem, password)
+    resp = client.post("/auth/register", json={"email": email, "enc_password": enc_password, "company_name": "Bench"})
+    resp.raise_for_status()
+    return enc_password
+
+
+def login_headers(client: httpx.Client, email: str, enc_password: str) -> dict[str, str]:
+    resp = client.post("/auth/login", json={"email": email, "enc_password": enc_password})
+    resp.raise_for_status()
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[int(pct) - 1]
+
+
+def summarize(label: str, samples: list[float]) -> dict[str, float]:
+    result = {"p50": percentile(samples, 50) * 1000, "p95": percentile(samples, 95) * 1000}
+    print(f"{label:<24} n={len(samples):<5} p50={result['p50']:.1f}ms p95={result['p95']:.1f}ms")
+    return result
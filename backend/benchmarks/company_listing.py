@@ -0,0 +1,148 @@
+"""Companies listing with large department fan-out.
+
+Seeds companies that each have hundreds of departments and times one page of
+the listing three ways, in process against the same SQLite file:
+
+* ``legacy``: the previous ``joinedload(Company.departments)`` query with
+  ``offset/limit`` (rows multiplied by department count, paginated through a
+  subquery);
+* ``two-phase``: ``list_customer_companies`` as served now;
+* ``no departments``: the same with ``include_departments=False``.
+
+Each variant includes response serialization. Exits non-zero if the two-phase
+p50 is not below the legacy p50.
+
+    python -m benchmarks.company_listing --companies 200 --departments 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+
+import app.db as app_db
+from app.models.company import Company
+from app.models.customer import Customer
+from app.models.department import Department
+from app.models.user import User
+from app.models.user_company import user_company_table
+from app.models.user_customer import user_customer_table
+from app.routers.companies import list_customer_companies
+from app.schemas.company import CompanyRead, CompanySummary
+from app.services import membership
+
+from ._support import summarize, temp_database
+
+
+def _seed(companies: int, departments: int, members: int) -> int:
+    app_db.Base.metadata.create_all(bind=app_db.engine)
+    with app_db.engine.begin() as connection:
+        user_id = connection.execute(
+            insert(User.__table__).values(email="listing@example.com", hashed_password="x")
+        ).inserted_primary_key[0]
+        connection.execute(
+            insert(Company.__table__),
+            [{"id": i, "name": f"Company {i:05d}"} for i in range(1, companies + 1)],
+        )
+        connection.execute(
+            insert(user_company_table), [{"user_id": user_id, "company_id": i} for i in range(1, companies + 1)]
+        )
+        connection.execute(
+            insert(Department.__table__),
+            [
+                {"name": f"Dept {i}-{j}", "company_id": i}
+                for i in range(1, companies + 1)
+                for j in range(departments)
+            ],
+        )
+        customer_rows = [
+            {"id": i * members + j + 1, "name": f"Member {i}-{j}", "company_id": i}
+            for i in range(1, companies + 1)
+            for j in range(members)
+        ]
+        if customer_rows:
+            connection.execute(insert(Customer.__table__), customer_rows)
+            connection.execute(
+                insert(user_customer_table), [{"user_id": user_id, "customer_id": row["id"]} for row in customer_rows]
+            )
+    return user_id
+
+
+def _legacy(db, user: User, skip: int, limit: int) -> list:
+    access = membership.access_filter(db, user.id, membership.COMPANIES, Company.id)
+    query = db.query(Company).filter(access).options(joinedload(Company.departments))
+    companies = query.offset(skip).limit(limit).all()
+    return TypeAdapter(list[CompanyRead]).dump_python(
+        [CompanyRead.model_validate(company) for company in companies], mode="json"
+    )
+
+
+def _two_phase(include_departments: bool):
+    adapter = TypeAdapter(list[CompanySummary])
+
+    def run(db, user: User, skip: int, limit: int) -> list:
+        rows = list_customer_companies(
+            skip=skip, limit=limit, q=None, include_departments=include_departments, db=db, current_user=user
+        )
+        return adapter.dump_python(rows, mode="json")
+
+    return run
+
+
+def _time(variant, user_id: int, pages: int, limit: int, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        for page in range(pages):
+            db = app_db.SessionLocal()
+            try:
+                user = db.get(User, user_id)
+                started = time.perf_counter()
+                variant(db, user, page * limit, limit)
+                samples.append(time.perf_counter() - started)
+            finally:
+                db.close()
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--companies", type=int, default=200)
+    parser.add_argument("--departments", type=int, default=300, help="departments per company")
+    parser.add_argument("--members", type=int, default=5, help="customers per company")
+    parser.add_argument("--limit", type=int, default=20, help="page size")
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with temp_database():
+        started = time.perf_counter()
+        user_id = _seed(args.companies, args.departments, args.members)
+        print(
+            f"seeded {args.companies} companies x {args.departments} departments "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        variants = {
+            "legacy joinedload": _legacy,
+            "two-phase": _two_phase(True),
+            "no departments": _two_phase(False),
+        }
+        results = {
+            label: summarize(label, _time(variant, user_id, args.pages, args.limit, args.repeat))
+            for label, variant in variants.items()
+        }
+        app_db.engine.dispose()
+
+    if results["two-phase"]["p50"] >= results["legacy joinedload"]["p50"]:
+        print("FAIL: two-phase listing is not faster than the joinedload query")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
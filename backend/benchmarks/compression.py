@@ -0,0 +1,131 @@
+"""Response compression: bytes on the wire and CPU per request.
+
+Seeds one user with sales spread over many customers, then fetches a 1000-row
+``/sales/`` page and the yearly ``/statistics/`` (trend, comparison and
+``customerAnalysis`` series) through the real server, once per encoding. For each it reports the body size on the wire, latency and the
+process CPU time per request (server and client share the process, so this
+includes the client's share, which is the same for every encoding). The
+compression step alone is timed in process on the same bodies.
+
+Exits non-zero if gzip does not shrink the sales page at least ``--min-ratio``
+times.
+
+    python -m benchmarks.compression --sales 5000 --customers 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import httpx
+
+import app.db as app_db
+from app.core import compression
+from app.models.customer import Customer
+from app.models.sale import Sale
+from app.models.user import User
+from app.models.user_customer import user_customer_table
+from app.services import display_names  # noqa: F401  (fills display names of the seeded sales)
+
+from ._support import login_headers, register_user, running_server, summarize
+
+ENDPOINTS = {
+    "sales page": ("/sales/", {"limit": 1000}),
+    "statistics": ("/statistics/", {"analysis_type": "yearly"}),
+}
+
+
+def _seed(email: str, sales: int, customers: int) -> None:
+    rng = random.Random(7)
+    today = date.today()
+    with app_db.SessionLocal() as db:
+        user = db.query(User).filter(User.email == email).one()
+        rows = [Customer(name=f"Customer {i:04d}") for i in range(customers)]
+        db.add_all(rows)
+        db.flush()
+        db.execute(user_customer_table.insert(), [{"user_id": user.id, "customer_id": row.id} for row in rows])
+        for i in range(sales):
+            count = rng.randint(1, 20)
+            price = Decimal(rng.randint(100, 90000)) / 100
+            db.add(
+                Sale(
+                    owner_id=user.id,
+                    date=today - timedelta(days=rng.randint(0, 360)),
+                    customer_id=rows[rng.randrange(customers)].id,
+                    item_name=f"Item {rng.randint(1, 200)}",
+                    items_count=count,
+                    unit_price=price,
+                    total_price=price * count,
+                    status=rng.choice(["draft", "sent", "paid"]),
+                )
+            )
+        db.commit()
+
+
+def _fetch(client: httpx.Client, path: str, params: dict, encoding: str, repeat: int):
+    samples: list[float] = []
+    wire = 0
+    cpu_started = time.process_time()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with client.stream("GET", path, params=params, headers={"Accept-Encoding": encoding}) as resp:
+            resp.raise_for_status()
+            wire = sum(len(chunk) for chunk in resp.iter_raw())
+        samples.append(time.perf_counter() - started)
+    return wire, samples, (time.process_time() - cpu_started) / repeat
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sales", type=int, default=5000)
+    parser.add_argument("--customers", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--min-ratio", type=float, default=4.0)
+    args = parser.parse_args()
+
+    encodings = ["identity", "gzip"] + (["br"] if compression.brotli is not None else [])
+    if compression.brotli is None:
+        print("brotli is not installed; measuring gzip only")
+
+    ratios = {}
+    with running_server() as base_url:
+        with httpx.Client(base_url=base_url, timeout=120) as client:
+            email = "compression@example.com"
+            headers = login_headers(client, email, register_user(client, email))
+            started = time.perf_counter()
+            _seed(email, args.sales, args.customers)
+            print(f"seeded {args.sales} sales over {args.customers} customers in {time.perf_counter() - started:.1f}s")
+            client.headers.update(headers)
+
+            for label, (path, params) in ENDPOINTS.items():
+                body = client.get(path, params=params, headers={"Accept-Encoding": "identity"}).content
+                sizes = {}
+                for encoding in encodings:
+                    wire, samples, cpu = _fetch(client, path, params, encoding, args.repeat)
+                    sizes[encoding] = wire
+                    summarize(f"{label} [{encoding}]", samples)
+                    print(f"{'':<24} {wire:>9} bytes on the wire, {cpu * 1000:.1f}ms CPU/request")
+                for encoding in encodings[1:]:
+                    cpu_started = time.process_time()
+                    for _ in range(args.repeat):
+                        compression.compress(body, encoding)
+                    cost = (time.process_time() - cpu_started) / args.repeat
+                    ratio = sizes["identity"] / max(sizes[encoding], 1)
+                    print(f"{label} {encoding}: {ratio:.1f}x smaller, compression alone {cost * 1000:.2f}ms")
+                ratios[label] = sizes["identity"] / max(sizes["gzip"], 1)
+        app_db.engine.dispose()
+
+    if ratios["sales page"] < args.min_ratio:
+        print(f"FAIL: gzip shrank the sales page only {ratios['sales page']:.1f}x")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Login storm: non-auth latency must stay flat while many users log in.
+
+Measures ``GET /types/`` latency alone, then again while a burst of
+concurrent logins runs (the pattern seen when many tokens expire at once).
+Exits non-zero when the p95 under load exceeds ``--max-ratio`` times the
+baseline p95 (plus a small absolute allowance for scheduler noise).
+
+    python -m benchmarks.login_storm --users 40 --concurrency 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from ._support import login_headers, register_user, running_server, summarize
+
+ALLOWANCE_SECONDS = 0.02
+
+
+def _probe(base_url: str, headers: dict[str, str], stop: threading.Event, samples: list[float]) -> None:
+    with httpx.Client(base_url=base_url, headers=headers, timeout=60) as client:
+        while not stop.is_set():
+            started = time.perf_counter()
+            client.get("/types/").raise_for_status()
+            samples.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+
+def _measure(base_url: str, headers: dict[str, str], seconds: float) -> list[float]:
+    samples: list[float] = []
+    stop = threading.Event()
+    thread = threading.Thread(target=_probe, args=(base_url, headers, stop, samples))
+    thread.start()
+    time.sleep(seconds)
+    stop.set()
+    thread.join()
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3, help="logins per user during the storm")
+    parser.add_argument("--baseline-seconds", type=float, default=3.0)
+    parser.add_argument("--max-ratio", type=float, default=3.0)
+    args = parser.parse_args()
+
+    with running_server() as base_url:
+        with httpx.Client(base_url=base_url, timeout=120) as client:
+            users = [(f"storm{i}@example.com", register_user(client, f"storm{i}@example.com")) for i in range(args.users)]
+            probe_headers = login_headers(client, *users[0])
+
+        baseline = _measure(base_url, probe_headers, args.baseline_seconds)
+
+        samples: list[float] = []
+        stop = threading.Event()
+        prober = threading.Thread(target=_probe, args=(base_url, probe_headers, stop, samples))
+        started = time.perf_counter()
+        prober.start()
+        with httpx.Client(base_url=base_url, timeout=120) as client:
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                jobs = [pool.submit(login_headers, client, email, enc) for email, enc in users * args.rounds]
+                for job in jobs:
+                    job.result()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        prober.join()
+
+    logins = args.users * args.rounds
+    print(f"{logins} logins in {elapsed:.1f}s ({logins / elapsed:.1f}/s)")
+    before = summarize("baseline GET /types/", baseline)
+    during = summarize("storm GET /types/", samples)
+    limit = before["p95"] * args.max_ratio + ALLOWANCE_SECONDS * 1000
+    if during["p95"] > limit:
+        print(f"FAIL: p95 under load {during['p95']:.1f}ms exceeds {limit:.1f}ms")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Password transport: RSA-PKCS1v15 versus an /auth/handshake session key.
+
+Reports the server-side cost of decrypting one submitted password in each
+format, then login throughput over HTTP with every login carrying a freshly
+encrypted password (RSA) or one sealed with the session's AES-GCM key.
+Argon2 verification dominates a login, so lower ``backend.password_hash``
+costs in config.yaml to see the transport share more clearly.
+
+    python -m benchmarks.password_transport --logins 60 --concurrency 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from app.core.crypto import decrypt_password
+
+from ._support import (
+    encrypt_password,
+    open_transport_session,
+    register_user,
+    running_server,
+    session_encrypt,
+)
+
+
+def _decrypt_rate(enc_values: list[str]) -> float:
+    started = time.perf_counter()
+    for value in enc_values:
+        decrypt_password(value)
+    return len(enc_values) / (time.perf_counter() - started)
+
+
+def _login_rate(base_url: str, submissions: list[tuple[str, str]], concurrency: int) -> float:
+    def _login(client: httpx.Client, email: str, enc_password: str) -> None:
+        client.post("/auth/login", json={"email": email, "enc_password": enc_password}).raise_for_status()
+
+    with httpx.Client(base_url=base_url, timeout=120) as client:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for job in [pool.submit(_login, client, email, enc) for email, enc in submissions]:
+                job.result()
+        return len(submissions) / (time.perf_counter() - started)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--decrypts", type=int, default=500)
+    args = parser.parse_args()
+
+    with running_server() as base_url:
+        with httpx.Client(base_url=base_url, timeout=120) as client:
+            email = "transport@example.com"
+            register_user(client, email)
+            pem = client.get("/auth/pubkey").json()["pem"]
+            session_id, key = open_transport_session(client)
+
+        rsa_values = [encrypt_password(pem, "1234") for _ in range(args.decrypts)]
+        session_values = [session_encrypt(session_id, key, "1234") for _ in range(args.decrypts)]
+        rsa_decrypts = _decrypt_rate(rsa_values)
+        session_decrypts = _decrypt_rate(session_values)
+
+        rsa_logins = _login_rate(base_url, [(email, value) for value in rsa_values[: args.logins]], args.concurrency)
+        session_logins = _login_rate(
+            base_url, [(email, value) for value in session_values[: args.logins]], args.concurrency
+        )
+
+    print(f"{'':<10} {'decrypt/s':>12} {'login/s':>10}")
+    print(f"{'rsa':<10} {rsa_decrypts:>12.0f} {rsa_logins:>10.1f}")
+    print(f"{'session':<10} {session_decrypts:>12.0f} {session_logins:>10.1f}")
+    if session_decrypts <= rsa_decrypts:
+        print("FAIL: session decryption is not cheaper than RSA")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
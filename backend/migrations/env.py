@@ -0,0 +1,63 @@
+"""Alembic environment wired to ``app.db.Base``.
+
+The target database is ``config.attributes["connection"]`` when the caller
+(``app.startup``, ``app.utils.migrate``) passes one, otherwise the SQLite file
+from config.yaml. SQLite cannot alter most constraints in place, so
+autogenerate renders batch (copy-and-move) operations.
+"""
+
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+
+from app import models  # noqa: F401  (registers every table on Base.metadata)
+from app.core.config import settings
+from app.db import Base
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def _configure(**kwargs) -> None:
+    context.configure(
+        target_metadata=target_metadata,
+        render_as_batch=True,
+        # Each revision commits on its own, so an interrupted upgrade resumes after the last finished one
+        transaction_per_migration=True,
+        on_version_apply=config.attributes.get("on_version_apply", ()),
+        **kwargs,
+    )
+
+
+def run_migrations_offline() -> None:
+    _configure(url=f"sqlite:///{settings.SQLITE_DB_PATH}", literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+    engine = create_engine(f"sqlite:///{settings.SQLITE_DB_PATH}")
+    try:
+        with engine.connect() as connection:
+            _configure(connection=connection)
+            with context.begin_transaction():
+                context.run_migrations()
+    finally:
+        engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,215 @@
+"""Initial schema: every table as created by ``Base.metadata.create_all``.
+
+Secondary indexes are left to revision 0002, which builds them one at a time.
+Databases created before migrations existed already have some of these
+tables: ``app.startup`` runs this upgrade on them to create only the missing
+ones, brings the existing tables' columns up to date and then stamps this
+revision.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    if op.get_context().as_sql:
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _create_table(name: str, *elements) -> bool:
+    """Create ``name`` unless it exists; return whether it was created."""
+    if _has_table(name):
+        return False
+    op.create_table(name, *elements)
+    return True
+
+
+def upgrade() -> None:
+    _create_table(
+        "companies",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("address", sa.String(length=512), nullable=True),
+        sa.Column("legal_person", sa.String(length=255), nullable=True),
+        sa.Column("phone", sa.String(length=50), nullable=True),
+        sa.Column("email", sa.String(length=255), nullable=True),
+        sa.Column("name_key", sa.String(length=255), nullable=True),
+        sa.Column("name_initials", sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    _create_table(
+        "suppliers",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("phone_number", sa.String(length=50), nullable=True),
+        sa.Column("email", sa.String(length=255), nullable=True),
+        sa.Column("address", sa.String(length=255), nullable=True),
+        sa.Column("name_key", sa.String(length=255), nullable=True),
+        sa.Column("name_initials", sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    users_created = _create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(length=255), nullable=False),
+        sa.Column("hashed_password", sa.String(length=255), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("company_name", sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    if users_created:
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+    _create_table(
+        "departments",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("company_id", sa.Integer(), nullable=False),
+        sa.Column("parent_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["company_id"], ["companies.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["parent_id"], ["departments.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    _create_table(
+        "statistics_snapshots",
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column("granularity", sa.String(length=16), nullable=False),
+        sa.Column("period_start", sa.Date(), nullable=False),
+        sa.Column("amount", sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("owner_id", "kind", "granularity", "period_start"),
+    )
+    _create_table(
+        "types",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("name_key", sa.String(length=255), nullable=True),
+        sa.Column("name_initials", sa.String(length=255), nullable=True),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    _create_table(
+        "user_companies",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("company_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["company_id"], ["companies.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "company_id"),
+    )
+    _create_table(
+        "user_suppliers",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("supplier_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["supplier_id"], ["suppliers.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "supplier_id"),
+    )
+    _create_table(
+        "customers",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("phone_number", sa.String(length=50), nullable=True),
+        sa.Column("email", sa.String(length=255), nullable=True),
+        sa.Column("position", sa.String(length=255), nullable=True),
+        sa.Column("name_key", sa.String(length=255), nullable=True),
+        sa.Column("name_initials", sa.String(length=255), nullable=True),
+        sa.Column("company_id", sa.Integer(), nullable=False),
+        sa.Column("department_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["department_id"], ["departments.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    _create_table(
+        "department_paths",
+        sa.Column("ancestor_id", sa.Integer(), nullable=False),
+        sa.Column("descendant_id", sa.Integer(), nullable=False),
+        sa.Column("depth", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["ancestor_id"], ["departments.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["descendant_id"], ["departments.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("ancestor_id", "descendant_id"),
+    )
+    _create_table(
+        "purchases",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("type_id", sa.Integer(), nullable=True),
+        sa.Column("supplier_id", sa.Integer(), nullable=True),
+        sa.Column("item_name", sa.String(length=255), nullable=True),
+        sa.Column("items_count", sa.Integer(), nullable=False),
+        sa.Column("unit_price", sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column("total_price", sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column("image_url", sa.String(length=512), nullable=True),
+        sa.Column("status", sa.String(length=50), nullable=False),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.Column("supplier_name", sa.String(length=255), nullable=True),
+        sa.Column("type_name", sa.String(length=255), nullable=True),
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["supplier_id"], ["suppliers.id"], ondelete="SET NULL"),
+        sa.ForeignKeyConstraint(["type_id"], ["types.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    _create_table(
+        "sales",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("type_id", sa.Integer(), nullable=True),
+        sa.Column("customer_id", sa.Integer(), nullable=True),
+        sa.Column("item_name", sa.String(length=255), nullable=True),
+        sa.Column("items_count", sa.Integer(), nullable=False),
+        sa.Column("unit_price", sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column("total_price", sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column("image_url", sa.String(length=512), nullable=True),
+        sa.Column("status", sa.String(length=50), nullable=False),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.Column("customer_name", sa.String(length=255), nullable=True),
+        sa.Column("customer_company_id", sa.Integer(), nullable=True),
+        sa.Column("company_name", sa.String(length=255), nullable=True),
+        sa.Column("customer_department_id", sa.Integer(), nullable=True),
+        sa.Column("department_name", sa.String(length=255), nullable=True),
+        sa.Column("department_company_id", sa.Integer(), nullable=True),
+        sa.Column("type_name", sa.String(length=255), nullable=True),
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["customer_id"], ["customers.id"], ondelete="SET NULL"),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["type_id"], ["types.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    _create_table(
+        "user_customers",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("customer_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["customer_id"], ["customers.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "customer_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_customers")
+    op.drop_table("sales")
+    op.drop_table("purchases")
+    op.drop_table("department_paths")
+    op.drop_table("customers")
+    op.drop_table("user_suppliers")
+    op.drop_table("user_companies")
+    op.drop_table("types")
+    op.drop_table("statistics_snapshots")
+    op.drop_table("departments")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_table("users")
+    op.drop_table("suppliers")
+    op.drop_table("companies")
@@ -0,0 +1,89 @@
+"""Secondary indexes, built one per transaction so the build can resume.
+
+SQLite has no concurrent index build: ``CREATE INDEX`` holds the write lock
+for as long as it runs. Each index is therefore created and committed on its
+own, so writers only wait for one index at a time rather than the whole
+revision, and ``IF NOT EXISTS`` lets an interrupted upgrade pick up where it
+stopped. Use ``python -m app.utils.migrate --action dry-run`` to time the
+build against a copy of the database first.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, partial-index condition)
+INDEXES = [
+    ("ix_companies_id", "companies", ["id"], None),
+    ("ix_companies_name", "companies", ["name"], None),
+    ("ix_companies_name_key", "companies", ["name_key"], None),
+    ("ix_companies_name_initials", "companies", ["name_initials"], None),
+    ("ix_suppliers_id", "suppliers", ["id"], None),
+    ("ix_suppliers_name_key", "suppliers", ["name_key"], None),
+    ("ix_suppliers_name_initials", "suppliers", ["name_initials"], None),
+    ("ix_users_id", "users", ["id"], None),
+    ("ix_departments_id", "departments", ["id"], None),
+    ("ix_departments_company_id", "departments", ["company_id"], None),
+    ("ix_departments_parent_id", "departments", ["parent_id"], None),
+    ("ix_department_paths_descendant", "department_paths", ["descendant_id", "ancestor_id"], None),
+    ("ix_types_id", "types", ["id"], None),
+    ("ix_types_owner_id", "types", ["owner_id"], None),
+    ("ix_types_owner_name_key", "types", ["owner_id", "name_key"], None),
+    ("ix_types_owner_name_initials", "types", ["owner_id", "name_initials"], None),
+    ("ix_customers_id", "customers", ["id"], None),
+    ("ix_customers_company_id", "customers", ["company_id"], None),
+    ("ix_customers_department_id", "customers", ["department_id"], None),
+    ("ix_customers_name_key", "customers", ["name_key"], None),
+    ("ix_customers_name_initials", "customers", ["name_initials"], None),
+    ("ix_purchases_id", "purchases", ["id"], None),
+    ("ix_purchases_owner_id", "purchases", ["owner_id"], None),
+    ("ix_purchases_type_id", "purchases", ["type_id"], None),
+    ("ix_purchases_supplier_id", "purchases", ["supplier_id"], None),
+    ("ix_purchases_owner_date", "purchases", ["owner_id", "date"], None),
+    ("ix_purchases_owner_supplier_date", "purchases", ["owner_id", "supplier_id", "date", "total_price"], None),
+    (
+        "ix_purchases_open_owner_supplier",
+        "purchases",
+        ["owner_id", "supplier_id", "date", "total_price"],
+        "status IN ('pending', 'ordered')",
+    ),
+    ("ix_sales_id", "sales", ["id"], None),
+    ("ix_sales_owner_id", "sales", ["owner_id"], None),
+    ("ix_sales_type_id", "sales", ["type_id"], None),
+    ("ix_sales_customer_id", "sales", ["customer_id"], None),
+    ("ix_sales_owner_date", "sales", ["owner_id", "date"], None),
+    ("ix_sales_owner_department_date", "sales", ["owner_id", "customer_department_id", "date"], None),
+    (
+        "ix_sales_open_owner_customer",
+        "sales",
+        ["owner_id", "customer_id", "date", "total_price"],
+        "status IN ('draft', 'sent')",
+    ),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns, where in INDEXES:
+        with op.get_context().autocommit_block():
+            op.create_index(
+                name,
+                table,
+                columns,
+                if_not_exists=True,
+                sqlite_where=sa.text(where) if where else None,
+            )
+
+
+def downgrade() -> None:
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,101 @@
+"""Soft delete for sales and purchases.
+
+Adds ``deleted_at`` and replaces the hot indexes with partial ones over live
+rows (``deleted_at IS NULL``), plus a small partial index over tombstones.
+The covering indexes carry the columns of their WHERE terms as trailing
+columns, which SQLite needs before it answers from a partial index alone.
+Each replacement is built under its new name before the old index is
+dropped, so queries always have an index to use; as in 0002, every statement
+commits on its own and the revision can be re-run after an interruption.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LIVE = "deleted_at IS NULL"
+DELETED = "deleted_at IS NOT NULL"
+OPEN_SALE = "status IN ('draft', 'sent')"
+OPEN_PURCHASE = "status IN ('pending', 'ordered')"
+
+# (new index, table, columns, condition, index it replaces)
+INDEXES = [
+    ("ix_sales_live_owner_date", "sales", ["owner_id", "date"], LIVE, "ix_sales_owner_date"),
+    (
+        "ix_sales_live_owner_department_date",
+        "sales",
+        ["owner_id", "customer_department_id", "date"],
+        LIVE,
+        "ix_sales_owner_department_date",
+    ),
+    (
+        "ix_sales_live_open_owner_customer",
+        "sales",
+        ["owner_id", "customer_id", "date", "total_price", "status", "deleted_at"],
+        f"{OPEN_SALE} AND {LIVE}",
+        "ix_sales_open_owner_customer",
+    ),
+    ("ix_sales_deleted_at", "sales", ["deleted_at"], DELETED, None),
+    ("ix_purchases_live_owner_date", "purchases", ["owner_id", "date"], LIVE, "ix_purchases_owner_date"),
+    (
+        "ix_purchases_live_owner_supplier_date",
+        "purchases",
+        ["owner_id", "supplier_id", "date", "total_price", "deleted_at"],
+        LIVE,
+        "ix_purchases_owner_supplier_date",
+    ),
+    (
+        "ix_purchases_live_open_owner_supplier",
+        "purchases",
+        ["owner_id", "supplier_id", "date", "total_price", "status", "deleted_at"],
+        f"{OPEN_PURCHASE} AND {LIVE}",
+        "ix_purchases_open_owner_supplier",
+    ),
+    ("ix_purchases_deleted_at", "purchases", ["deleted_at"], DELETED, None),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table in ("sales", "purchases"):
+        if "deleted_at" not in {column["name"] for column in inspector.get_columns(table)}:
+            op.add_column(table, sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True))
+    for name, table, columns, where, replaces in INDEXES:
+        with op.get_context().autocommit_block():
+            op.create_index(name, table, columns, if_not_exists=True, sqlite_where=sa.text(where))
+        if replaces:
+            with op.get_context().autocommit_block():
+                op.drop_index(replaces, table_name=table, if_exists=True)
+
+
+def downgrade() -> None:
+    old_conditions = {"ix_sales_open_owner_customer": OPEN_SALE, "ix_purchases_open_owner_supplier": OPEN_PURCHASE}
+    for name, table, columns, _, replaces in reversed(INDEXES):
+        if replaces:
+            where = old_conditions.get(replaces)
+            # The old indexes did not carry the columns of the WHERE terms
+            op.create_index(
+                replaces,
+                table,
+                [column for column in columns if column not in ("status", "deleted_at")],
+                if_not_exists=True,
+                sqlite_where=sa.text(where) if where else None,
+            )
+        op.drop_index(name, table_name=table, if_exists=True)
+    # Tombstones would reappear as live rows
+    op.execute("DELETE FROM sales WHERE deleted_at IS NOT NULL")
+    op.execute("DELETE FROM purchases WHERE deleted_at IS NOT NULL")
+    with op.batch_alter_table("sales") as batch_op:
+        batch_op.drop_column("deleted_at")
+    with op.batch_alter_table("purchases") as batch_op:
+        batch_op.drop_column("deleted_at")
@@ -0,0 +1,52 @@
+"""Change-data-capture log and consumer watermarks.
+
+Both tables are new and start empty, so creating them takes no noticeable
+lock. They are skipped when they already exist (a database created with
+``create_all`` by this version and adopted afterwards).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    if "change_log" not in tables:
+        op.create_table(
+            "change_log",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("table_name", sa.String(length=64), nullable=False),
+            sa.Column("row_id", sa.Integer(), nullable=False),
+            sa.Column("operation", sa.String(length=16), nullable=False),
+            sa.Column("owner_id", sa.Integer(), nullable=True),
+            sa.Column("changes", sa.JSON(), nullable=False),
+            sa.Column("changed_at", sa.DateTime(timezone=True), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+            sqlite_autoincrement=True,
+        )
+    op.create_index("ix_change_log_table_id", "change_log", ["table_name", "id"], if_not_exists=True)
+    if "change_log_consumers" not in tables:
+        op.create_table(
+            "change_log_consumers",
+            sa.Column("name", sa.String(length=64), nullable=False),
+            sa.Column("watermark", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+            sa.PrimaryKeyConstraint("name"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("change_log_consumers")
+    op.drop_index("ix_change_log_table_id", table_name="change_log", if_exists=True)
+    op.drop_table("change_log")
@@ -0,0 +1,36 @@
+"""Per-user data version counters for conditional GETs.
+
+A new, empty table: counters start at zero and are created by the first
+change of each scope. Skipped when it already exists (a database created with
+``create_all`` by this version and adopted afterwards).
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "data_versions" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "data_versions",
+        sa.Column("scope", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("scope"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("data_versions")
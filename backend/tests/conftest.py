@@ -10,6 +10,7 @@ from cryptography.hazmat.primitives.asymmetric import padding
 from sqlalchemy import create_engine
 
 from app.core import config
+from app.core.cache import cache
 import app.db as app_db
 from app.main import app
 from app.models.customer import Customer
@@ -48,6 +49,7 @@ def temp_db() -> Generator[str, None, None]:
 def client(temp_db: str) -> Generator[TestClient, None, None]:
     app_db.Base.metadata.drop_all(bind=app_db.engine)
     app_db.Base.metadata.create_all(bind=app_db.engine)
+    cache.clear()
     with TestClient(app) as test_client:
         yield test_client
 
@@ -31,3 +31,191 @@ def test_register_and_login(client):
     assert login_resp.status_code == 200, login_resp.text
     token = login_resp.json()["access_token"]
     assert token
+
+
+def test_login_rehashes_outdated_password_hash(client):
+    from pwdlib import PasswordHash
+    from pwdlib.hashers.argon2 import Argon2Hasher
+
+    import app.db as app_db
+    from app.core.config import settings
+    from app.models.user import User
+
+    pem = client.get("/auth/pubkey").json()["pem"]
+    enc_password = _encrypt_with_pem(pem, "1234")
+    register_resp = client.post("/auth/register", json={"email": "old@example.com", "enc_password": enc_password, "company_name": "TestCompany"})
+    assert register_resp.status_code == 200, register_resp.text
+
+    # Simulate a hash created before the argon2 cost was raised
+    legacy = PasswordHash((Argon2Hasher(time_cost=1, memory_cost=8192, parallelism=1),))
+    db = app_db.SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == "old@example.com").first()
+        user.hashed_password = legacy.hash("1234")
+        db.commit()
+    finally:
+        db.close()
+
+    login_resp = client.post("/auth/login", json={"email": "old@example.com", "enc_password": enc_password})
+    assert login_resp.status_code == 200, login_resp.text
+
+    db = app_db.SessionLocal()
+    try:
+        stored = db.query(User).filter(User.email == "old@example.com").first().hashed_password
+    finally:
+        db.close()
+    assert f"m={settings.ARGON2_MEMORY_COST},t={settings.ARGON2_TIME_COST},p={settings.ARGON2_PARALLELISM}" in stored
+
+    wrong = client.post("/auth/login", json={"email": "old@example.com", "enc_password": _encrypt_with_pem(pem, "bad")})
+    assert wrong.status_code == 401
+
+
+def _session_encrypt(client, plaintext: str) -> str:
+    import os
+
+    from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    from app.core.crypto import derive_session_key
+
+    private = X25519PrivateKey.generate()
+    public = private.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+    resp = client.post("/auth/handshake", json={"client_public": base64.b64encode(public).decode("ascii")})
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    server_public = X25519PublicKey.from_public_bytes(base64.urlsafe_b64decode(body["server_public"] + "=" * (-len(body["server_public"]) % 4)))
+    key = derive_session_key(private.exchange(server_public), body["session_id"])
+    nonce = os.urandom(12)
+    ct = AESGCM(key).encrypt(nonce, plaintext.encode("utf-8"), body["session_id"].encode("ascii"))
+    return f"s1.{body['session_id']}.{base64.urlsafe_b64encode(nonce + ct).decode('ascii')}"
+
+
+def test_session_key_password_transport(client):
+    enc_password = _session_encrypt(client, "1234")
+    register_resp = client.post("/auth/register", json={"email": "ecdh@example.com", "enc_password": enc_password, "company_name": "TestCompany"})
+    assert register_resp.status_code == 200, register_resp.text
+
+    # The same session key can be reused, and RSA submissions keep working
+    login_resp = client.post("/auth/login", json={"email": "ecdh@example.com", "enc_password": enc_password})
+    assert login_resp.status_code == 200, login_resp.text
+    pem = client.get("/auth/pubkey").json()["pem"]
+    rsa_login = client.post("/auth/login", json={"email": "ecdh@example.com", "enc_password": _encrypt_with_pem(pem, "1234")})
+    assert rsa_login.status_code == 200, rsa_login.text
+
+    # Tampered payloads and unknown sessions are rejected as bad credentials
+    prefix, session_id, payload = enc_password.split(".", 2)
+    tampered = f"{prefix}.{session_id}.{payload[:-4]}AAAA"
+    assert client.post("/auth/login", json={"email": "ecdh@example.com", "enc_password": tampered}).status_code == 401
+    unknown = f"{prefix}.unknown-session.{payload}"
+    assert client.post("/auth/login", json={"email": "ecdh@example.com", "enc_password": unknown}).status_code == 401
+
+    assert client.post("/auth/handshake", json={"client_public": "bm90LWEta2V5"}).status_code == 400
+
+
+def test_handshake_is_rate_limited_and_capped(client, monkeypatch):
+    from collections import deque
+
+    from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+
+    from app.core import crypto
+    from app.core.config import settings
+    from app.core.rate_limit import RateLimiter
+    from app.routers import auth
+
+    def _handshake():
+        public = X25519PrivateKey.generate().public_key().public_bytes(
+            serialization.Encoding.Raw, serialization.PublicFormat.Raw
+        )
+        return client.post("/auth/handshake", json={"client_public": base64.b64encode(public).decode("ascii")})
+
+    monkeypatch.setattr(auth, "_handshake_limiter", RateLimiter(2, 60))
+    assert [_handshake().status_code for _ in range(3)] == [200, 200, 429]
+
+    # However many addresses call, a worker holds at most TRANSPORT_SESSION_MAX sessions
+    monkeypatch.setattr(auth, "_handshake_limiter", RateLimiter(0, 60))
+    monkeypatch.setattr(crypto, "_live_sessions", deque())
+    monkeypatch.setattr(settings, "TRANSPORT_SESSION_MAX", 2)
+    assert [_handshake().status_code for _ in range(3)] == [200, 200, 503]
+    monkeypatch.setattr(settings, "TRANSPORT_SESSION_TTL_SECONDS", 0)
+    monkeypatch.setattr(crypto, "_live_sessions", deque())
+    assert [_handshake().status_code for _ in range(3)] == [200, 200, 200]
+
+
+def test_refresh_tokens_and_key_rotation(client, auth_headers, tmp_path, monkeypatch):
+    from jose import jwt
+
+    from app.core.config import settings
+    from app.core.jwt_keys import key_ring
+
+    monkeypatch.setattr(settings, "JWT_KEYS_DIR", str(tmp_path))
+    key_ring.reset()
+    try:
+        auth_headers("refresh@example.com")
+        pem = client.get("/auth/pubkey").json()["pem"]
+        login_resp = client.post("/auth/login", json={"email": "refresh@example.com", "enc_password": _encrypt_with_pem(pem, "1234")})
+        assert login_resp.status_code == 200, login_resp.text
+        tokens = login_resp.json()
+        access, refresh = tokens["access_token"], tokens["refresh_token"]
+        old_kid = jwt.get_unverified_header(access)["kid"]
+        assert jwt.get_unverified_header(access)["alg"] == "ES256"
+        assert jwt.get_unverified_claims(access)["sid"] == jwt.get_unverified_claims(refresh)["sid"]
+
+        # Token types are not interchangeable
+        assert client.get("/auth/me", headers={"Authorization": f"Bearer {refresh}"}).status_code == 401
+        assert client.post("/auth/refresh", json={"refresh_token": access}).status_code == 401
+
+        # After rotation new tokens use the new key and old ones still verify
+        new_kid = key_ring.rotate()
+        refreshed = client.post("/auth/refresh", json={"refresh_token": refresh})
+        assert refreshed.status_code == 200, refreshed.text
+        new_access = refreshed.json()["access_token"]
+        assert jwt.get_unverified_header(new_access)["kid"] == new_kid != old_kid
+        assert jwt.get_unverified_claims(new_access)["sid"] == jwt.get_unverified_claims(access)["sid"]
+        assert client.get("/auth/me", headers={"Authorization": f"Bearer {access}"}).status_code == 200
+        assert client.get("/auth/me", headers={"Authorization": f"Bearer {new_access}"}).status_code == 200
+    finally:
+        key_ring.reset()
+
+
+def test_tokens_without_kid_are_refused_after_the_legacy_window(client, auth_headers, monkeypatch):
+    from datetime import datetime, timedelta, timezone
+
+    from jose import jwt
+
+    from app.core.config import settings
+
+    auth_headers("legacy@example.com")
+    expires = datetime.utcnow() + timedelta(minutes=30)
+    legacy = jwt.encode({"sub": "legacy@example.com", "exp": expires}, settings.SECRET_KEY, algorithm="HS256")
+    headers = {"Authorization": f"Bearer {legacy}"}
+
+    now = datetime.now(timezone.utc)
+    monkeypatch.setattr(settings, "JWT_LEGACY_ACCEPT_UNTIL", now + timedelta(hours=1))
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    monkeypatch.setattr(settings, "JWT_LEGACY_ACCEPT_UNTIL", now - timedelta(seconds=1))
+    assert client.get("/auth/me", headers=headers).status_code == 401
+    monkeypatch.setattr(settings, "JWT_LEGACY_ACCEPT_UNTIL", None)
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def test_sliding_refresh_issued_once_per_window(client, auth_headers):
+    from datetime import timedelta
+
+    from app.core.security import create_access_token
+
+    auth_headers("slide@example.com")
+    token = create_access_token("slide@example.com", expires_delta=timedelta(minutes=1), session_id="s-1")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    first = client.get("/auth/me", headers=headers)
+    assert first.status_code == 200
+    renewed = first.headers.get("X-New-Token")
+    assert renewed
+    second = client.get("/auth/me", headers=headers)
+    assert second.status_code == 200
+    assert "X-New-Token" not in second.headers
+
+    # The renewed token is outside the window, so it is not renewed again
+    third = client.get("/auth/me", headers={"Authorization": f"Bearer {renewed}"})
+    assert third.status_code == 200
+    assert "X-New-Token" not in third.headers
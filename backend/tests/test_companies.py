@@ -61,3 +61,54 @@ def test_company_isolation(client, auth_headers):
     list_resp = client.get("/companies/", headers=other_headers)
     assert list_resp.status_code == 200
     assert list_resp.json() == []
+
+
+def test_company_access_follows_link_changes(client, auth_headers):
+    import app.db as app_db
+    from app.models.company import Company
+    from app.models.user import User
+
+    owner_headers = auth_headers("owner@example.com")
+    company_id = client.post("/companies/", json={"name": "SharedCo"}, headers=owner_headers).json()["id"]
+    other_headers = auth_headers("other@example.com")
+    # Prime the other user's cached access set before the link exists
+    assert client.get("/companies/", headers=other_headers).json() == []
+
+    db = app_db.SessionLocal()
+    try:
+        other = db.query(User).filter(User.email == "other@example.com").first()
+        company = db.query(Company).filter(Company.id == company_id).first()
+        company.vendors.append(other)
+        db.commit()
+        assert client.get(f"/companies/{company_id}", headers=other_headers).status_code == 200
+
+        # Unlinking from the user side is picked up as well
+        other.customer_companies.remove(company)
+        db.commit()
+    finally:
+        db.close()
+    assert client.get(f"/companies/{company_id}", headers=other_headers).status_code == 404
+    assert client.get(f"/companies/{company_id}", headers=owner_headers).status_code == 200
+
+
+def test_company_listing_batches_departments_and_member_counts(client, auth_headers):
+    headers = auth_headers("listing@example.com")
+    first = client.post("/companies/", json={"name": "First"}, headers=headers).json()["id"]
+    second = client.post("/companies/", json={"name": "Second"}, headers=headers).json()["id"]
+    for name in ("Sales", "Support", "R&D"):
+        resp = client.post("/departments/", json={"name": name, "company_id": first}, headers=headers)
+        assert resp.status_code == 200, resp.text
+    for index in range(2):
+        resp = client.post("/customers/", json={"name": f"M{index}", "company_id": first}, headers=headers)
+        assert resp.status_code == 200, resp.text
+
+    listing = client.get("/companies/", params={"limit": 1}, headers=headers).json()
+    assert [entry["id"] for entry in listing] == [first]
+    assert [d["name"] for d in listing[0]["departments"]] == ["Sales", "Support", "R&D"]
+    assert listing[0]["member_count"] == 2
+
+    page = client.get("/companies/", params={"skip": 1, "include_departments": False}, headers=headers).json()
+    assert [(entry["id"], entry["departments"], entry["member_count"]) for entry in page] == [(second, None, 0)]
+
+    assert client.get("/companies/count", headers=headers).json() == 2
+    assert client.get("/companies/count", params={"q": "sec"}, headers=headers).json() == 1
@@ -0,0 +1,84 @@
+import gzip
+import json
+
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, accepted_encoding
+
+
+def _app(**options) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, **options)
+
+    @app.get("/rows")
+    def rows(count: int = 500):
+        return [{"id": i, "item_name": "Monitors", "status": "sent", "total_price": "899.00"} for i in range(count)]
+
+    @app.get("/export")
+    def export(count: int = 2000):
+        return StreamingResponse((f"{i},Monitors,899.00\n" for i in range(count)), media_type="text/csv")
+
+    @app.get("/export.csv")
+    def export_whole():
+        return Response("".join(f"{i},Monitors,899.00\n" for i in range(2000)), media_type="text/csv")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter(["data: {}\n\n"] * 200), media_type="text/event-stream")
+
+    return app
+
+
+def test_accept_encoding_negotiation():
+    assert accepted_encoding(None) is None
+    assert accepted_encoding("gzip, deflate") == "gzip"
+    assert accepted_encoding("gzip;q=0, identity") is None
+    assert accepted_encoding("*") == accepted_encoding("gzip")
+    assert accepted_encoding("deflate") is None
+
+
+def test_large_json_is_compressed_and_small_bodies_are_not():
+    for offload_size in (0, 10**9):  # in the threadpool and on the event loop
+        client = TestClient(_app(minimum_size=1024, offload_size=offload_size))
+        resp = client.get("/rows", headers={"Accept-Encoding": "gzip"})
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in resp.headers["Vary"]
+        raw = resp.read()  # decoded by httpx
+        assert json.loads(raw)[-1]["id"] == 499
+        assert int(resp.headers["Content-Length"]) < len(raw) / 5
+
+    small = client.get("/rows", params={"count": 1}, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+    assert small.json()[0]["id"] == 0
+    identity = client.get("/rows", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in identity.headers
+
+
+def test_streamed_bodies_are_compressed_except_event_streams():
+    client = TestClient(_app(minimum_size=1024))
+    with client.stream("GET", "/export", headers={"Accept-Encoding": "gzip"}) as resp:
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert "Content-Length" not in resp.headers
+        compressed = b"".join(resp.iter_raw())
+    lines = gzip.decompress(compressed).decode().splitlines()
+    assert len(lines) == 2000 and lines[-1] == "1999,Monitors,899.00"
+
+    events = client.get("/events", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in events.headers
+    assert events.text.count("data:") == 200
+
+
+def test_streamed_chunks_are_gathered_before_each_flush():
+    client = TestClient(_app(minimum_size=1024))
+    with client.stream("GET", "/export", headers={"Accept-Encoding": "gzip"}) as resp:
+        streamed = b"".join(resp.iter_raw())
+    whole = client.get("/export.csv", headers={"Accept-Encoding": "gzip"})
+    assert gzip.decompress(streamed).decode() == whole.text
+    # One flush per row would make the stream several times the size of the whole body
+    assert len(streamed) < int(whole.headers["Content-Length"]) * 1.25
+
+    short = client.get("/export", params={"count": 3}, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in short.headers
+    assert short.text.splitlines() == ["0,Monitors,899.00", "1,Monitors,899.00", "2,Monitors,899.00"]
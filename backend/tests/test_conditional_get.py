@@ -0,0 +1,81 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+import app.db as app_db
+
+
+@contextmanager
+def _statements():
+    engine = app_db.SessionLocal.kw["bind"]
+    seen = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(" ".join(statement.split()))
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+
+def _sale(day: str) -> dict:
+    return {"date": day, "items_count": 1, "unit_price": "10.00", "total_price": "10.00"}
+
+
+def test_unchanged_lists_answer_304_after_the_version_lookup(client, auth_headers):
+    headers = auth_headers("etag@example.com")
+    other_headers = auth_headers("etag-other@example.com")
+    assert client.post("/sales/", json=_sale("2024-05-01"), headers=headers).status_code == 200
+
+    first = client.get("/sales/", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert first.headers["Last-Modified"].endswith("GMT")
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    with _statements() as seen:
+        cached = client.get("/sales/", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+    # Authentication and the version lookup; the list query never runs
+    assert len(seen) == 2
+    assert "FROM users" in seen[0]
+    assert "FROM data_versions" in seen[1]
+
+    # Another user's writes leave this user's tag alone
+    assert client.post("/sales/", json=_sale("2024-05-02"), headers=other_headers).status_code == 200
+    assert client.get("/sales/", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    assert client.post("/sales/", json=_sale("2024-05-03"), headers=headers).status_code == 200
+    changed = client.get("/sales/", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["total"] == 2
+    assert changed.headers["ETag"] != etag
+
+
+def test_shared_and_statistics_changes_move_the_tag(client, auth_headers):
+    headers = auth_headers("etag-shared@example.com")
+    company_id = client.post("/companies/", json={"name": "TagCo"}, headers=headers).json()["id"]
+
+    conditional = {**headers, "If-None-Match": client.get("/customers/", headers=headers).headers["ETag"]}
+    assert client.get("/customers/", headers=conditional).status_code == 304
+    # Companies are shared between users, so renaming one moves every user's tag
+    assert client.put(f"/companies/{company_id}", json={"name": "TagCo Ltd"}, headers=headers).status_code == 200
+    assert client.get("/customers/", headers=conditional).status_code == 200
+
+    params = {"start_date": "2024-01-01", "end_date": "2024-12-31", "granularity": "month"}
+    stats = client.get("/statistics/", params=params, headers=headers)
+    assert stats.status_code == 200
+    conditional = {**headers, "If-None-Match": f'"other", {stats.headers["ETag"]}'}
+    with _statements() as seen:
+        assert client.get("/statistics/", params=params, headers=conditional).status_code == 304
+    assert not any("sales" in statement or "snapshots" in statement for statement in seen)
+
+    assert client.post("/sales/", json=_sale("2024-06-01"), headers=headers).status_code == 200
+    refreshed = client.get("/statistics/", params=params, headers=conditional)
+    assert refreshed.status_code == 200
+    assert refreshed.json()["overview"]["saleTotal"] == 10.0
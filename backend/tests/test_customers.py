@@ -0,0 +1,125 @@
+def test_customer_directory_pages_by_company(client, auth_headers):
+    headers = auth_headers("directory@example.com")
+    company_ids = []
+    for name in ("Alpha", "Beta", "Gamma"):
+        resp = client.post("/companies/", json={"name": name}, headers=headers)
+        assert resp.status_code == 200, resp.text
+        company_ids.append(resp.json()["id"])
+    members = {company_ids[0]: 3, company_ids[1]: 1, company_ids[2]: 2, 0: 2}
+    for company_id, count in members.items():
+        for index in range(count):
+            resp = client.post(
+                "/customers/", json={"name": f"C{company_id}-{index}", "company_id": company_id}, headers=headers
+            )
+            assert resp.status_code == 200, resp.text
+
+    first = client.get("/customers/directory", params={"limit": 2, "preview": 2}, headers=headers)
+    assert first.status_code == 200, first.text
+    data = first.json()
+    assert data["total_groups"] == 4
+    assert data["total_customers"] == 8
+    # Personal customers come first; groups are never split across pages
+    assert [(g["company_id"], g["company_name"], g["member_count"]) for g in data["groups"]] == [
+        (0, "个人客户", 2),
+        (company_ids[0], "Alpha", 3),
+    ]
+    assert [len(g["customers"]) for g in data["groups"]] == [2, 2]
+
+    second = client.get("/customers/directory", params={"skip": 2, "limit": 2}, headers=headers).json()
+    assert [(g["company_id"], g["member_count"], g["customers"]) for g in second["groups"]] == [
+        (company_ids[1], 1, []),
+        (company_ids[2], 2, []),
+    ]
+
+    expanded = client.get(f"/customers/directory/{company_ids[0]}", params={"skip": 2}, headers=headers)
+    assert expanded.status_code == 200
+    assert [c["name"] for c in expanded.json()] == [f"C{company_ids[0]}-2"]
+
+    searched = client.get("/customers/directory", params={"q": "-1"}, headers=headers).json()
+    assert searched["total_customers"] == 3
+    assert client.get("/customers/directory", params={"limit": 0}, headers=headers).status_code == 400
+    members_url = f"/customers/directory/{company_ids[0]}"
+    assert client.get(members_url, params={"skip": -1}, headers=headers).status_code == 400
+    assert client.get(members_url, params={"limit": 0}, headers=headers).status_code == 400
+    assert client.get(members_url, params={"limit": 10_000}, headers=headers).status_code == 400
+
+    other = auth_headers("stranger@example.com")
+    assert client.get("/customers/directory", headers=other).json() == {"groups": [], "total_groups": 0, "total_customers": 0}
+
+
+def test_suggest_matches_name_prefix_and_pinyin_initials(client, auth_headers):
+    headers = auth_headers("suggest@example.com")
+    for name in ("张三", "张三丰", "Acme Corp", "李四"):
+        resp = client.post("/customers/", json={"name": name, "company_id": 0}, headers=headers)
+        assert resp.status_code == 200, resp.text
+
+    def names(path, q, **params):
+        resp = client.get(path, params={"q": q, **params}, headers=headers)
+        assert resp.status_code == 200, resp.text
+        return [entry["name"] for entry in resp.json()]
+
+    assert names("/customers/suggest", "张") == ["张三", "张三丰"]
+    assert names("/customers/suggest", "zsf") == ["张三丰"]
+    assert names("/customers/suggest", "ACME c") == ["Acme Corp"]
+    assert names("/customers/suggest", "zs", limit=1) == ["张三"]
+    assert client.get("/customers/suggest", params={"limit": 0}, headers=headers).status_code == 400
+
+    # A rename is visible at once despite the cached result for the same prefix
+    customer_id = client.get("/customers/suggest", params={"q": "ls"}, headers=headers).json()[0]["id"]
+    resp = client.put(f"/customers/{customer_id}", json={"name": "赵四"}, headers=headers)
+    assert resp.status_code == 200, resp.text
+    assert names("/customers/suggest", "ls") == []
+    assert names("/customers/suggest", "zs") == ["张三", "张三丰", "赵四"]
+
+    assert client.post("/types/", json={"name": "办公用品"}, headers=headers).status_code == 201
+    assert names("/types/suggest", "bg") == ["办公用品"]
+    assert names("/customers/suggest", "张") == ["张三", "张三丰"]
+    other = auth_headers("other-suggest@example.com")
+    assert client.get("/types/suggest", params={"q": "bg"}, headers=other).json() == []
+
+
+def test_customer_list_fields_skip_unrequested_joins(client, auth_headers):
+    headers = auth_headers("customer-fields@example.com")
+    company_id = client.post("/companies/", json={"name": "Delta"}, headers=headers).json()["id"]
+    for name, owner in (("Dana", company_id), ("Solo", 0)):
+        resp = client.post("/customers/", json={"name": name, "company_id": owner}, headers=headers)
+        assert resp.status_code == 200, resp.text
+
+    narrow = client.get("/customers/", params={"fields": "name"}, headers=headers)
+    assert narrow.status_code == 200, narrow.text
+    assert [(group["company_id"], [set(c) for c in group["customers"]]) for group in narrow.json()] == [
+        (0, [{"id", "name"}]),
+        (company_id, [{"id", "name"}]),
+    ]
+    named = client.get("/customers/", params={"fields": "name,company_name"}, headers=headers).json()
+    assert [c["company_name"] for group in named for c in group["customers"]] == ["个人客户", "Delta"]
+    full = client.get("/customers/", headers=headers).json()
+    assert "phone_number" in full[0]["customers"][0]
+
+
+def test_access_set_read_before_a_revocation_is_not_cached(client, auth_headers):
+    import app.db as app_db
+    from app.models.customer import Customer
+    from app.models.user import User
+    from app.services import membership
+
+    headers = auth_headers("owner@example.com")
+    customer = client.post("/customers/", json={"name": "Revoked", "company_id": 0}, headers=headers).json()
+
+    with app_db.SessionLocal() as db:
+        user_id = db.query(User.id).filter(User.email == "owner@example.com").scalar()
+
+        class _RevokeAfterRead:
+            # Another request commits the revocation between our read and our cache write
+            def execute(self, statement):
+                rows = list(db.execute(statement).scalars())
+                with app_db.SessionLocal() as other:
+                    revoked = other.get(Customer, customer["id"])
+                    revoked.vendors.clear()
+                    other.commit()
+                return type("Result", (), {"scalars": lambda self: rows})()
+
+        stale = membership.accessible_ids(_RevokeAfterRead(), user_id, membership.CUSTOMERS)
+        assert customer["id"] in stale
+        assert not membership.has_access(db, user_id, membership.CUSTOMERS, customer["id"])
+    assert client.get(f"/customers/{customer['id']}", headers=headers).status_code == 404
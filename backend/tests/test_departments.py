@@ -43,3 +43,61 @@ def test_department_crud_flow(client, auth_headers, attach_vendor):
     final_list = client.get("/departments/", headers=headers)
     assert final_list.status_code == 200
     assert all(item["id"] != department_id for item in final_list.json())
+
+
+def test_department_subtree_filters_and_rollup(client, auth_headers):
+    headers = auth_headers("tree@example.com")
+    company_id = client.post("/companies/", json={"name": "TreeCorp"}, headers=headers).json()["id"]
+
+    def department(name, parent_id=None):
+        resp = client.post(
+            "/departments/", json={"name": name, "company_id": company_id, "parent_id": parent_id}, headers=headers
+        )
+        assert resp.status_code == 200, resp.text
+        return resp.json()["id"]
+
+    division = department("Division")
+    team = department("Team", division)
+    squad = department("Squad", team)
+    other = department("Other")
+
+    amounts = {division: "1.00", team: "10.00", squad: "100.00", other: "1000.00"}
+    for department_id, amount in amounts.items():
+        customer = client.post(
+            "/customers/",
+            json={"name": f"C{department_id}", "company_id": company_id, "department_id": department_id},
+            headers=headers,
+        ).json()
+        sale = {
+            "date": "2024-05-10", "items_count": 1, "unit_price": amount, "total_price": amount,
+            "status": "paid", "customer_id": customer["id"],
+        }
+        assert client.post("/sales/", json=sale, headers=headers).status_code == 200
+
+    subtree = client.get("/departments/", params={"ancestor_id": division}, headers=headers).json()
+    assert sorted(entry["id"] for entry in subtree) == sorted([division, team, squad])
+    count = client.get(
+        "/customers/count", params={"department_id": team, "include_subdepartments": True}, headers=headers
+    )
+    assert count.json() == 2
+    sales = client.get(
+        "/sales/", params={"department_id": division, "include_subdepartments": True}, headers=headers
+    ).json()
+    assert sales["total"] == 3
+    assert client.get("/sales/", params={"department_id": division}, headers=headers).json()["total"] == 1
+
+    params = {"start_date": "2024-01-01", "end_date": "2024-12-31"}
+    rollup = client.get(f"/statistics/departments/{division}", params=params, headers=headers).json()
+    assert rollup["total"] == 111.0
+    assert rollup["direct"] == 1.0
+    assert rollup["children"] == [{"id": team, "name": "Team", "total": 110.0}]
+
+    # Cycles are rejected; moving a subtree re-links all of it
+    cycle = client.put(f"/departments/{division}", json={"parent_id": squad}, headers=headers)
+    assert cycle.status_code == 400
+    assert client.put(f"/departments/{team}", json={"parent_id": other}, headers=headers).status_code == 200
+    rollup = client.get(f"/statistics/departments/{other}", params=params, headers=headers).json()
+    assert rollup["total"] == 1110.0
+    assert client.get(f"/statistics/departments/{division}", params=params, headers=headers).json()["total"] == 1.0
+
+    assert client.delete(f"/departments/{other}", headers=headers).status_code == 400
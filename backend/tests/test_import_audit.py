@@ -0,0 +1,23 @@
+from app.utils.import_audit import parse_importtime, profile_import
+
+
+def test_parse_importtime():
+    output = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |     app.core.cache",
+            "import time:       300 |        420 |   app.core",
+            "import time:        80 |        500 | app.main",
+        ]
+    )
+    profile = parse_importtime(output, "app.main")
+    assert profile.total_us == 500
+    assert profile.slowest(1) == [("app.core", 300)]
+    assert profile.loaded("app.core") == ["app.core", "app.core.cache"]
+
+
+def test_app_import_does_not_load_image_dependencies():
+    profile = profile_import("app.main")
+    assert profile.total_us > 0
+    assert profile.loaded("PIL") == []
+    assert profile.loaded("qiniu") == []
@@ -373,3 +373,189 @@ def test_update_sale_image_via_multipart_triggers_delete(client, auth_headers, a
     assert update_resp.json()["image_url"] == "https://cdn.example.com/sales-images/new-image.jpg"
     assert uploads, "Expected uploader.upload to be called"
     assert deletes == [old_url]
+
+
+def test_sale_list_names_follow_renames(client, auth_headers):
+    headers = auth_headers("names@example.com")
+    company_id = client.post("/companies/", json={"name": "OldCo"}, headers=headers).json()["id"]
+    department_id = client.post("/departments/", json={"name": "Ops", "company_id": company_id}, headers=headers).json()["id"]
+    customer_id = client.post(
+        "/customers/",
+        json={"name": "Carol", "company_id": company_id, "department_id": department_id},
+        headers=headers,
+    ).json()["id"]
+    personal_id = client.post("/customers/", json={"name": "Dave", "company_id": 0}, headers=headers).json()["id"]
+    type_id = client.post("/types/", json={"name": "Parts"}, headers=headers).json()["id"]
+    base = {"date": "2024-03-01", "items_count": 1, "unit_price": "10.00", "total_price": "10.00"}
+    for extra in ({"customer_id": customer_id, "type_id": type_id}, {"customer_id": personal_id}, {}):
+        resp = client.post("/sales/", json={**base, **extra}, headers=headers)
+        assert resp.status_code == 200, resp.text
+
+    items = {item["customer_id"]: item for item in client.get("/sales/", headers=headers).json()["items"]}
+    assert items[customer_id]["customer_name"] == "Carol"
+    assert items[customer_id]["company_name"] == "OldCo"
+    assert items[customer_id]["department_name"] == "Ops"
+    assert items[customer_id]["customer_department"] == {
+        "id": department_id,
+        "name": "Ops",
+        "company_id": company_id,
+        "parent_id": None,
+    }
+    assert items[customer_id]["type_name"] == "Parts"
+    assert items[personal_id]["company_name"] == "个人客户"
+    assert items[None]["customer_name"] == "陌生客户"
+
+    assert client.put(f"/companies/{company_id}", json={"name": "NewCo"}, headers=headers).status_code == 200
+    assert client.put(f"/departments/{department_id}", json={"name": "Field"}, headers=headers).status_code == 200
+    assert client.put(f"/customers/{customer_id}", json={"name": "Caroline"}, headers=headers).status_code == 200
+    assert client.put(f"/types/{type_id}", json={"name": "Spares"}, headers=headers).status_code == 200
+
+    listing = client.get("/sales/", params={"company_id": company_id}, headers=headers).json()
+    assert listing["total"] == 1
+    renamed = listing["items"][0]
+    assert (renamed["customer_name"], renamed["company_name"], renamed["department_name"], renamed["type_name"]) == (
+        "Caroline",
+        "NewCo",
+        "Field",
+        "Spares",
+    )
+    assert client.get("/sales/", params={"search": "newco"}, headers=headers).json()["total"] == 1
+
+    # Moving the customer out of the department clears the copied department on the sale
+    assert client.put(f"/customers/{customer_id}", json={"department_id": None}, headers=headers).status_code == 200
+    item = client.get("/sales/", params={"company_id": company_id}, headers=headers).json()["items"][0]
+    assert item["department_name"] is None
+    assert item["customer_department"] is None
+
+
+def test_deleted_sale_is_restorable_until_compacted(client, auth_headers, monkeypatch):
+    from datetime import datetime, timedelta, timezone
+
+    import app.db as app_db
+    from app.models.sale import Sale
+    from app.services import tombstones
+
+    headers = auth_headers("tombstone@example.com")
+    payload = {"date": "2024-02-10", "items_count": 2, "unit_price": "10.00", "total_price": "20.00"}
+    sale_id = client.post("/sales/", json=payload, headers=headers).json()["id"]
+    other = {**payload, "date": "2024-02-11", "items_count": 1, "total_price": "10.00"}
+    client.post("/sales/", json=other, headers=headers)
+    with app_db.SessionLocal() as db:
+        db.query(Sale).filter(Sale.id == sale_id).update({Sale.image_url: "https://img.example.com/sale.jpg"})
+        db.commit()
+    params = {"start_date": "2024-01-01", "end_date": "2024-03-31", "granularity": "month"}
+
+    def february_total():
+        resp = client.get("/statistics/", params=params, headers=headers)
+        assert resp.status_code == 200, resp.text
+        return resp.json()["trend"]["saleData"][1]
+
+    assert february_total() == 30.0  # freezes the February snapshot
+
+    assert client.delete(f"/sales/{sale_id}", headers=headers).status_code == 200
+    assert client.get(f"/sales/{sale_id}", headers=headers).status_code == 404
+    assert client.get("/sales/", headers=headers).json()["total"] == 1
+    assert february_total() == 10.0
+    assert client.post("/sales/999999/restore", headers=headers).status_code == 404
+
+    restored = client.post(f"/sales/{sale_id}/restore", headers=headers)
+    assert restored.status_code == 200, restored.text
+    assert restored.json()["id"] == sale_id
+    assert february_total() == 30.0
+
+    client.delete(f"/sales/{sale_id}", headers=headers)
+    deleted_images = []
+    monkeypatch.setattr(tombstones.uploader, "delete_many", lambda urls: deleted_images.extend(urls) or [])
+    with app_db.SessionLocal() as db:
+        # Still inside the retention window
+        assert tombstones.compact(db, timedelta(days=30)) == 0
+        later = datetime.now(timezone.utc) + timedelta(days=31)
+        assert tombstones.compact(db, timedelta(days=30), batch_size=1, now=later) == 1
+    assert deleted_images == ["https://img.example.com/sale.jpg"]
+    assert client.post(f"/sales/{sale_id}/restore", headers=headers).status_code == 404
+    assert february_total() == 10.0
+
+
+def test_sale_changes_are_logged_for_consumers(client, auth_headers, attach_vendor):
+    import pytest
+
+    import app.db as app_db
+    from app.services import changelog
+
+    headers = auth_headers("changelog@example.com")
+    company_id = client.post("/companies/", json={"name": "LogCo"}, headers=headers).json()["id"]
+    customer = {"name": "Logged Client", "company_id": company_id}
+    customer_id = client.post("/customers/", json=customer, headers=headers).json()["id"]
+    attach_vendor("changelog@example.com", customer_id)
+    with app_db.SessionLocal() as db:
+        # A new consumer starts at the end of the log
+        start = changelog.watermark(db, "test-consumer")
+        assert start == changelog.latest_id(db) > 0
+
+    payload = {"date": "2024-04-01", "customer_id": customer_id, "items_count": 1, "unit_price": "15.00", "total_price": "15.00"}
+    sale_id = client.post("/sales/", json=payload, headers=headers).json()["id"]
+    assert client.put(f"/sales/{sale_id}", json={"notes": "Rush"}, headers=headers).status_code == 200
+    assert client.delete(f"/sales/{sale_id}", headers=headers).status_code == 200
+
+    with app_db.SessionLocal() as db:
+        entries = changelog.changes_since(db, start, tables=["sales"])
+        assert [(entry.row_id, entry.operation) for entry in entries] == [
+            (sale_id, changelog.INSERT),
+            (sale_id, changelog.UPDATE),
+            (sale_id, changelog.UPDATE),
+        ]
+        assert entries[0].changes["customer_id"] == [None, customer_id]
+        assert entries[1].changes["notes"] == [None, "Rush"]
+        assert entries[2].changes["deleted_at"][0] is None
+
+        def failing(session, batch):
+            raise RuntimeError("handler failed")
+
+        with pytest.raises(RuntimeError):
+            changelog.consume(db, "test-consumer", failing, tables=["sales"])
+        assert changelog.watermark(db, "test-consumer") == start
+
+        seen = []
+        assert changelog.consume(db, "test-consumer", lambda session, batch: seen.extend(batch), tables=["sales"]) == 3
+        assert changelog.watermark(db, "test-consumer") == changelog.latest_id(db)
+        assert changelog.consume(db, "test-consumer", lambda session, batch: seen.extend(batch)) == 0
+        assert [entry.id for entry in seen] == [entry.id for entry in entries]
+
+
+def test_sale_list_fields_select_only_the_requested_columns(client, auth_headers):
+    from sqlalchemy import event
+
+    import app.db as app_db
+
+    headers = auth_headers("fields@example.com")
+    company_id = client.post("/companies/", json={"name": "FieldCo"}, headers=headers).json()["id"]
+    customer = {"name": "Field Client", "company_id": company_id}
+    customer_id = client.post("/customers/", json=customer, headers=headers).json()["id"]
+    base = {"date": "2024-07-01", "items_count": 2, "unit_price": "5.00", "total_price": "10.00", "notes": "Long note"}
+    client.post("/sales/", json={**base, "customer_id": customer_id}, headers=headers)
+    client.post("/sales/", json={**base, "date": "2024-07-02"}, headers=headers)
+
+    statements = []
+    engine = app_db.SessionLocal.kw["bind"]
+    record = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        resp = client.get("/sales/", params={"fields": "date,total_price,customer_name"}, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert resp.status_code == 200, resp.text
+    assert "ETag" in resp.headers
+    data = resp.json()
+    assert data["total"] == 2
+    assert data["items"] == [
+        {"id": data["items"][0]["id"], "date": "2024-07-02", "total_price": "10.00", "customer_name": "陌生客户"},
+        {"id": data["items"][1]["id"], "date": "2024-07-01", "total_price": "10.00", "customer_name": "Field Client"},
+    ]
+    page_query = next(statement for statement in statements if "LIMIT" in statement and "FROM sales" in statement)
+    assert "sales.notes" not in page_query and "sales.image_url" not in page_query
+
+    department = client.get("/sales/", params={"fields": "customer_department"}, headers=headers).json()["items"]
+    assert all(set(item) == {"id", "customer_department"} for item in department)
+    assert client.get("/sales/", params={"fields": "date,password"}, headers=headers).status_code == 400
+    purchases = client.get("/purchases/", params={"fields": "total_price"}, headers=headers)
+    assert purchases.status_code == 200 and purchases.json() == {"items": [], "total": 0}
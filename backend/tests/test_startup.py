@@ -0,0 +1,235 @@
+import time
+
+from sqlalchemy import create_engine, inspect
+
+import app.db as app_db
+from app import startup
+from app.core.cache import MemoryCache, SqliteCache
+from app.utils import migrate
+
+
+# Schema of a database created by ``create_all`` before this series of changes:
+# none of the later tables, columns or indexes.
+_BASELINE_SCHEMA = """
+CREATE TABLE companies (
+    id INTEGER NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    address VARCHAR(512),
+    legal_person VARCHAR(255),
+    phone VARCHAR(50),
+    email VARCHAR(255),
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_companies_id ON companies (id);
+CREATE INDEX ix_companies_name ON companies (name);
+CREATE TABLE suppliers (
+    id INTEGER NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    phone_number VARCHAR(50),
+    email VARCHAR(255),
+    address VARCHAR(255),
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_suppliers_id ON suppliers (id);
+CREATE TABLE users (
+    id INTEGER NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    hashed_password VARCHAR(255) NOT NULL,
+    is_active BOOLEAN NOT NULL,
+    created_at DATETIME NOT NULL,
+    company_name VARCHAR(255),
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_users_id ON users (id);
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+CREATE TABLE user_companies (
+    user_id INTEGER NOT NULL,
+    company_id INTEGER NOT NULL,
+    PRIMARY KEY (user_id, company_id),
+    FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY(company_id) REFERENCES companies (id) ON DELETE CASCADE
+);
+CREATE TABLE departments (
+    id INTEGER NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    company_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(company_id) REFERENCES companies (id) ON DELETE CASCADE
+);
+CREATE INDEX ix_departments_id ON departments (id);
+CREATE INDEX ix_departments_company_id ON departments (company_id);
+CREATE TABLE types (
+    id INTEGER NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    owner_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(owner_id) REFERENCES users (id) ON DELETE CASCADE
+);
+CREATE INDEX ix_types_id ON types (id);
+CREATE INDEX ix_types_owner_id ON types (owner_id);
+CREATE TABLE user_suppliers (
+    user_id INTEGER NOT NULL,
+    supplier_id INTEGER NOT NULL,
+    PRIMARY KEY (user_id, supplier_id),
+    FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY(supplier_id) REFERENCES suppliers (id) ON DELETE CASCADE
+);
+CREATE TABLE customers (
+    id INTEGER NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    phone_number VARCHAR(50),
+    email VARCHAR(255),
+    position VARCHAR(255),
+    company_id INTEGER NOT NULL,
+    department_id INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(department_id) REFERENCES departments (id) ON DELETE SET NULL
+);
+CREATE INDEX ix_customers_department_id ON customers (department_id);
+CREATE INDEX ix_customers_id ON customers (id);
+CREATE INDEX ix_customers_company_id ON customers (company_id);
+CREATE TABLE purchases (
+    id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    type_id INTEGER,
+    supplier_id INTEGER,
+    item_name VARCHAR(255),
+    items_count INTEGER NOT NULL,
+    unit_price NUMERIC(12, 2) NOT NULL,
+    total_price NUMERIC(12, 2) NOT NULL,
+    image_url VARCHAR(512),
+    status VARCHAR(50) NOT NULL,
+    notes TEXT,
+    owner_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(type_id) REFERENCES types (id) ON DELETE SET NULL,
+    FOREIGN KEY(supplier_id) REFERENCES suppliers (id) ON DELETE SET NULL,
+    FOREIGN KEY(owner_id) REFERENCES users (id) ON DELETE CASCADE
+);
+CREATE INDEX ix_purchases_id ON purchases (id);
+CREATE INDEX ix_purchases_type_id ON purchases (type_id);
+CREATE INDEX ix_purchases_owner_id ON purchases (owner_id);
+CREATE INDEX ix_purchases_supplier_id ON purchases (supplier_id);
+CREATE TABLE user_customers (
+    user_id INTEGER NOT NULL,
+    customer_id INTEGER NOT NULL,
+    PRIMARY KEY (user_id, customer_id),
+    FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY(customer_id) REFERENCES customers (id) ON DELETE CASCADE
+);
+CREATE TABLE sales (
+    id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    type_id INTEGER,
+    customer_id INTEGER,
+    item_name VARCHAR(255),
+    items_count INTEGER NOT NULL,
+    unit_price NUMERIC(12, 2) NOT NULL,
+    total_price NUMERIC(12, 2) NOT NULL,
+    image_url VARCHAR(512),
+    status VARCHAR(50) NOT NULL,
+    notes TEXT,
+    owner_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(type_id) REFERENCES types (id) ON DELETE SET NULL,
+    FOREIGN KEY(customer_id) REFERENCES customers (id) ON DELETE SET NULL,
+    FOREIGN KEY(owner_id) REFERENCES users (id) ON DELETE CASCADE
+);
+CREATE INDEX ix_sales_type_id ON sales (type_id);
+CREATE INDEX ix_sales_id ON sales (id);
+CREATE INDEX ix_sales_owner_id ON sales (owner_id);
+CREATE INDEX ix_sales_customer_id ON sales (customer_id);
+"""
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first, second = SqliteCache(path), SqliteCache(path)
+
+    first.set("membership:1:customers", [1, 2, 3], ttl=60)
+    assert second.get("membership:1:customers") == [1, 2, 3]
+    second.delete("membership:1:customers")
+    assert first.get("membership:1:customers", "missing") == "missing"
+
+    # add() is won by exactly one instance until the entry expires
+    assert first.add("slide:abc", True, ttl=0.05) is True
+    assert second.add("slide:abc", True, ttl=60) is False
+    time.sleep(0.1)
+    assert first.get("slide:abc") is None
+    assert second.add("slide:abc", True, ttl=60) is True
+
+    first.set("suggest:gen:customers", 3)
+    first.clear()
+    assert second.get("suggest:gen:customers") is None
+
+
+def test_memory_cache_purges_expired_entries_without_reads():
+    store = MemoryCache()
+    for index in range(MemoryCache._PURGE_EVERY - 1):
+        store.set(f"suggest:{index}", [index], ttl=0.05)
+    store.set("forecast:1", {"through": 1})
+    assert len(store._data) == MemoryCache._PURGE_EVERY
+    time.sleep(0.1)
+
+    # Keys written once and never read again are dropped by later writes
+    for index in range(MemoryCache._PURGE_EVERY):
+        store.add(f"jwt:slide:{index}", True, ttl=60)
+    assert len(store._data) == MemoryCache._PURGE_EVERY + 1
+    assert store.get("forecast:1") == {"through": 1}
+
+
+def test_prepare_migrates_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fm.db'}")
+    try:
+        assert startup.current_revision(engine) is None
+        assert startup.prepare(engine) is True
+        assert "department_paths" in inspect(engine).get_table_names()
+        assert startup.current_revision(engine) == startup.head_revision()
+        # The migrations build the indexes exactly as the models declare them
+        for name, table in app_db.Base.metadata.tables.items():
+            migrated = {index["name"]: index["column_names"] for index in inspect(engine).get_indexes(name)}
+            for index in table.indexes:
+                assert migrated.get(index.name) == [column.name for column in index.columns], index.name
+        # Later workers find the schema current and skip the migration
+        assert startup.prepare(engine) is False
+    finally:
+        engine.dispose()
+
+
+def test_pre_migration_database_is_adopted(tmp_path):
+    path = tmp_path / "legacy.db"
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        raw = engine.raw_connection()
+        try:
+            raw.executescript(_BASELINE_SCHEMA)
+            raw.executescript(
+                "INSERT INTO companies (id, name) VALUES (1, 'Acme');"
+                "INSERT INTO departments (id, name, company_id) VALUES (1, 'Sales', 1);"
+            )
+        finally:
+            raw.close()
+
+        report = migrate.dry_run(str(path))
+        assert "sales" in report.rows
+        assert [label.split()[0] for label, _ in report.revisions] == ["0002", "0003", "0004", "0005"]
+        assert any("ix_sales_live_owner_department_date" in statement for statement, _ in report.statements)
+        # The dry run leaves the original untouched
+        assert startup.current_revision(engine) is None
+
+        assert startup.prepare(engine) is True
+        assert startup.current_revision(engine) == startup.head_revision()
+        indexes = {index["name"] for index in inspect(engine).get_indexes("sales")}
+        assert "ix_sales_live_owner_department_date" in indexes
+        assert "ix_sales_owner_department_date" not in indexes
+        # Tables added since are created and the existing ones gain their new columns
+        tables = set(inspect(engine).get_table_names())
+        assert set(app_db.Base.metadata.tables) <= tables
+        for name, table in app_db.Base.metadata.tables.items():
+            assert {column["name"] for column in inspect(engine).get_columns(name)} == set(table.columns.keys()), name
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql("SELECT ancestor_id, descendant_id, depth FROM department_paths").all() == [
+                (1, 1, 0)
+            ]
+    finally:
+        engine.dispose()
@@ -0,0 +1,446 @@
+from decimal import Decimal
+
+
+def _payload(day: str, count: int, unit_price: str, status: str) -> dict:
+    total = str(Decimal(unit_price) * count)
+    return {"date": day, "items_count": count, "unit_price": unit_price, "total_price": total, "status": status}
+
+
+def _create_sale(client, headers, day: str, count: int, unit_price: str):
+    resp = client.post("/sales/", json=_payload(day, count, unit_price, "sent"), headers=headers)
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+def _create_purchase(client, headers, day: str, count: int, unit_price: str):
+    resp = client.post("/purchases/", json=_payload(day, count, unit_price, "ordered"), headers=headers)
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+def test_daily_trend_fills_every_bucket(client, auth_headers):
+    headers = auth_headers("stats@example.com")
+    _create_sale(client, headers, "2024-03-01", 3, "10.10")
+    _create_sale(client, headers, "2024-03-01", 1, "0.20")
+    _create_sale(client, headers, "2024-03-04", 2, "5.00")
+    _create_purchase(client, headers, "2024-03-02", 1, "7.35")
+
+    resp = client.get(
+        "/statistics/",
+        params={"start_date": "2024-03-01", "end_date": "2024-03-05", "analysis_type": "monthly"},
+        headers=headers,
+    )
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+
+    trend = data["trend"]
+    assert trend["categories"] == ["2024-03-01", "2024-03-02", "2024-03-03", "2024-03-04", "2024-03-05"]
+    assert trend["saleData"] == [30.5, 0.0, 0.0, 10.0, 0.0]
+    assert trend["purchaseData"] == [0.0, 7.35, 0.0, 0.0, 0.0]
+    assert data["profit"]["profitData"] == [30.5, -7.35, 0.0, 10.0, 0.0]
+    assert data["profit"]["cumulativeData"][-1] == data["overview"]["profit"]
+
+    overview = data["overview"]
+    assert overview["saleTotal"] == 40.5
+    assert overview["purchaseTotal"] == 7.35
+    assert overview["profit"] == 33.15
+
+
+def test_monthly_trend_and_comparison_window(client, auth_headers):
+    headers = auth_headers("stats@example.com")
+    _create_sale(client, headers, "2023-01-15", 1, "100.00")
+    _create_sale(client, headers, "2024-02-03", 1, "50.00")
+    _create_purchase(client, headers, "2024-02-20", 2, "10.00")
+
+    resp = client.get(
+        "/statistics/",
+        params={"start_date": "2023-01-01", "end_date": "2024-02-29", "analysis_type": "yearly"},
+        headers=headers,
+    )
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+
+    assert len(data["trend"]["categories"]) == 14
+    assert data["trend"]["categories"][0] == "2023-01"
+    assert data["trend"]["saleData"][0] == 100.0
+    assert data["trend"]["saleData"][-1] == 50.0
+
+    comparison = data["comparison"]
+    assert comparison["categories"] == data["trend"]["categories"][-12:]
+    assert comparison["purchaseData"][-1] == 20.0
+    assert comparison["analysisType"] == "yearly"
+
+
+def test_statistics_without_sales_and_invalid_range(client, auth_headers):
+    headers = auth_headers("stats@example.com")
+    resp = client.get(
+        "/statistics/",
+        params={"start_date": "2024-01-01", "end_date": "2024-01-31", "analysis_type": "monthly"},
+        headers=headers,
+    )
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["overview"]["profitRate"] == 0.0
+
+    bad_range = client.get(
+        "/statistics/",
+        params={"start_date": "2024-02-01", "end_date": "2024-01-01"},
+        headers=headers,
+    )
+    assert bad_range.status_code == 400
+
+
+def test_custom_granularity_buckets(client, auth_headers):
+    headers = auth_headers("stats@example.com")
+    _create_sale(client, headers, "2024-01-01", 1, "10.00")  # Monday, week 1
+    _create_sale(client, headers, "2024-01-07", 1, "5.00")  # Sunday, still week 1
+    _create_sale(client, headers, "2024-05-15", 1, "20.00")  # Q2
+    _create_purchase(client, headers, "2024-12-31", 1, "4.00")  # Q4, ISO week 1 of 2025
+
+    weekly = client.get(
+        "/statistics/",
+        params={"start_date": "2024-01-01", "end_date": "2024-01-21", "granularity": "week"},
+        headers=headers,
+    )
+    assert weekly.status_code == 200, weekly.text
+    trend = weekly.json()["trend"]
+    assert trend["granularity"] == "week"
+    assert trend["categories"] == ["2024-W01", "2024-W02", "2024-W03"]
+    assert trend["saleData"] == [15.0, 0.0, 0.0]
+
+    quarterly = client.get(
+        "/statistics/",
+        params={"start_date": "2024-01-01", "end_date": "2024-12-31", "granularity": "quarter"},
+        headers=headers,
+    )
+    assert quarterly.status_code == 200, quarterly.text
+    data = quarterly.json()
+    assert data["trend"]["categories"] == ["2024-Q1", "2024-Q2", "2024-Q3", "2024-Q4"]
+    assert data["trend"]["saleData"] == [15.0, 20.0, 0.0, 0.0]
+    assert data["profit"]["profitData"] == [15.0, 20.0, 0.0, -4.0]
+    assert data["customerAnalysis"]["categories"] == data["trend"]["categories"]
+
+    invalid = client.get("/statistics/", params={"granularity": "fortnight"}, headers=headers)
+    assert invalid.status_code == 400
+
+
+def test_customer_analysis_folds_small_customers(client, auth_headers, attach_vendor):
+    headers = auth_headers("stats@example.com")
+    for index in range(7):
+        customer = client.post(
+            "/customers/", json={"name": f"Client {index}", "company_id": 0}, headers=headers
+        )
+        assert customer.status_code == 200, customer.text
+        payload = _payload("2024-02-10", index + 1, "10.00", "paid")
+        payload["customer_id"] = customer.json()["id"]
+        assert client.post("/sales/", json=payload, headers=headers).status_code == 200
+
+    resp = client.get(
+        "/statistics/",
+        params={"start_date": "2024-01-01", "end_date": "2024-03-31", "granularity": "month"},
+        headers=headers,
+    )
+    assert resp.status_code == 200, resp.text
+    analysis = resp.json()["customerAnalysis"]
+    assert analysis["categories"] == ["2024-01", "2024-02", "2024-03"]
+    names = [series["name"] for series in analysis["series"]]
+    assert names == ["Client 6", "Client 5", "Client 4", "Client 3", "Client 2", "others"]
+    assert analysis["series"][0]["data"] == [0.0, 70.0, 0.0]
+    assert analysis["series"][-1]["data"] == [0.0, 30.0, 0.0]
+
+
+def test_closed_months_are_snapshotted_and_invalidated(client, auth_headers):
+    import app.db as app_db
+    from app.models.statistics_snapshot import StatisticsSnapshot
+
+    headers = auth_headers("stats@example.com")
+    sale = _create_sale(client, headers, "2024-02-10", 2, "10.00")
+    _create_sale(client, headers, "2023-02-11", 1, "7.00")
+    params = {"start_date": "2024-01-01", "end_date": "2024-03-31", "granularity": "month"}
+
+    first = client.get("/statistics/", params=params, headers=headers)
+    assert first.status_code == 200, first.text
+    assert first.json()["trend"]["saleData"] == [0.0, 20.0, 0.0]
+    previous = first.json()["comparison"]["previousYear"]
+    assert previous["categories"] == ["2023-01", "2023-02", "2023-03"]
+    assert previous["saleData"] == [0.0, 7.0, 0.0]
+
+    with app_db.SessionLocal() as db:
+        frozen = {
+            (row.period_start.isoformat(), float(row.amount))
+            for row in db.query(StatisticsSnapshot).filter(
+                StatisticsSnapshot.kind == "sales", StatisticsSnapshot.granularity == "month"
+            )
+        }
+    assert ("2024-02-01", 20.0) in frozen
+    assert ("2024-01-01", 0.0) in frozen
+
+    # Freezing happens on its own session: the caller's loaded objects stay loaded.
+    from datetime import date
+
+    from app.models.sale import Sale
+    from app.models.user import User
+    from app.services.period_snapshots import period_totals
+    from app.services.timeseries import MONTH, BucketRange
+
+    with app_db.SessionLocal() as db:
+        user = db.query(User).filter(User.email == "stats@example.com").one()
+        rows = period_totals(db, Sale, user.id, BucketRange(date(2022, 1, 1), date(2022, 3, 31), MONTH))
+        assert [float(amount) for _, amount in rows] == [0.0, 0.0, 0.0]
+        assert "email" in user.__dict__
+        assert db.query(StatisticsSnapshot).filter(StatisticsSnapshot.period_start == date(2022, 2, 1)).count() == 1
+
+    # A backdated edit drops the affected month so the next read sees it.
+    moved = client.put(f"/sales/{sale['id']}", json={"date": "2024-03-05"}, headers=headers)
+    assert moved.status_code == 200, moved.text
+    second = client.get("/statistics/", params=params, headers=headers)
+    assert second.json()["trend"]["saleData"] == [0.0, 0.0, 20.0]
+    assert second.json()["overview"]["saleTotal"] == 20.0
+
+
+def test_aging_report_buckets_open_items(client, auth_headers, attach_vendor):
+    headers = auth_headers("stats@example.com")
+    customer = client.post("/customers/", json={"name": "Debtor", "company_id": 0}, headers=headers).json()
+    for day, status in (("2024-06-25", "sent"), ("2024-05-20", "draft"), ("2024-01-01", "sent"), ("2024-06-01", "paid")):
+        payload = _payload(day, 1, "100.00", status)
+        payload["customer_id"] = customer["id"]
+        assert client.post("/sales/", json=payload, headers=headers).status_code == 200
+    _create_sale(client, headers, "2024-04-15", 1, "5.00")  # no customer, sent
+    _create_sale(client, headers, "2024-07-02", 1, "70.00")  # after as_of
+    _create_purchase(client, headers, "2024-06-20", 1, "40.00")  # ordered
+    received = _payload("2024-06-20", 1, "99.00", "received")
+    assert client.post("/purchases/", json=received, headers=headers).status_code == 200
+
+    resp = client.get("/statistics/aging", params={"as_of": "2024-06-30"}, headers=headers)
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert data["buckets"] == ["0-30", "31-60", "61-90", "90+"]
+
+    receivables = data["receivables"]
+    assert receivables["bucketTotals"] == [100.0, 100.0, 5.0, 100.0]
+    assert receivables["total"] == 305.0
+    debtor, unknown = receivables["items"]
+    assert debtor["name"] == "Debtor"
+    assert debtor["amounts"] == [100.0, 100.0, 0.0, 100.0]
+    assert unknown["id"] is None and unknown["name"] == "陌生客户"
+
+    payables = data["payables"]
+    assert payables["total"] == 40.0
+    assert payables["items"][0]["amounts"] == [40.0, 0.0, 0.0, 0.0]
+
+
+
+def test_aggregates_read_only_covering_indexes():
+    from datetime import date
+
+    from sqlalchemy import event
+
+    import app.db as app_db
+    from app.models.customer import Customer
+    from app.models.purchase import OPEN_PURCHASE_CONDITION, Purchase
+    from app.models.sale import OPEN_SALE_CONDITION, Sale
+    from app.models.supplier import Supplier
+    from app.services.aging import aging_report
+    from app.services.supplier_spend import supplier_spend
+    from app.services.timeseries import BucketRange
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "sum(" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(app_db.engine, "before_cursor_execute", capture)
+    db = app_db.SessionLocal()
+    try:
+        supplier_spend(db, 1, BucketRange(date(2023, 1, 1), date(2024, 12, 31), "month"), 5, 0)
+        aging_report(db, Purchase, Purchase.supplier_id, Supplier, OPEN_PURCHASE_CONDITION, 1, date(2024, 6, 30))
+        aging_report(db, Sale, Sale.customer_id, Customer, OPEN_SALE_CONDITION, 1, date(2024, 6, 30))
+    finally:
+        db.close()
+        event.remove(app_db.engine, "before_cursor_execute", capture)
+
+    # The long-window spend scan and both aging scans never visit table rows,
+    # including the deleted_at IS NULL term every query carries
+    assert len(statements) == 3
+    with app_db.engine.connect() as connection:
+        for statement, parameters in statements:
+            plan = " ".join(row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+            assert "USING COVERING INDEX" in plan, plan
+
+def _months_ago(count: int) -> str:
+    from datetime import date
+
+    today = date.today()
+    year, month = divmod(today.year * 12 + today.month - 1 - count, 12)
+    return date(year, month + 1, 10).isoformat()
+
+
+def test_forecast_projects_flat_history_and_refits_after_backdated_write(client, auth_headers):
+    headers = auth_headers("stats@example.com")
+    for months_back in range(1, 7):
+        _create_sale(client, headers, _months_ago(months_back), 1, "100.00")
+        _create_purchase(client, headers, _months_ago(months_back), 1, "40.00")
+
+    resp = client.get("/statistics/forecast", params={"months": 3}, headers=headers)
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert len(data["categories"]) == 3
+    assert data["inflow"] == [100.0, 100.0, 100.0]
+    assert data["outflow"] == [40.0, 40.0, 40.0]
+    assert data["net"] == [60.0, 60.0, 60.0]
+    assert data["byType"]["inflow"][0]["name"] == "未分类"
+    assert data["byCustomer"][0]["data"] == [100.0, 100.0, 100.0]
+
+    # Writes in the open month do not change a forecast built from closed months.
+    _create_sale(client, headers, _months_ago(0), 1, "999.00")
+    assert client.get("/statistics/forecast", params={"months": 3}, headers=headers).json()["inflow"] == data["inflow"]
+
+    # A backdated write discards the cached fit.
+    _create_sale(client, headers, _months_ago(1), 1, "600.00")
+    refit = client.get("/statistics/forecast", params={"months": 3}, headers=headers).json()
+    assert refit["inflow"][0] > 100.0
+
+
+def test_supplier_analysis_ranks_spend_and_tracks_unit_prices(client, auth_headers, attach_vendor):
+    headers = auth_headers("supplier-stats@example.com")
+    supplier_ids = []
+    for index in range(3):
+        resp = client.post("/suppliers/", json={"name": f"Vendor {index}"}, headers=headers)
+        assert resp.status_code == 200, resp.text
+        supplier_ids.append(resp.json()["id"])
+
+    def buy(day, supplier_id, item, count, unit_price):
+        payload = _payload(day, count, unit_price, "received")
+        payload.update(supplier_id=supplier_id, item_name=item)
+        resp = client.post("/purchases/", json=payload, headers=headers)
+        assert resp.status_code == 200, resp.text
+
+    buy("2024-01-05", supplier_ids[0], "Steel", 10, "5.00")
+    buy("2024-03-05", supplier_ids[0], "Steel", 10, "6.00")
+    buy("2024-03-20", supplier_ids[0], "Steel", 30, "7.00")
+    buy("2024-02-01", supplier_ids[0], "Bolts", 1, "1.00")
+    buy("2024-02-10", supplier_ids[1], "Paper", 4, "10.00")
+    buy("2024-02-11", supplier_ids[2], "Ink", 1, "3.00")
+    buy("2024-02-12", None, "Misc", 1, "2.00")
+
+    resp = client.get(
+        "/statistics/suppliers",
+        params={"start_date": "2024-01-01", "end_date": "2024-03-31", "top": 2, "items": 1},
+        headers=headers,
+    )
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert data["categories"] == ["2024-01", "2024-02", "2024-03"]
+    assert data["total"] == 366.0
+    assert [(entry["name"], entry["data"]) for entry in data["series"]] == [
+        ("Vendor 0", [50.0, 1.0, 270.0]),
+        ("Vendor 1", [0.0, 40.0, 0.0]),
+        ("others", [0.0, 5.0, 0.0]),
+    ]
+    assert [(entry["supplierName"], entry["item"], entry["data"]) for entry in data["unitPrice"]] == [
+        ("Vendor 0", "Steel", [5.0, None, 6.75]),
+        ("Vendor 1", "Paper", [None, 10.0, None]),
+    ]
+
+    invalid = client.get("/statistics/suppliers", params={"granularity": "fortnight"}, headers=headers)
+    assert invalid.status_code == 400
+
+
+def test_breakdowns_are_keyed_by_id(client, auth_headers):
+    headers = auth_headers("rollup-stats@example.com")
+    company_ids = [
+        client.post("/companies/", json={"name": name}, headers=headers).json()["id"] for name in ("North", "South")
+    ]
+    department_ids = [
+        client.post("/departments/", json={"name": "Ops", "company_id": company_id}, headers=headers).json()["id"]
+        for company_id in company_ids
+    ]
+    amounts = ("30.00", "20.00")
+    for company_id, department_id, amount in zip(company_ids, department_ids, amounts):
+        # Same customer name in both companies
+        customer = client.post(
+            "/customers/",
+            json={"name": "Dana", "company_id": company_id, "department_id": department_id},
+            headers=headers,
+        ).json()
+        payload = _payload("2024-02-10", 1, amount, "paid")
+        payload["customer_id"] = customer["id"]
+        assert client.post("/sales/", json=payload, headers=headers).status_code == 200
+    assert client.post("/sales/", json=_payload("2024-02-11", 1, "5.00", "paid"), headers=headers).status_code == 200
+
+    resp = client.get(
+        "/statistics/",
+        params={"start_date": "2024-01-01", "end_date": "2024-03-31", "granularity": "month"},
+        headers=headers,
+    )
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+
+    customers = data["customerAnalysis"]["series"]
+    assert [(entry["name"], entry["data"][1]) for entry in customers] == [
+        ("Dana（North）", 30.0),
+        ("Dana（South）", 20.0),
+        ("陌生客户", 5.0),
+    ]
+    companies = data["companyAnalysis"]["series"]
+    assert [(entry["id"], entry["name"], entry["data"][1]) for entry in companies] == [
+        (company_ids[0], "North", 30.0),
+        (company_ids[1], "South", 20.0),
+        (None, "陌生客户", 5.0),
+    ]
+    departments = data["departmentAnalysis"]["series"]
+    assert [(entry["id"], entry["companyId"], entry["name"]) for entry in departments] == [
+        (department_ids[0], company_ids[0], "Ops（North）"),
+        (department_ids[1], company_ids[1], "Ops（South）"),
+        (None, None, "未分配部门"),
+    ]
+    assert sum(sum(entry["data"]) for entry in departments) == data["overview"]["saleTotal"]
+
+
+def test_summary_stream_pushes_changed_fields(client, auth_headers):
+    import asyncio
+    from datetime import date
+
+    import app.db as app_db
+    from app.models.user import User
+    from app.services.live_updates import LiveUpdates
+
+    headers = auth_headers("live@example.com")
+    other_headers = auth_headers("bystander@example.com")
+    today = date.today().isoformat()
+    _create_sale(client, headers, today, 1, "10.00")
+    with app_db.SessionLocal() as db:
+        owner_id = db.query(User.id).filter(User.email == "live@example.com").scalar()
+
+    async def scenario():
+        hub = LiveUpdates(poll_interval=3600)  # polled by hand below
+        subscription, summary = await hub.subscribe(owner_id)
+        slow, _ = await hub.subscribe(owner_id)
+        assert summary == client.get("/statistics/summary", headers=headers).json()
+        assert summary["monthly"]["sale_total"] == 10.0
+
+        _create_sale(client, other_headers, today, 1, "99.00")  # another user's sale
+        await hub.poll()
+        assert await subscription.next(0.01) is None
+
+        _create_sale(client, headers, today, 2, "10.00")
+        await hub.poll()
+        delta = await subscription.next(1)
+        assert delta == {
+            "monthly": {"sale_total": 30.0, "profit": 30.0},
+            "yearly": {"sale_total": 30.0, "profit": 30.0},
+        }
+
+        # A subscription that has not read yet keeps one merged delta
+        purchase = {"date": today, "items_count": 1, "unit_price": "4.00", "total_price": "4.00"}
+        assert client.post("/purchases/", json=purchase, headers=headers).status_code == 200
+        await hub.poll()
+        merged = await slow.next(1)
+        assert merged["monthly"] == {"sale_total": 30.0, "purchase_total": 4.0, "profit": 26.0}
+        assert await slow.next(0.01) is None
+
+        hub.unsubscribe(subscription)
+        hub.unsubscribe(slow)
+        assert hub.subscriber_count == 0
+
+    asyncio.run(scenario())
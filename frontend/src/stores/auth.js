@@ -10,6 +10,7 @@ let interceptorsAttached = false
 export const useAuthStore = defineStore('auth', {
     state: () => ({
         token: localStorage.getItem('fm_token') || null,
+        refreshToken: localStorage.getItem('fm_refresh_token') || null,
         email: localStorage.getItem('fm_email') || null,
         loading: false,
         error: null,
@@ -48,10 +49,23 @@ export const useAuthStore = defineStore('auth', {
                     localStorage.setItem('fm_token', newToken)
                 }
                 return res
-            }, err => {
-                // Optional: auto-logout on 401 token expired (detail === 'Token expired')
+            }, async err => {
+                // On 401 token expired, exchange the refresh token once and retry; otherwise log out
                 if (err.response?.status === 401) {
                     const detail = err.response?.data?.detail
+                    const original = err.config
+                    if (detail === 'Token expired' && this.refreshToken && original && !original._retried) {
+                        original._retried = true
+                        try {
+                            const r = await api.post('/auth/refresh', { refresh_token: this.refreshToken })
+                            this.setTokens(r.data)
+                            original.headers.Authorization = `Bearer ${this.token}`
+                            return api(original)
+                        } catch (refreshErr) {
+                            this.logout()
+                            return Promise.reject(err)
+                        }
+                    }
                     if (detail === 'Token expired' || detail === 'Could not validate credentials') {
                         this.logout()
                     }
@@ -91,9 +105,8 @@ export const useAuthStore = defineStore('auth', {
                 }
                 
                 const r = await api.post(`/auth/login`, payload)
-                this.token = r.data.access_token
+                this.setTokens(r.data)
                 this.email = email
-                localStorage.setItem('fm_token', this.token)
                 localStorage.setItem('fm_email', this.email)
             } catch (e) {
                 this.error = e.response?.data?.detail || e.message
@@ -127,10 +140,89 @@ export const useAuthStore = defineStore('auth', {
                 this.loading = false
             }
         },
+        // 订阅 SSE 事件流。EventSource 无法携带 Authorization 头，因此用 fetch 读取流；
+        // 断线后按退避间隔重连，token 过期时先刷新。返回关闭函数
+        openStream(path, onEvent) {
+            let closed = false
+            let controller = null
+            let delay = 1000
+            const dispatch = (block) => {
+                let event = 'message'
+                const data = []
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event:')) event = line.slice(6).trim()
+                    else if (line.startsWith('data:')) data.push(line.slice(5).trim())
+                }
+                if (data.length) onEvent(event, JSON.parse(data.join('\n')))
+            }
+            const connect = async () => {
+                controller = new AbortController()
+                try {
+                    const res = await fetch(`${API_BASE}${path}`, {
+                        headers: { ...this.authHeaders, Accept: 'text/event-stream' },
+                        signal: controller.signal,
+                    })
+                    if (res.status === 401) {
+                        if (!this.refreshToken) {
+                            this.logout()
+                            return
+                        }
+                        const r = await api.post('/auth/refresh', { refresh_token: this.refreshToken })
+                        this.setTokens(r.data)
+                        return connect()
+                    }
+                    if (!res.ok) throw new Error(`stream failed: ${res.status}`)
+                    const newToken = res.headers.get('x-new-token')
+                    if (newToken && newToken !== this.token) {
+                        this.token = newToken
+                        localStorage.setItem('fm_token', newToken)
+                    }
+                    delay = 1000
+                    const reader = res.body.getReader()
+                    const decoder = new TextDecoder()
+                    let buffer = ''
+                    for (;;) {
+                        const { value, done } = await reader.read()
+                        if (done) break
+                        buffer += decoder.decode(value, { stream: true })
+                        let end
+                        while ((end = buffer.indexOf('\n\n')) >= 0) {
+                            dispatch(buffer.slice(0, end))
+                            buffer = buffer.slice(end + 2)
+                        }
+                    }
+                } catch (e) {
+                    if (closed) return
+                    if (e?.response?.status === 401) {
+                        this.logout()
+                        return
+                    }
+                }
+                if (!closed) {
+                    setTimeout(connect, delay)
+                    delay = Math.min(delay * 2, 30000)
+                }
+            }
+            connect()
+            return () => {
+                closed = true
+                controller?.abort()
+            }
+        },
+        setTokens(data) {
+            this.token = data.access_token
+            localStorage.setItem('fm_token', this.token)
+            if (data.refresh_token) {
+                this.refreshToken = data.refresh_token
+                localStorage.setItem('fm_refresh_token', this.refreshToken)
+            }
+        },
         logout() {
             this.token = null
+            this.refreshToken = null
             this.email = null
             localStorage.removeItem('fm_token')
+            localStorage.removeItem('fm_refresh_token')
             localStorage.removeItem('fm_email')
         }
     }